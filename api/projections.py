@@ -0,0 +1,129 @@
+"""Проекции моделей в JSON на уровне values().
+
+Поле ответа — это выражение для values(), поэтому объекты моделей не
+создаются, а ненужные столбцы не читаются. Параметр ?fields= сужает набор
+полей ответа.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import OuterRef, Subquery
+
+from posts.models import Comment
+from posts.pagination import COMMENT_ORDERING, CursorPaginator
+
+
+class InvalidFields(Exception):
+    pass
+
+
+def media_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Projection:
+    def __init__(self, fields, default=None, always=(), convert=None):
+        # Имя поля ответа → выражение values(); None — поле считается отдельно
+        self.fields = fields
+        self.default = default or [
+            name for name, lookup in fields.items() if lookup is not None]
+        # Поля, без которых не построить курсор
+        self.always = always
+        self.convert = convert or {}
+
+    def select(self, request):
+        raw = request.GET.get('fields')
+        if not raw:
+            return list(self.default)
+        names = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = sorted(set(names) - set(self.fields))
+        if unknown:
+            raise InvalidFields(unknown)
+        return names
+
+    def values(self, queryset, names):
+        lookups = {self.fields[name] for name in names
+                   if self.fields[name] is not None}
+        return queryset.values(*lookups.union(self.always))
+
+    def render(self, row, names):
+        result = {}
+        for name in names:
+            lookup = self.fields[name]
+            if lookup is None:
+                result[name] = row.get(name)
+                continue
+            convert = self.convert.get(name)
+            value = row[lookup]
+            result[name] = convert(value) if convert else value
+        return result
+
+
+POST = Projection({
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+    'comments': None,
+    'comments_next': None,
+}, always=('id', 'pub_date'), convert={'image': media_url})
+
+COMMENT = Projection({
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}, always=('id', 'created'))
+
+GROUP = Projection({
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'posts_count': 'posts_count',
+})
+
+PROFILE = Projection({
+    'id': 'id',
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+    'posts_count': 'stats__posts_count',
+})
+
+
+def attach_comments(rows):
+    """Подставить в строки постов последние комментарии одним запросом.
+
+    На пост берётся не больше API_COMMENTS_PER_POST комментариев; если их
+    больше, comments_next — курсор для /posts/<id>/comments/?after=.
+    """
+    limit = settings.API_COMMENTS_PER_POST
+    names = ['id', 'author', 'text', 'created']
+    by_post = {row['id']: row for row in rows}
+    for row in rows:
+        row['comments'] = []
+        row['comments_next'] = None
+    # Коррелированный подзапрос с LIMIT: лишний комментарий — признак
+    # продолжения, остальные не читаются
+    first = Comment.objects.filter(post_id=OuterRef('post_id')).order_by(
+        *COMMENT_ORDERING).values('id')[:limit + 1]
+    comments = COMMENT.values(
+        Comment.objects.filter(post_id__in=list(by_post),
+                               id__in=Subquery(first)),
+        names + ['post']).order_by(*COMMENT_ORDERING)
+    paginator = CursorPaginator(Comment.objects.all(), limit,
+                                COMMENT_ORDERING)
+    last = {}
+    for comment in comments:
+        row = by_post[comment['post_id']]
+        if len(row['comments']) == limit:
+            row['comments_next'] = paginator.cursor_for(last[row['id']])
+            continue
+        row['comments'].append(COMMENT.render(comment, names))
+        last[row['id']] = comment
@@ -0,0 +1,126 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='api_author')
+        cls.reader = User.objects.create(username='api_reader')
+        cls.group = Group.objects.create(title='Группа API', slug='api')
+        cls.posts = [
+            Post.objects.create(text=f'Пост API {i}', author=cls.author,
+                                group=cls.group)
+            for i in range(5)
+        ]
+        Comment.objects.create(post=cls.posts[-1], author=cls.reader,
+                               text='Комментарий API')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_posts_cursor_pagination(self):
+        """Лента API листается курсором без пропусков и повторов."""
+        url = reverse('api_v1:posts')
+        seen = []
+        response = self.client.get(url, {'limit': 2})
+        while True:
+            data = response.json()
+            seen += [post['id'] for post in data['results']]
+            if not data['next_cursor']:
+                break
+            response = self.client.get(
+                url, {'limit': 2, 'after': data['next_cursor']})
+        self.assertEqual(seen, [post.id for post in reversed(
+            ApiTests.posts)])
+
+    def test_sparse_fields_and_comments(self):
+        """?fields= оставляет только нужные поля, comments подгружаются."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api_v1:posts'), {
+                'fields': 'id,author,comments', 'limit': 3})
+        self.assertEqual(len(queries), 2)
+        first = response.json()['results'][0]
+        self.assertEqual(set(first),
+                         {'id', 'author', 'comments', 'comments_next'})
+        self.assertEqual(first['author'], 'api_author')
+        self.assertEqual(first['comments'][0]['text'], 'Комментарий API')
+        self.assertIsNone(first['comments_next'])
+        response = self.client.get(reverse('api_v1:posts'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(API_COMMENTS_PER_POST=2)
+    def test_embedded_comments_are_limited(self):
+        """В пост встраиваются N комментариев и курсор к остальным."""
+        post = ApiTests.posts[0]
+        for i in range(5):
+            Comment.objects.create(post=post, author=ApiTests.reader,
+                                   text=f'Комментарий {i}')
+        detail = self.client.get(reverse('api_v1:post', args=[post.id]),
+                                 {'fields': 'id,comments'}).json()
+        self.assertEqual([comment['text'] for comment in detail['comments']],
+                         ['Комментарий 4', 'Комментарий 3'])
+        rest = self.client.get(
+            reverse('api_v1:post_comments', args=[post.id]),
+            {'after': detail['comments_next']}).json()
+        self.assertEqual([comment['text'] for comment in rest['results']],
+                         ['Комментарий 2', 'Комментарий 1', 'Комментарий 0'])
+
+    def test_objects(self):
+        """Группа, профиль, пост и комментарии доступны по своим адресам."""
+        post = ApiTests.posts[-1]
+        group = self.client.get(reverse('api_v1:group', args=['api']))
+        self.assertEqual(group.json()['posts_count'], 5)
+        profile = self.client.get(
+            reverse('api_v1:profile', args=['api_author']))
+        self.assertEqual(profile.json()['posts_count'], 5)
+        detail = self.client.get(reverse('api_v1:post', args=[post.id]))
+        self.assertEqual(detail.json()['comments_count'], 1)
+        comments = self.client.get(
+            reverse('api_v1:post_comments', args=[post.id]))
+        self.assertEqual(comments.json()['results'][0]['author'],
+                         'api_reader')
+        missing = self.client.get(reverse('api_v1:profile', args=['nobody']))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_etag_revalidation(self):
+        """Повтор с If-None-Match получает 304, пока лента не изменилась."""
+        url = reverse('api_v1:group_posts', args=['api'])
+        response = self.client.get(url)
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        Post.objects.create(text='Новый пост API', author=ApiTests.author,
+                            group=ApiTests.group)
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 200)
+
+    def test_profile_etag_follows_name(self):
+        """Смена имени автора даёт новый ответ профиля."""
+        url = reverse('api_v1:profile', args=[ApiTests.author.username])
+        response = self.client.get(url)
+        ApiTests.author.last_name = 'Толстой'
+        ApiTests.author.save()
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()['last_name'], 'Толстой')
+
+    def test_follow_feed(self):
+        """Лента подписок требует входа и отдаёт посты авторов."""
+        url = reverse('api_v1:follow')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        Follow.objects.create(user=ApiTests.reader, author=ApiTests.author)
+        self.client.force_login(ApiTests.reader)
+        response = self.client.get(url, {'fields': 'text'})
+        self.assertEqual(response.json()['results'][0],
+                         {'text': 'Пост API 4'})
+        again = self.client.get(url, {'fields': 'text'},
+                                HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
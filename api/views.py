@@ -0,0 +1,202 @@
+import hashlib
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                set_response_etag)
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+
+from posts import versions
+from posts.models import Comment, Group, Post, User
+from posts.pagination import (COMMENT_ORDERING, FEED_ORDERING,
+                              CursorPaginator, InvalidCursor)
+from posts.timeline import TimelineFeed, cursor_page
+
+from .projections import (COMMENT, GROUP, POST, PROFILE, InvalidFields,
+                          attach_comments)
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def _error(message, status=400):
+    return _json({'error': message}, status=status)
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        limit = settings.API_PAGE_SIZE
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def _attach_comments(rows, names):
+    # Курсор продолжения комментариев отдаётся вместе с ними
+    if 'comments' not in names or not rows:
+        return names
+    attach_comments(rows)
+    if 'comments_next' in names:
+        return names
+    return names + ['comments_next']
+
+
+def _page_data(page, projection, names):
+    rows = list(page)
+    names = _attach_comments(rows, names)
+    return {
+        'results': [projection.render(row, names) for row in rows],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def _cursor_list(request, queryset, projection, ordering):
+    try:
+        names = projection.select(request)
+    except InvalidFields as error:
+        return _error('Неизвестные поля: %s' % ', '.join(error.args[0]))
+    paginator = CursorPaginator(projection.values(queryset, names),
+                                _limit(request), ordering)
+    try:
+        page = paginator.page(after=request.GET.get('after') or None,
+                              before=request.GET.get('before') or None)
+    except InvalidCursor:
+        return _error('Неверный курсор')
+    return _json(_page_data(page, projection, names))
+
+
+def _object(request, queryset, projection):
+    try:
+        names = projection.select(request)
+    except InvalidFields as error:
+        return _error('Неизвестные поля: %s' % ', '.join(error.args[0]))
+    row = projection.values(queryset, names).first()
+    if row is None:
+        return _error('Не найдено', status=404)
+    names = _attach_comments([row], names)
+    return _json(projection.render(row, names))
+
+
+# Валидаторы: поколения лент из кеша, без чтения самих записей
+
+def _etag(request, *parts):
+    raw = '|'.join([request.get_full_path(), *map(str, parts)])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def posts_etag(request):
+    return _etag(request, versions.get_version(versions.GLOBAL))
+
+
+def group_etag(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True).first()
+    if group_id is None:
+        return None
+    return _etag(request, versions.get_version(
+        versions.group_scope(group_id)))
+
+
+def profile_etag(request, username):
+    state = User.objects.filter(username=username).values_list(
+        'id', 'stats__followers_count', 'stats__following_count',
+        'stats__posts_count').first()
+    if state is None:
+        return None
+    # Имя и фамилия профиля сдвигают поколение карточки, а не автора
+    return _etag(request, versions.get_version(
+        versions.author_scope(state[0]), versions.card_scope(state[0])),
+        *state)
+
+
+def post_etag(request, post_id):
+    # Правки поста и комментарии сдвигают поколение его автора
+    author_id = Post.objects.filter(id=post_id).values_list(
+        'author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return _etag(request, versions.get_version(
+        versions.author_scope(author_id)))
+
+
+def api_view(etag_func=None):
+    """GET-представление API с перепроверкой по ETag."""
+    def decorator(view):
+        if etag_func is not None:
+            view = condition(etag_func=etag_func)(view)
+        return require_GET(cache_control(no_cache=True)(view))
+    return decorator
+
+
+@api_view(posts_etag)
+def posts(request):
+    return _cursor_list(request, Post.objects.all(), POST, FEED_ORDERING)
+
+
+@api_view(group_etag)
+def group(request, slug):
+    return _object(request, Group.objects.filter(slug=slug), GROUP)
+
+
+@api_view(group_etag)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return _cursor_list(request, Post.objects.filter(group=group), POST,
+                        FEED_ORDERING)
+
+
+@api_view(profile_etag)
+def profile(request, username):
+    return _object(request, User.objects.filter(username=username), PROFILE)
+
+
+@api_view(profile_etag)
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return _cursor_list(request, Post.objects.filter(author=author), POST,
+                        FEED_ORDERING)
+
+
+@api_view(post_etag)
+def post(request, post_id):
+    return _object(request, Post.objects.filter(id=post_id), POST)
+
+
+@api_view(post_etag)
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('id'), id=post_id)
+    return _cursor_list(request, Comment.objects.filter(post_id=post_id),
+                        COMMENT, COMMENT_ORDERING)
+
+
+@api_view()
+def follow(request):
+    if not request.user.is_authenticated:
+        return _error('Нужна авторизация', status=401)
+    try:
+        names = POST.select(request)
+    except InvalidFields as error:
+        return _error('Неизвестные поля: %s' % ', '.join(error.args[0]))
+    feed = TimelineFeed(request.user)
+
+    def load(keys):
+        rows = {row['id']: row for row in POST.values(Post.objects.filter(
+            id__in=[post_id for _, post_id in keys]), names)}
+        return [rows[post_id] for _, post_id in keys if post_id in rows]
+
+    try:
+        page = cursor_page(feed, _limit(request),
+                           request.GET.get('after') or None,
+                           request.GET.get('before') or None, load=load)
+    except InvalidCursor:
+        return _error('Неверный курсор')
+    # Ленту подписок не описать поколениями, поэтому ETag — по телу ответа
+    response = set_response_etag(_json(_page_data(page, POST, names)))
+    patch_cache_control(response, private=True)
+    return get_conditional_response(request, etag=response['ETag'],
+                                    response=response)
@@ -0,0 +1,14 @@
+import pytest
+from django.conf import settings
+from django.test import override_settings
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_cache(tmp_path_factory):
+    """Тесты чистят кеш, поэтому у них свой файл L2, а не файл сервера."""
+    caches = {alias: dict(options)
+              for alias, options in settings.CACHES.items()}
+    caches['default']['LOCATION'] = str(
+        tmp_path_factory.mktemp('cache') / 'cache.sqlite3')
+    with override_settings(CACHES=caches):
+        yield
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Comment, Group, Post
+from . import search
+from .models import Comment, Group, Job, Post
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,6 +11,13 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
     verbose_name = 'пост'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту через индекс FTS5 вместо LIKE '%...%'
+        match = search.match_expression(search_term)
+        if match is None or not search.is_available():
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=search.matching_ids_sql(match)), False
+
 
 admin.site.register(Post, PostAdmin)
 
@@ -28,3 +36,13 @@ class CommentAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Comment, CommentAdmin)
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("pk", "task", "status", "priority", "attempts",
+                    "run_at")
+    list_filter = ("status", "task")
+    verbose_name = 'задача'
+
+
+admin.site.register(Job, JobAdmin)
@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from django.conf import settings
+        from PIL import Image
+
+        from . import signals  # noqa
+
+        # Защита от «бомб» распаковки для всех, кто открывает картинки
+        # через Pillow: sorl, миниатюры, ImageField
+        Image.MAX_IMAGE_PIXELS = settings.POST_IMAGE_MAX_PIXELS
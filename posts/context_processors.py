@@ -1,7 +1,13 @@
 import datetime as dt
 
+from django.conf import settings
+
 
 def year(request):
     now = dt.datetime.now()
     year = now.year
     return {"year": year}
+
+
+def live(request):
+    return {"live_enabled": settings.LIVE_ENABLED}
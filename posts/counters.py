@@ -0,0 +1,86 @@
+"""Денормализованные счётчики подписчиков, подписок, постов и комментариев.
+
+Счётчики меняются F()-выражениями в той же транзакции, что и запись,
+которая их затрагивает, поэтому параллельные запросы не теряют обновлений.
+Расхождения (например, после ручных правок в базе) исправляет команда
+rebuild_counters.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _add(queryset, **deltas):
+    queryset.update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def user_stats(user_id, **deltas):
+    _add(UserStats.objects.filter(user_id=user_id), **deltas)
+
+
+def group_posts(group_id, delta):
+    if group_id is not None:
+        _add(Group.objects.filter(pk=group_id), posts_count=delta)
+
+
+def post_comments(post_id, delta):
+    _add(Post.objects.filter(pk=post_id), comments_count=delta)
+
+
+def post_created(post):
+    user_stats(post.author_id, posts_count=1)
+    group_posts(post.group_id, 1)
+
+
+def post_deleted(post):
+    user_stats(post.author_id, posts_count=-1)
+    group_posts(post.group_id, -1)
+
+
+def post_moved(old_group_id, new_group_id):
+    if old_group_id != new_group_id:
+        group_posts(old_group_id, -1)
+        group_posts(new_group_id, 1)
+
+
+def follow_created(follow, delta=1):
+    user_stats(follow.author_id, followers_count=delta)
+    user_stats(follow.user_id, following_count=delta)
+
+
+def follow_deleted(follow):
+    follow_created(follow, delta=-1)
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def _batches(queryset, batch_size):
+    last = queryset.order_by('-pk').values_list('pk', flat=True).first()
+    for start in range(0, (last or 0) + 1, batch_size):
+        yield queryset.filter(pk__gte=start, pk__lt=start + batch_size)
+
+
+def rebuild(batch_size=1000):
+    """Пересчитать все счётчики по исходным таблицам диапазонами pk."""
+    missing = User.objects.filter(
+        stats__isnull=True).values_list('pk', flat=True)
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in missing],
+        batch_size=batch_size, ignore_conflicts=True)
+    for batch in _batches(UserStats.objects.all(), batch_size):
+        batch.update(followers_count=_count(Follow, 'author'),
+                     following_count=_count(Follow, 'user'),
+                     posts_count=_count(Post, 'author'))
+    for batch in _batches(Post.objects.all(), batch_size):
+        batch.update(comments_count=_count(Comment, 'post'))
+    for batch in _batches(Group.objects.all(), batch_size):
+        batch.update(posts_count=_count(Post, 'group'))
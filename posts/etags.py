@@ -0,0 +1,80 @@
+"""Валидаторы для условных GET-запросов к страницам лент и постов.
+
+ETag страницы собирается из поколений лент (см. versions), от которых она
+зависит, и из того, кто смотрит: имя в шапке, кнопки «Редактировать» и
+«Подписаться» у каждого свои. Поколения лежат в кеше, поэтому повторный
+запрос с If-None-Match стоит одного короткого запроса к базе, а не
+рендеринга. Last-Modified не отдаём: правка поста не меняет pub_date.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.fields import BooleanField
+
+from . import versions
+from .models import Follow, Group, Post, User
+
+
+def _etag(request, *parts):
+    user = request.user
+    raw = [request.get_full_path(),
+           str(user.pk) if user.is_authenticated else '-',
+           # Форма комментария несёт токен, привязанный к CSRF-куке
+           request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')]
+    raw += [str(part) for part in parts]
+    return hashlib.md5('|'.join(raw).encode()).hexdigest()
+
+
+def _author_state(request, username, **annotations):
+    # Счётчики в боковой панели и состояние подписки меняются без смены
+    # поколения ленты, поэтому входят в ETag напрямую
+    following = Value(False, output_field=BooleanField())
+    if request.user.is_authenticated:
+        following = Exists(Follow.objects.filter(
+            user=request.user, author=OuterRef('pk')))
+    return User.objects.filter(username=username).annotate(
+        viewer_follows=following, **annotations,
+    ).values_list('pk', 'stats__followers_count', 'stats__following_count',
+                  'stats__posts_count', 'viewer_follows',
+                  *annotations).first()
+
+
+def index_etag(request):
+    return _etag(request, versions.get_version(versions.GLOBAL))
+
+
+def group_etag(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True).first()
+    if group_id is None:
+        return None
+    return _etag(request, versions.get_version(
+        versions.group_scope(group_id)))
+
+
+def profile_etag(request, username):
+    state = _author_state(request, username)
+    if state is None:
+        return None
+    return _profile_etag(request, state)
+
+
+def _profile_etag(request, state):
+    # Имя автора в карточке меняется без смены поколения его ленты
+    scopes = [versions.author_scope(state[0]), versions.card_scope(state[0])]
+    if request.user.is_authenticated:
+        # Рекомендации зрителя: пересчёт и его собственные подписки
+        scopes += [versions.card_scope(request.user.pk),
+                   versions.SUGGESTIONS]
+    return _etag(request, versions.get_version(*scopes), *state)
+
+
+def post_etag(request, username, post_id):
+    # Правки поста и его комментарии сдвигают поколение автора. Без поста
+    # у этого автора ETag нет: представление ответит 404, а не 304
+    state = _author_state(request, username, has_post=Exists(
+        Post.objects.filter(pk=post_id, author=OuterRef('pk'))))
+    if state is None or not state[-1]:
+        return None
+    return _profile_etag(request, state)
@@ -0,0 +1,120 @@
+"""RSS и Atom для общей ленты, групп и авторов.
+
+Лента — последние SYNDICATION_ITEMS постов одним запросом с автором и
+группой. Готовый XML кешируется под поколением той же ленты, что и
+HTML-страницы (posts.versions), поэтому новый пост или правка сразу дают
+новую версию, а опрос без изменений не доходит до базы постов. ETag —
+то же поколение: агрегатор с If-None-Match получает 304.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from . import versions
+from .models import Post
+
+
+class LatestPostsFeed(Feed):
+    title = 'Yatube: последние записи'
+    description = 'Новые записи всех авторов'
+
+    def link(self, obj=None):
+        return reverse('index')
+
+    def posts(self, obj):
+        return Post.objects.feed()
+
+    def items(self, obj=None):
+        return self.posts(obj)[:settings.SYNDICATION_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).words(8)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('post', args=[item.author.username, item.id])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    def get_object(self, request, group):
+        return group
+
+    def title(self, obj):
+        return 'Yatube: %s' % obj.title
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('group', args=[obj.slug])
+
+    def posts(self, obj):
+        return obj.posts.feed()
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    def get_object(self, request, author):
+        return author
+
+    def title(self, obj):
+        return 'Yatube: @%s' % obj.username
+
+    def description(self, obj):
+        return 'Записи автора @%s' % obj.username
+
+    def link(self, obj):
+        return reverse('profile', args=[obj.username])
+
+    def posts(self, obj):
+        return obj.posts.feed()
+
+
+def _atom(feed_class):
+    return type('Atom' + feed_class.__name__, (feed_class,), {
+        'feed_type': Atom1Feed, 'subtitle': feed_class.description})
+
+
+ATOM = {feed_class: _atom(feed_class) for feed_class in (
+    LatestPostsFeed, GroupPostsFeed, AuthorPostsFeed)}
+
+
+def serve(request, kind, feed_class, scope, *args):
+    """Отдать ленту из кеша или собрать её, с проверкой If-None-Match."""
+    version = versions.get_version(scope)
+    etag = '"%s"' % hashlib.md5(
+        ('%s|%s' % (request.path, version)).encode()).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+    # В XML абсолютные ссылки, поэтому в ключе и хост со схемой
+    key = 'syndication:%s:%s' % (hashlib.md5(
+        request.build_absolute_uri(request.path).encode()).hexdigest(),
+        version)
+    cached = cache.get(key)
+    if cached is None:
+        if kind == 'atom':
+            feed_class = ATOM[feed_class]
+        rendered = feed_class()(request, *args)
+        cached = (rendered.content, rendered['Content-Type'])
+        cache.set(key, cached, settings.FEED_CACHE_TIMEOUT)
+    response = HttpResponse(cached[0], content_type=cached[1])
+    response['ETag'] = etag
+    return response
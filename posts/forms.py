@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import uploads
 from .models import Comment, Post
 
 
@@ -8,6 +10,30 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файл, отброшенный обработчиком загрузки, в поле не передаём:
+        # ImageField сообщил бы о битой картинке, а не о размере
+        self.rejected_image = self.files.get('image')
+        if getattr(self.rejected_image, 'rejected', False):
+            self.files = self.files.copy()
+            del self.files['image']
+        else:
+            self.rejected_image = None
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image = uploads.ingest(image)
+        return image
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.rejected_image is not None:
+            self.add_error('image',
+                           uploads.too_large_message(self.rejected_image))
+        return cleaned_data
+
     def clean_subject(self):
         data = self.cleaned_data['text']
         if data == '':
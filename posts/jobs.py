@@ -0,0 +1,175 @@
+"""Очередь фоновых задач в основной базе.
+
+enqueue() вставляет строку Job в текущей транзакции: задача появляется
+вместе с данными, ради которых поставлена, и пропадает при откате.
+Воркер (manage.py runworker) забирает задачи по приоритету: выбирает
+кандидата и помечает его условным UPDATE ... WHERE status = 'queued',
+так что два воркера одну задачу не получат. В PostgreSQL кандидаты
+выбираются с SKIP LOCKED, в SQLite BEGIN IMMEDIATE и так пропускает
+писателей по одному.
+
+Задача — любая функция модуля, аргументы — JSON. Периодические задачи
+из JOBS_PERIODIC ставятся на начало следующего интервала при запуске
+воркера и после каждого выполнения. Упавшая задача
+повторяется с экспоненциальной задержкой до max_attempts раз; задача
+упавшего воркера возвращается в очередь по истечении аренды JOBS_LEASE,
+поэтому задача может выполниться дважды и должна это переносить.
+"""
+import datetime as dt
+import json
+import logging
+import random
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def task_path(task):
+    if isinstance(task, str):
+        return task
+    return '%s.%s' % (task.__module__, task.__qualname__)
+
+
+def enqueue(task, *args, priority=0, key=None, delay=0, max_attempts=None):
+    """Поставить задачу в очередь; с ключом — не больше одной на ключ."""
+    fields = {
+        'task': task_path(task),
+        'args': json.dumps(args),
+        'priority': priority,
+        'run_at': timezone.now() + dt.timedelta(seconds=delay),
+        'max_attempts': max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    }
+    if key is None:
+        return Job.objects.create(**fields)
+    existing = Job.objects.filter(key=key).first()
+    if existing is not None:
+        return existing
+    try:
+        with transaction.atomic():
+            return Job.objects.create(key=key, **fields)
+    except IntegrityError:
+        # Ту же задачу только что поставил параллельный запрос
+        return Job.objects.get(key=key)
+
+
+def schedule_periodic(task=None):
+    """Поставить периодические задачи на начало следующего интервала.
+
+    Ключ — путь задачи и номер интервала, поэтому сколько бы воркеров ни
+    вызывали функцию, на интервал приходится один запуск.
+    """
+    tasks = settings.JOBS_PERIODIC
+    if task is not None:
+        tasks = {task: tasks[task]}
+    for path, interval in tasks.items():
+        slot = int(time.time() // interval) + 1
+        enqueue(path, key='%s:%s' % (path, slot),
+                delay=slot * interval - time.time())
+
+
+def backoff(attempts):
+    """Задержка перед повтором: 2, 4, 8... секунд с разбросом ±25%."""
+    delay = settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1)
+    return delay * random.uniform(0.75, 1.25)
+
+
+def claim():
+    """Забрать следующую задачу или None."""
+    now = timezone.now()
+    ready = (Q(status=Job.QUEUED, run_at__lte=now)
+             | Q(status=Job.RUNNING, locked_until__lt=now,
+                 attempts__lt=F('max_attempts')))
+    with transaction.atomic():
+        candidates = (Job.objects.filter(ready)
+                      .order_by('-priority', 'run_at', 'id'))
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        for job in candidates[:settings.JOBS_CLAIM_BATCH]:
+            claimed = Job.objects.filter(pk=job.pk).filter(ready).update(
+                status=Job.RUNNING, attempts=F('attempts') + 1,
+                locked_until=now + dt.timedelta(seconds=settings.JOBS_LEASE))
+            if claimed:
+                job.status = Job.RUNNING
+                job.attempts += 1
+                return job
+    fail_abandoned(now)
+    return None
+
+
+def fail_abandoned(now):
+    """Пометить failed задачи, чья последняя аренда истекла.
+
+    Задача, которая роняет воркер, до run() не доходит, поэтому попытки
+    проверяются здесь, а не только при ошибке.
+    """
+    abandoned = Job.objects.filter(status=Job.RUNNING, locked_until__lt=now,
+                                   attempts__gte=F('max_attempts'))
+    tasks = set(abandoned.values_list('task', flat=True))
+    if not tasks:
+        return
+    abandoned.update(status=Job.FAILED, locked_until=None, finished=now,
+                     last_error='Аренда истекла после последней попытки')
+    for task in tasks & set(settings.JOBS_PERIODIC):
+        schedule_periodic(task)
+
+
+def run(job):
+    """Выполнить забранную задачу и записать результат."""
+    try:
+        import_string(job.task)(*json.loads(job.args))
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Задача %s не выполнена', job)
+        if job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, last_error=error, locked_until=None,
+                run_at=timezone.now() + dt.timedelta(
+                    seconds=backoff(job.attempts)))
+            return False
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, last_error=error, locked_until=None,
+            finished=timezone.now())
+        done = False
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.DONE, locked_until=None, finished=timezone.now())
+        done = True
+    if job.task in settings.JOBS_PERIODIC:
+        schedule_periodic(job.task)
+    return done
+
+
+def work(stop=None, once=False):
+    """Цикл воркера: выполнять задачи, пока есть, иначе ждать.
+
+    once — выйти, когда очередь опустеет; stop — threading.Event.
+    """
+    stop = stop or threading.Event()
+    done = 0
+    while not stop.is_set():
+        job = claim()
+        if job is None:
+            if once:
+                break
+            stop.wait(settings.JOBS_POLL_INTERVAL)
+            continue
+        run(job)
+        done += 1
+    return done
+
+
+def purge(days):
+    """Удалить выполненные задачи старше days дней."""
+    return Job.objects.filter(
+        status=Job.DONE,
+        finished__lt=timezone.now() - dt.timedelta(days=days)).delete()[0]
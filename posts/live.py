@@ -0,0 +1,208 @@
+"""Живые ленты: события «N новых постов» через Server-Sent Events.
+
+Если живые ленты включены (LIVE_ENABLED), new_post публикует событие
+строкой LiveEvent в той же транзакции, что и пост. В каждом процессе один
+фоновый поток опрашивает таблицу раз в LIVE_POLL_INTERVAL секунд и
+раздаёт новые события очередям подключённых клиентов, так что тысяча
+открытых лент стоит одного запроса за интервал, а не тысячи. Без
+подписчиков поток завершается, поэтому старые события удаляет не он,
+а периодическая задача prune.
+
+Клиент получает только число новых постов своей ленты и по нему
+показывает кнопку «обновить»; страница при этом не перерисовывается.
+Соединение живёт не дольше LIVE_MAX_SECONDS, потом браузер сам
+переподключается с Last-Event-ID и получает пропущенное.
+"""
+import datetime as dt
+import json
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Follow, LiveEvent
+
+
+def publish(post):
+    if not settings.LIVE_ENABLED:
+        return
+    LiveEvent.objects.create(post_id=post.id, author_id=post.author_id,
+                             group_id=post.group_id)
+
+
+def prune():
+    """Удалить события старше LIVE_EVENT_TTL; периодическая задача."""
+    LiveEvent.objects.filter(created__lt=timezone.now() - dt.timedelta(
+        seconds=settings.LIVE_EVENT_TTL)).delete()
+
+
+class Subscription:
+    """Какие события нужны клиенту: все, одной группы или его авторов."""
+
+    def __init__(self, group_id=None, author_ids=None):
+        self.group_id = group_id
+        self.author_ids = author_ids
+
+    @classmethod
+    def following(cls, user):
+        return cls(author_ids=set(Follow.objects.filter(
+            user=user).values_list('author_id', flat=True)))
+
+    def matches(self, author_id, group_id):
+        if self.group_id is not None:
+            return group_id == self.group_id
+        if self.author_ids is not None:
+            return author_id in self.author_ids
+        return True
+
+    def missed(self, after, upto):
+        """Число событий в (after, upto] — пропущенных до переподключения."""
+        events = LiveEvent.objects.filter(id__gt=after, id__lte=upto)
+        if self.group_id is not None:
+            events = events.filter(group_id=self.group_id)
+        if self.author_ids is not None:
+            events = events.filter(author_id__in=self.author_ids)
+        return events.count()
+
+
+class Listener:
+    """Подключённый клиент: очередь событий после since."""
+
+    def __init__(self, subscription, since):
+        self.subscription = subscription
+        self.since = since
+        self.events = queue.Queue()
+
+
+class Hub:
+    def __init__(self, autostart=True):
+        self.autostart = autostart
+        self.last_id = None
+        self._listeners = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _latest(self):
+        return LiveEvent.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+
+    def subscribe(self, subscription):
+        """Новый Listener или None, если мест нет."""
+        if self.last_id is None:
+            latest = self._latest()
+        with self._lock:
+            if len(self._listeners) >= settings.LIVE_MAX_CONNECTIONS:
+                return None
+            if self.last_id is None:
+                self.last_id = latest
+            listener = Listener(subscription, self.last_id)
+            self._listeners.add(listener)
+            if self.autostart and self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='live-hub', daemon=True)
+                self._thread.start()
+        return listener
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            self._listeners.discard(listener)
+
+    def poll(self):
+        """Разослать события, появившиеся после прошлого опроса."""
+        events = list(LiveEvent.objects.filter(id__gt=self.last_id or 0)
+                      .order_by('id')
+                      .values_list('id', 'author_id', 'group_id'))
+        if not events:
+            return
+        with self._lock:
+            # Подписавшиеся после этой точки получат только новые события
+            self.last_id = events[-1][0]
+            listeners = list(self._listeners)
+        for listener in listeners:
+            count = sum(listener.subscription.matches(author_id, group_id)
+                        for event_id, author_id, group_id in events
+                        if event_id > listener.since)
+            if count:
+                listener.events.put((self.last_id, count))
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._listeners:
+                        self._thread = None
+                        return
+                self.poll()
+                time.sleep(settings.LIVE_POLL_INTERVAL)
+        finally:
+            connection.close()
+
+    def stream(self, listener, last_event_id=None):
+        """Тело ответа text/event-stream для подписанного клиента."""
+        try:
+            yield 'retry: %s\n\n' % (settings.LIVE_RETRY_SECONDS * 1000)
+            if last_event_id is not None and last_event_id < listener.since:
+                count = listener.subscription.missed(last_event_id,
+                                                     listener.since)
+                if count:
+                    yield _event(listener.since, count)
+            deadline = time.monotonic() + settings.LIVE_MAX_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    event = listener.events.get(
+                        timeout=settings.LIVE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    # Комментарий SSE клиент не видит, но он не даёт прокси
+                    # закрыть простаивающее соединение
+                    yield ': ping\n\n'
+                    continue
+                if event is None:
+                    # Клиент отключился (EventStreamResponse.cancel)
+                    return
+                yield _event(*event)
+        finally:
+            self.unsubscribe(listener)
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """Ответ text/event-stream, который всегда освобождает место в хабе.
+
+    finally в Hub.stream() не выполнится, если генератор так и не начали
+    читать (клиент ушёл раньше), а close() сервер вызывает всегда.
+    """
+
+    def __init__(self, hub, listener, last_event_id=None):
+        super().__init__(hub.stream(listener, last_event_id),
+                         content_type='text/event-stream')
+        self.hub = hub
+        self.listener = listener
+        self['Cache-Control'] = 'no-cache'
+        # nginx не должен копить события в буфере
+        self['X-Accel-Buffering'] = 'no'
+
+    def cancel(self):
+        """Клиент отключился: освободить место и разбудить поток.
+
+        Вызывается из другого потока, пока генератор ждёт события, поэтому
+        не закрывает его, а кладёт в очередь метку конца.
+        """
+        self.hub.unsubscribe(self.listener)
+        self.listener.events.put(None)
+
+    def close(self):
+        try:
+            self.hub.unsubscribe(self.listener)
+        finally:
+            super().close()
+
+
+def _event(last_id, count):
+    return 'id: %s\nevent: posts\ndata: %s\n\n' % (
+        last_id, json.dumps({'count': count}))
+
+
+hub = Hub()
@@ -0,0 +1,41 @@
+"""Отправка писем через очередь posts.jobs.
+
+QueuedEmailBackend ничего не отправляет сам: каждое письмо становится
+задачей, и запрос (например, сброс пароля) не ждёт SMTP-сервер. Воркер
+отправляет письмо бэкендом JOBS_EMAIL_BACKEND и при сбое повторяет.
+"""
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from . import jobs
+
+
+def send(fields):
+    message = EmailMultiAlternatives(
+        subject=fields['subject'], body=fields['body'],
+        from_email=fields['from_email'], to=fields['to'], cc=fields['cc'],
+        bcc=fields['bcc'], reply_to=fields['reply_to'],
+        headers=fields['headers'],
+        alternatives=[tuple(item) for item in fields['alternatives']],
+        connection=get_connection(settings.JOBS_EMAIL_BACKEND))
+    message.send()
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if message.attachments:
+                raise ValueError('Вложения очередью писем не поддерживаются')
+            jobs.enqueue(send, {
+                'subject': message.subject,
+                'body': message.body,
+                'from_email': message.from_email,
+                'to': message.to,
+                'cc': message.cc,
+                'bcc': message.bcc,
+                'reply_to': message.reply_to,
+                'headers': message.extra_headers,
+                'alternatives': getattr(message, 'alternatives', []),
+            }, priority=10)
+        return len(email_messages)
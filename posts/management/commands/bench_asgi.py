@@ -0,0 +1,105 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from yatube.asgi_handler import ASGIHandler, wsgi_environ
+
+from .bench_http import percentile
+
+
+def _scope(path):
+    return {'type': 'http', 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'query_string': b'',
+            'root_path': '', 'headers': [(b'host', b'localhost')],
+            'server': ('localhost', 80), 'client': ('127.0.0.1', 0)}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает, сколько одновременных соединений выдерживают '
+            'WSGI-путь и yatube.asgi при одинаковом числе потоков. Каждый '
+            'клиент медленный: --client-delay секунд уходит на приём его '
+            'запроса. В WSGI это время держит поток сервера, в ASGI — '
+            'только корутину')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=100)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--client-delay', type=float, default=0.2)
+        parser.add_argument('--path', default=None,
+                            help='Адрес страницы, по умолчанию главная')
+
+    def handle(self, *args, **options):
+        path = options['path'] or reverse('index')
+        wsgi = get_wsgi_application()
+        for name, run in (('wsgi', self._wsgi), ('asgi', self._asgi)):
+            started = time.perf_counter()
+            timings, statuses = run(wsgi, path, options)
+            elapsed = time.perf_counter() - started
+            errors = sum(status != 200 for status in statuses)
+            self.stdout.write(
+                '%-5s %4s соединений  %7.1f req/s  p50 %7.0f  p95 %7.0f мс  '
+                'ошибок %s' % (name, len(timings), len(timings) / elapsed,
+                               percentile(timings, 0.5),
+                               percentile(timings, 0.95), errors))
+
+    def _wsgi(self, wsgi, path, options):
+        delay = options['client_delay']
+
+        def handle_connection(arrived):
+            # Поток сервера ждёт медленного клиента, потом строит ответ
+            time.sleep(delay)
+            result = {}
+
+            def start_response(status, headers, exc_info=None):
+                result['status'] = int(status.split(' ', 1)[0])
+
+            environ = wsgi_environ(_scope(path), BytesIO())
+            chunks = wsgi(environ, start_response)
+            try:
+                b''.join(chunks)
+            finally:
+                chunks.close()
+            return (time.perf_counter() - arrived) * 1000, result['status']
+
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            arrived = time.perf_counter()
+            results = list(pool.map(handle_connection,
+                                    [arrived] * options['connections']))
+        return [timing for timing, _ in results], [
+            status for _, status in results]
+
+    def _asgi(self, wsgi, path, options):
+        handler = ASGIHandler(wsgi, threads=options['threads'])
+        delay = options['client_delay']
+
+        async def connection(arrived):
+            result = {}
+
+            async def receive():
+                # Медленный клиент: тело запроса приходит через delay секунд
+                await asyncio.sleep(delay)
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    result['status'] = message['status']
+
+            await handler(_scope(path), receive, send)
+            return (time.perf_counter() - arrived) * 1000, result['status']
+
+        async def main():
+            arrived = time.perf_counter()
+            return await asyncio.gather(*[
+                connection(arrived) for _ in range(options['connections'])])
+
+        try:
+            results = asyncio.run(main())
+        finally:
+            handler.shutdown()
+        return [timing for timing, _ in results], [
+            status for _, status in results]
@@ -0,0 +1,192 @@
+import json
+import math
+import random
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+SCENARIOS = ['index', 'group', 'profile', 'post', 'follow_index',
+             'new_post', 'add_comment']
+
+# Курсор из ссылки «Следующая» паджинатора
+NEXT_CURSOR = re.compile(r'[?&;]after=([\w-]+)')
+
+
+def percentile(samples, share):
+    """Значение по рангу: доля share выборки не больше него."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный замер представлений через тестовый клиент Django: '
+            'пропускная способность и задержки p50/p95/p99. Запросы new_post '
+            'и add_comment пишут в базу, поэтому запускайте на копии, '
+            'заполненной командой seed_data')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=20,
+                            help='Запросов на сценарий до замера')
+        parser.add_argument('--output', help='Записать результаты в JSON')
+        parser.add_argument('--baseline',
+                            help='JSON прошлого замера для сравнения')
+        parser.add_argument('--max-regression', type=float, default=None,
+                            help='Ошибка, если p95 вырос больше, чем на '
+                                 'столько процентов')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        names = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError('Неизвестные сценарии: %s'
+                               % ', '.join(sorted(unknown)))
+        self.random = random.Random(options['seed'])
+        self._prepare()
+        results = {}
+        # Записи идут от одного пользователя с одного адреса, поэтому
+        # обычные лимиты превратили бы замер в счёт ответов 429
+        with override_settings(RATE_LIMITS=settings.BENCH_RATE_LIMITS):
+            for name in names:
+                scenario = getattr(self, '_%s' % name)
+                for _ in range(options['warmup']):
+                    self._request(scenario)
+                results[name] = self._measure(scenario, options['requests'])
+                self._report(name, results[name])
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'scenarios': results}, output, indent=2)
+        if options['baseline']:
+            self._compare(results, options['baseline'],
+                          options['max_regression'])
+
+    def _prepare(self):
+        # Читатель с подписками, чтобы follow_index не был пустым
+        reader = (User.objects.filter(stats__following_count__gt=0)
+                  .order_by('-stats__following_count').first())
+        if reader is None:
+            raise CommandError('Нет подписок: сначала запустите seed_data')
+        self.client = Client()
+        self.client.force_login(reader)
+        self.posts = list(Post.objects.order_by('?').values_list(
+            'id', 'author__username')[:500])
+        self.slugs = list(Group.objects.values_list('slug', flat=True)[:500])
+        self.group_ids = list(Group.objects.values_list('id', flat=True)[:50])
+        self.index_cursor = None
+
+    def _request(self, scenario):
+        method, url, data = scenario()
+        if method == 'post':
+            return self.client.post(url, data)
+        response = self.client.get(url)
+        if scenario == self._index:
+            found = NEXT_CURSOR.search(response.content.decode())
+            self.index_cursor = found and found.group(1)
+        return response
+
+    def _measure(self, scenario, count):
+        timings = []
+        errors = queries = 0
+        started = time.perf_counter()
+        for _ in range(count):
+            begin = time.perf_counter()
+            try:
+                response = self._request(scenario)
+            except Exception:
+                errors += 1
+                continue
+            timings.append((time.perf_counter() - begin) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+            queries += getattr(response, 'query_count', 0)
+        elapsed = time.perf_counter() - started
+        if not timings:
+            raise CommandError('Все запросы завершились ошибкой')
+        return {
+            'requests': count,
+            'errors': errors,
+            'rps': round(count / elapsed, 1),
+            'p50': round(percentile(timings, 0.5), 2),
+            'p95': round(percentile(timings, 0.95), 2),
+            'p99': round(percentile(timings, 0.99), 2),
+            'queries': round(queries / len(timings), 1),
+        }
+
+    def _report(self, name, result):
+        self.stdout.write(
+            '%-13s %8.1f req/s  p50 %7.2f  p95 %7.2f  p99 %7.2f мс  '
+            'запросов к БД %4.1f  ошибок %s' % (
+                name, result['rps'], result['p50'], result['p95'],
+                result['p99'], result['queries'], result['errors']))
+
+    def _compare(self, results, path, max_regression):
+        with open(path) as source:
+            baseline = json.load(source)['scenarios']
+        regressed = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            changes = {
+                key: (result[key] - before[key]) / before[key] * 100
+                for key in ('rps', 'p50', 'p95', 'p99') if before[key]
+            }
+            self.stdout.write('%-13s %s' % (name, '  '.join(
+                '%s %+.1f%%' % item for item in changes.items())))
+            if (max_regression is not None
+                    and changes.get('p95', 0) > max_regression):
+                regressed.append(name)
+        if regressed:
+            raise CommandError('p95 вырос больше, чем на %s%%: %s' % (
+                max_regression, ', '.join(regressed)))
+
+    # Сценарии: метод, адрес и данные формы
+
+    def _post_target(self):
+        post_id, username = self.random.choice(self.posts)
+        return username, post_id
+
+    def _index(self):
+        # Читатель листает ленту курсором из прошлого ответа и время от
+        # времени возвращается к первой странице
+        url = reverse('index')
+        if self.index_cursor and self.random.random() < 0.6:
+            url += '?after=' + self.index_cursor
+        return 'get', url, None
+
+    def _group(self):
+        slug = self.random.choice(self.slugs)
+        return 'get', reverse('group', kwargs={'slug': slug}), None
+
+    def _profile(self):
+        username, _ = self._post_target()
+        return 'get', reverse('profile', kwargs={'username': username}), None
+
+    def _post(self):
+        username, post_id = self._post_target()
+        return 'get', reverse('post', kwargs={
+            'username': username, 'post_id': post_id}), None
+
+    def _follow_index(self):
+        return 'get', reverse('follow_index'), None
+
+    def _new_post(self):
+        data = {'text': 'Замер %s' % self.random.random()}
+        if self.group_ids and self.random.random() < 0.7:
+            data['group'] = self.random.choice(self.group_ids)
+        return 'post', reverse('new_post'), data
+
+    def _add_comment(self):
+        username, post_id = self._post_target()
+        return 'post', reverse('add_comment', kwargs={
+            'username': username, 'post_id': post_id}), {
+            'text': 'Комментарий %s' % self.random.random()}
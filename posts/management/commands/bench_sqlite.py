@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+CONFIGS = [
+    # Имя, движок, CONN_MAX_AGE, OPTIONS основной базы из настроек
+    # (у tuned — begin_immediate, как в работе)
+    ('stock', 'django.db.backends.sqlite3', 0, False),
+    ('tuned', 'yatube.sqlite', 600, True),
+]
+
+SCHEMA = [
+    'CREATE TABLE bench_author (id INTEGER PRIMARY KEY, '
+    'posts_count INTEGER NOT NULL)',
+    'CREATE TABLE bench_post (id INTEGER PRIMARY KEY, author_id INTEGER '
+    'NOT NULL, text TEXT NOT NULL, pub_date REAL NOT NULL)',
+    'CREATE INDEX bench_post_feed ON bench_post (pub_date, id)',
+]
+AUTHORS = 100
+
+
+def _read(cursor, worker, step):
+    # Как страница ленты: число записей и первая страница
+    cursor.execute('SELECT COUNT(*) FROM bench_post')
+    cursor.execute('SELECT id, author_id, text FROM bench_post '
+                   'ORDER BY pub_date DESC, id DESC LIMIT 10')
+    cursor.fetchall()
+
+
+def _write(cursor, worker, step):
+    # Как new_post: чтение, затем запись поста и счётчика в одной транзакции
+    author_id = (worker * 7 + step) % AUTHORS + 1
+    cursor.execute('SELECT posts_count FROM bench_author WHERE id = %s',
+                   [author_id])
+    cursor.fetchone()
+    cursor.execute('INSERT INTO bench_post (author_id, text, pub_date) '
+                   'VALUES (%s, %s, %s)',
+                   [author_id, 'Пост %s-%s' % (worker, step), time.time()])
+    cursor.execute('UPDATE bench_author SET posts_count = posts_count + 1 '
+                   'WHERE id = %s', [author_id])
+
+
+def _worker(alias, max_age, kind, worker, deadline, results):
+    connection = connections[alias]
+    operation = _write if kind == 'write' else _read
+    done = errors = step = 0
+    while time.monotonic() < deadline:
+        step += 1
+        try:
+            with transaction.atomic(using=alias):
+                with connection.cursor() as cursor:
+                    operation(cursor, worker, step)
+            done += 1
+        except OperationalError:
+            errors += 1
+        if not max_age:
+            # CONN_MAX_AGE = 0: соединение закрывается после каждого запроса
+            connection.close()
+    connection.close()
+    results.put((kind, done, errors))
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность чтения и записи SQLite '
+            'со штатным бэкендом и с yatube.sqlite при параллельных '
+            'процессах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Постов в базе перед замером')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='bench_sqlite_')
+        try:
+            for name, engine, max_age, production in CONFIGS:
+                alias = 'bench_%s' % name
+                db_options = {}
+                if production:
+                    db_options = dict(
+                        settings.DATABASES['default'].get('OPTIONS', {}))
+                connections.databases[alias] = {
+                    'ENGINE': engine,
+                    'NAME': os.path.join(directory, name + '.sqlite3'),
+                    'CONN_MAX_AGE': max_age,
+                    'OPTIONS': db_options,
+                }
+                connections.ensure_defaults(alias)
+                connections.prepare_test_settings(alias)
+                self._fill(alias, options['rows'])
+                self._report(name, self._run(alias, max_age, options),
+                             options['seconds'])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _fill(self, alias, rows):
+        with transaction.atomic(using=alias):
+            with connections[alias].cursor() as cursor:
+                for statement in SCHEMA:
+                    cursor.execute(statement)
+                cursor.executemany(
+                    'INSERT INTO bench_author (id, posts_count) '
+                    'VALUES (%s, 0)', [[i] for i in range(1, AUTHORS + 1)])
+                cursor.executemany(
+                    'INSERT INTO bench_post (author_id, text, pub_date) '
+                    'VALUES (%s, %s, %s)',
+                    [[i % AUTHORS + 1, 'Пост %s' % i, i]
+                     for i in range(rows)])
+        # Дочерние процессы откроют собственные соединения
+        connections[alias].close()
+
+    def _run(self, alias, max_age, options):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        deadline = time.monotonic() + options['seconds']
+        kinds = (['read'] * options['readers']
+                 + ['write'] * options['writers'])
+        processes = [
+            context.Process(target=_worker, args=(
+                alias, max_age, kind, worker, deadline, results))
+            for worker, kind in enumerate(kinds)
+        ]
+        for process in processes:
+            process.start()
+        totals = {'read': [0, 0], 'write': [0, 0]}
+        for _ in processes:
+            kind, done, errors = results.get()
+            totals[kind][0] += done
+            totals[kind][1] += errors
+        for process in processes:
+            process.join()
+        return totals
+
+    def _report(self, name, totals, seconds):
+        for kind in ('read', 'write'):
+            done, errors = totals[kind]
+            self.stdout.write(
+                '%-6s %-5s %9.0f оп/с  ошибок блокировки: %s' % (
+                    name, kind, done / seconds, errors))
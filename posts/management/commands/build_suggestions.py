@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «кого почитать» для всех пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Пользователей в одной транзакции')
+
+    def handle(self, *args, **options):
+        total = suggestions.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Рекомендаций: %s' % total))
@@ -0,0 +1,43 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, посты, комментарии и подписки '
+            'в NDJSON (файлы .gz сжимаются). Картинки копируются отдельно '
+            'вместе с MEDIA_ROOT')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл выгрузки или - для stdout')
+        parser.add_argument('--models', default='',
+                            help='Метки моделей через запятую, например '
+                                 'posts.post,posts.comment')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        labels = [label for label in options['models'].split(',') if label]
+        unknown = set(labels) - set(transfer.SPECS_BY_LABEL)
+        if unknown:
+            raise CommandError('Неизвестные модели: %s'
+                               % ', '.join(sorted(unknown)))
+        started = time.monotonic()
+
+        def progress(label, count):
+            if count is None:
+                self.stderr.write('%s выгружена' % label)
+            else:
+                self.stderr.write('%s: %s строк, %.0f с' % (
+                    label, count, time.monotonic() - started))
+
+        if options['output'] == '-':
+            transfer.export(sys.stdout.buffer, labels,
+                            options['chunk_size'], progress)
+            return
+        with transfer.open_file(options['output'], 'wb') as stream:
+            transfer.export(stream, labels, options['chunk_size'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            'Выгрузка записана в %s' % options['output']))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails, versions
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры для уже загруженных картинок постов'
+
+    def handle(self, *args, **options):
+        names = (Post.objects.exclude(image='')
+                 .values_list('image', flat=True).distinct())
+        done = 0
+        for name in names.iterator():
+            try:
+                thumbnails.generate(name)
+            except Exception as error:
+                self.stderr.write('%s: %s' % (name, error))
+                continue
+            done += 1
+        versions.bump(versions.GLOBAL)
+        self.stdout.write(self.style.SUCCESS(
+            'Миниатюры готовы для картинок: %s' % done))
@@ -0,0 +1,46 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает NDJSON из export_data пачками. Прерванную загрузку '
+            'можно перезапустить той же командой: она продолжит с '
+            'сохранённой позиции. Повторная загрузка уже загруженного файла '
+            'создаст дубли постов и комментариев')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл выгрузки (.ndjson или .gz)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--no-timelines', action='store_true',
+                            help='Не заполнять ленты подписок при загрузке')
+        parser.add_argument('--restart', action='store_true',
+                            help='Забыть сохранённую позицию и начать заново')
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['input'])
+        if not os.path.exists(path):
+            raise CommandError('Нет файла %s' % path)
+        importer = transfer.Importer(path, options['batch_size'],
+                                     deliver=not options['no_timelines'])
+        if options['restart']:
+            importer.finish()
+        position, rows = importer.checkpoint()
+        if position:
+            self.stderr.write('Продолжаем с байта %s, загружено строк: %s'
+                              % (position, rows))
+        started = time.monotonic()
+        resumed_rows = rows
+
+        def progress(label, count):
+            elapsed = time.monotonic() - started
+            self.stderr.write('%s: %s строк, %.0f строк/с' % (
+                label, count, (count - resumed_rows) / max(elapsed, 1e-6)))
+
+        importer.run(progress)
+        self.stdout.write(self.style.SUCCESS(
+            'Загружено строк: %s, пропущено без связанных записей: %s' % (
+                importer.rows, importer.skipped)))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики подписчиков, подписок, постов '
+            'и комментариев по исходным таблицам')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Размер диапазона pk в одном UPDATE')
+
+    def handle(self, *args, **options):
+        counters.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts import search
+from posts.models import Post
+
+SHADOW_TABLE = search.FTS_TABLE + '_new'
+PROGRESS_TABLE = SHADOW_TABLE + '_progress'
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов пачками по id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Число id в одной пачке')
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite')
+        batch_size = options['batch_size']
+        # Новый индекс строится рядом со старым, каждая пачка — своя короткая
+        # транзакция, так что писатели не ждут всей перестройки, а поиск
+        # до подмены идёт по старому индексу. Триггеры теневого индекса
+        # срабатывают только для уже проиндексированных id (меньше next_id),
+        # остальные посты пачка прочитает сама.
+        with connection.cursor() as cursor:
+            self._drop_shadow(cursor)
+            with transaction.atomic():
+                cursor.execute('CREATE TABLE %s (next_id integer NOT NULL)'
+                               % PROGRESS_TABLE)
+                cursor.execute('INSERT INTO %s (next_id) VALUES (0)'
+                               % PROGRESS_TABLE)
+                for statement in search.index_sql(
+                        search.CREATE_SQL, table=SHADOW_TABLE,
+                        when='{row}.id < (SELECT next_id FROM %s)'
+                        % PROGRESS_TABLE):
+                    cursor.execute(statement)
+            last = self._last_id()
+            start = 0
+            while start <= last:
+                with transaction.atomic():
+                    self._index(cursor, start, start + batch_size)
+                start += batch_size
+                self.stdout.write('Проиндексировано до id %s из %s'
+                                  % (min(start - 1, last), last))
+            # Подмена: дописать посты, созданные во время перестройки, и
+            # переименовать теневой индекс в рабочий
+            with transaction.atomic():
+                self._index(cursor, start, self._last_id() + 1)
+                self._drop(cursor, SHADOW_TABLE, search.DROP_SQL[:-1])
+                self._drop(cursor, search.FTS_TABLE, search.DROP_SQL)
+                cursor.execute('ALTER TABLE %s RENAME TO %s'
+                               % (SHADOW_TABLE, search.FTS_TABLE))
+                for statement in search.index_sql(search.CREATE_SQL):
+                    cursor.execute(statement)
+            cursor.execute("INSERT INTO {0}({0}) VALUES ('optimize')"
+                           .format(search.FTS_TABLE))
+        self.stdout.write(self.style.SUCCESS('Индекс поиска перестроен'))
+
+    def _last_id(self):
+        return Post.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+
+    def _index(self, cursor, start, stop):
+        if stop > start:
+            search.index_range(cursor, start, stop, table=SHADOW_TABLE)
+            cursor.execute('UPDATE %s SET next_id = %%s' % PROGRESS_TABLE,
+                           [stop])
+
+    def _drop(self, cursor, table, statements):
+        for statement in search.index_sql(statements, table=table):
+            cursor.execute(statement)
+        cursor.execute('DROP TABLE IF EXISTS %s' % PROGRESS_TABLE)
+
+    def _drop_shadow(self, cursor):
+        """Удалить теневой индекс, оставшийся от прерванной перестройки."""
+        self._drop(cursor, SHADOW_TABLE, search.DROP_SQL)
@@ -0,0 +1,46 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts import versions
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную SQLite-базу в реплики из DATABASE_REPLICAS '
+            'через backup API; с --interval повторяет копирование')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Период обновления в секундах; 0 — один раз')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Копирование поддерживается только для SQLite')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены (YATUBE_REPLICA_DB)')
+        while True:
+            started = time.monotonic()
+            self.refresh()
+            self.stdout.write('Реплики обновлены за %.2f с' % (
+                time.monotonic() - started))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def refresh(self):
+        source = connections['default']
+        source.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'],
+                                     timeout=20)
+            try:
+                # Копия согласована: backup читает снимок исходной базы,
+                # а читатели реплики видят либо старую, либо новую версию
+                source.connection.backup(target)
+            finally:
+                target.close()
+        # Страницы, собранные по прежней копии, больше не годятся
+        versions.bump_now(versions.REPLICA)
@@ -0,0 +1,89 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import jobs
+
+
+def _thread(stop, once, results):
+    try:
+        results.append(jobs.work(stop, once=once))
+    finally:
+        connection.close()
+
+
+def _threads(count, stop, once):
+    results = []
+    threads = [threading.Thread(target=_thread, args=(stop, once, results),
+                                name='worker-%s' % number)
+               for number in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(results)
+
+
+def _process(threads, once):
+    # Дочерний процесс открывает собственные соединения
+    connection.close()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    signal.signal(signal.SIGINT, lambda *args: stop.set())
+    _threads(threads, stop, once)
+
+
+class Command(BaseCommand):
+    help = ('Выполняет задачи из очереди posts.jobs. Останавливается по '
+            'SIGTERM/SIGINT, дав текущим задачам завершиться')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2,
+                            help='Потоков в каждом процессе')
+        parser.add_argument('--processes', type=int, default=0,
+                            help='Процессов; 0 — работать в этом процессе')
+        parser.add_argument('--once', action='store_true',
+                            help='Выйти, когда очередь опустеет')
+        parser.add_argument('--purge-days', type=int, default=None,
+                            help='Сначала удалить выполненные задачи '
+                                 'старше стольких дней')
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            self.stdout.write('Удалено выполненных задач: %s'
+                              % jobs.purge(options['purge_days']))
+        jobs.schedule_periodic()
+        if options['processes']:
+            self._processes(options)
+            return
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *args: stop.set())
+            signal.signal(signal.SIGINT, lambda *args: stop.set())
+        done = _threads(options['threads'], stop, options['once'])
+        self.stdout.write(self.style.SUCCESS('Выполнено задач: %s' % done))
+
+    def _processes(self, options):
+        context = multiprocessing.get_context('fork')
+        connection.close()
+        processes = [
+            context.Process(target=_process,
+                            args=(options['threads'], options['once']))
+            for _ in range(options['processes'])
+        ]
+
+        def stop(*args):
+            # Дочерние процессы получают SIGTERM и доделывают текущие задачи
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
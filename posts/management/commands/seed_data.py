@@ -0,0 +1,196 @@
+import datetime as dt
+import itertools
+import random
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from posts import counters, thumbnails, timeline
+from posts.models import Comment, Follow, Group, Post, User
+from posts.transfer import bulk_create_dated
+
+WORDS = (
+    'кот собака утро вечер город море лес река дорога книга музыка фильм '
+    'работа отпуск погода снег дождь солнце кофе чай друг семья школа '
+    'проект код релиз тест база запрос страница лента подписка новость '
+    'фото картинка выставка концерт поезд самолёт горы озеро парк сад '
+    'ёжик весна лето осень зима праздник ужин завтрак прогулка идея'
+).split()
+
+
+def zipf_weights(count, skew):
+    """Накопленные веса степенного закона: первый элемент самый популярный."""
+    return list(itertools.accumulate(
+        1 / rank ** skew for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными для нагрузочных замеров: '
+            'популярность авторов и групп распределена по степенному закону')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows-per-user', type=float, default=20,
+                            help='Среднее число подписок пользователя')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель степенного закона популярности')
+        parser.add_argument('--images', type=float, default=0.1,
+                            help='Доля постов с картинкой')
+        parser.add_argument('--image-pool', type=int, default=8,
+                            help='Сколько разных картинок сгенерировать')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты')
+        parser.add_argument('--prefix', default='seed_',
+                            help='Префикс имён пользователей и групп')
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError('Пользователи с префиксом %s уже есть' % prefix)
+        users = self._users(prefix)
+        groups = self._groups(prefix)
+        self._follows(users)
+        posts = self._posts(users, groups, self._images(prefix))
+        self._comments(users, posts)
+        # Сигналы при bulk_create не срабатывают
+        counters.rebuild()
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            'Создано: пользователей %s, групп %s, постов %s, комментариев %s, '
+            'подписок %s' % (len(users), len(groups), len(posts),
+                             options['comments'], Follow.objects.count())))
+
+    def _log(self, message, *args):
+        self.stderr.write(message % args)
+
+    def _pick(self, population, weights, k=1):
+        return self.random.choices(population, cum_weights=weights, k=k)
+
+    def _numbered(self, model, objects):
+        """Сохранить пачками с заранее известными pk (SQLite их не вернёт)."""
+        start = model.objects.aggregate(top=Max('pk'))['top'] or 0
+        for number, obj in enumerate(objects, start + 1):
+            obj.pk = number
+        for first in range(0, len(objects), self.batch_size):
+            batch = objects[first:first + self.batch_size]
+            with transaction.atomic():
+                bulk_create_dated(model, batch)
+                if model is Post:
+                    timeline.fan_out_many(batch)
+            self._log('%s: %s из %s', model._meta.label_lower,
+                      first + len(batch), len(objects))
+        return objects
+
+    def _users(self, prefix):
+        password = make_password(self.options['password'])
+        now = timezone.now()
+        User.objects.bulk_create([
+            User(username='%s%s' % (prefix, number), password=password,
+                 date_joined=now)
+            for number in range(self.options['users'])
+        ], batch_size=self.batch_size)
+        # Самые популярные авторы — в начале списка
+        return list(User.objects.filter(username__startswith=prefix)
+                    .order_by('pk').values_list('pk', flat=True))
+
+    def _groups(self, prefix):
+        Group.objects.bulk_create([
+            Group(title='Группа %s' % number,
+                  slug='%s%s' % (prefix.replace('_', '-'), number),
+                  description=' '.join(self.random.sample(WORDS, 10)))
+            for number in range(self.options['groups'])
+        ])
+        return list(Group.objects.filter(
+            slug__startswith=prefix.replace('_', '-'))
+            .order_by('pk').values_list('pk', flat=True))
+
+    def _follows(self, users):
+        weights = zipf_weights(len(users), self.options['skew'])
+        mean = self.options['follows_per_user']
+        follows = []
+        for user in users:
+            count = min(len(users) - 1,
+                        int(self.random.expovariate(1 / mean)) if mean else 0)
+            authors = set()
+            # Популярных авторов выбирают чаще; повторы отбрасываются
+            for _ in range(count * 3):
+                if len(authors) >= count:
+                    break
+                author = self._pick(users, weights)[0]
+                if author != user:
+                    authors.add(author)
+            follows.extend(Follow(user_id=user, author_id=author)
+                           for author in authors)
+        Follow.objects.bulk_create(follows, batch_size=self.batch_size)
+        self._log('posts.follow: %s', len(follows))
+
+    def _images(self, prefix):
+        names = []
+        if not self.options['images']:
+            return names
+        for number in range(self.options['image_pool']):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            size = self.random.choice([(1200, 800), (800, 1200), (1024, 1024)])
+            buffer = BytesIO()
+            Image.new('RGB', size, color).save(buffer, 'WEBP', quality=80)
+            name = default_storage.save(
+                'posts/%s%s.webp' % (prefix, number),
+                ContentFile(buffer.getvalue()))
+            thumbnails.generate(name)
+            names.append(name)
+        return names
+
+    def _text(self):
+        return ' '.join(self.random.choices(
+            WORDS, k=self.random.randint(5, 60))).capitalize()
+
+    def _posts(self, users, groups, images):
+        author_weights = zipf_weights(len(users), self.options['skew'])
+        group_weights = zipf_weights(len(groups), self.options['skew'])
+        now = timezone.now()
+        seconds = self.options['days'] * 24 * 3600
+        posts = []
+        for author in self._pick(users, author_weights, self.options['posts']):
+            group = None
+            if groups and self.random.random() < 0.7:
+                group = self._pick(groups, group_weights)[0]
+            image = None
+            if images and self.random.random() < self.options['images']:
+                image = self.random.choice(images)
+            posts.append(Post(
+                text=self._text(), author_id=author, group_id=group,
+                image=image, pub_date=now - dt.timedelta(
+                    seconds=self.random.uniform(0, seconds))))
+        return self._numbered(Post, posts)
+
+    def _comments(self, users, posts):
+        if not posts:
+            return
+        # Обсуждают в основном посты популярных авторов
+        weights = zipf_weights(len(posts), self.options['skew'])
+        ranked = sorted(posts, key=lambda post: post.author_id)
+        now = timezone.now()
+        self._numbered(Comment, [
+            Comment(post_id=post.pk, author_id=self.random.choice(users),
+                    text=self._text(),
+                    created=min(now, post.pub_date + dt.timedelta(
+                        minutes=self.random.randint(1, 600))))
+            for post in self._pick(ranked, weights, self.options['comments'])
+        ])
@@ -0,0 +1,94 @@
+"""Учёт SQL-запросов по представлениям и проверка бюджетов.
+
+Middleware считает запросы и суммарное время SQL на каждый ответ и
+складывает их по имени URL (index, group, profile, ...). Для имён из
+QUERY_BUDGETS число запросов сравнивается с бюджетом: превышение пишется
+в лог, а при QUERY_BUDGET_RAISE (по умолчанию в DEBUG и в тестах)
+становится исключением, чтобы лишний запрос из шаблона не прошёл ревью.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """execute_wrapper, считающий запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def query_stats():
+    """Накопленная статистика: имя URL → запросы, время SQL, ответы."""
+    with _stats_lock:
+        return {name: dict(values) for name, values in _stats.items()}
+
+
+def reset_query_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _record(view_name, counter):
+    with _stats_lock:
+        values = _stats.setdefault(view_name, {
+            'requests': 0, 'queries': 0, 'sql_time': 0.0,
+            'max_queries': 0})
+        values['requests'] += 1
+        values['queries'] += counter.count
+        values['sql_time'] += counter.duration
+        values['max_queries'] = max(values['max_queries'], counter.count)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(counter))
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+        view_name = match.view_name
+        _record(view_name, counter)
+        budget = settings.QUERY_BUDGETS.get(view_name)
+        # Тестам и отладочной панели нужны цифры конкретного ответа
+        response.query_count = counter.count
+        response.query_budget = budget
+        if settings.DEBUG:
+            response['Server-Timing'] = 'sql;dur=%.1f;desc="%s queries"' % (
+                counter.duration * 1000, counter.count)
+        if budget is not None and counter.count > budget:
+            message = '%s: %s SQL-запросов при бюджете %s (%s)' % (
+                view_name, counter.count, budget, request.get_full_path())
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,76 @@
+# Generated by Django 2.2.6 on 2026-10-17 07:15
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def _count(model, field):
+    return Coalesce(models.Subquery(
+        model.objects.filter(**{field: models.OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=models.Count('pk')).values('total')
+    ), 0)
+
+
+def _batches(queryset, batch_size):
+    last = queryset.order_by('-pk').values_list('pk', flat=True).first()
+    for start in range(0, (last or 0) + 1, batch_size):
+        yield queryset.filter(pk__gte=start, pk__lt=start + batch_size)
+
+
+def fill_counters(apps, schema_editor):
+    # Копия posts.counters.rebuild на исторических моделях: код приложения
+    # со временем меняется, а миграция должна работать со схемой 0013
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserStats = apps.get_model('posts', 'UserStats')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Group = apps.get_model('posts', 'Group')
+    batch_size = 1000
+    missing = User.objects.filter(
+        stats__isnull=True).values_list('pk', flat=True)
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in missing],
+        batch_size=batch_size, ignore_conflicts=True)
+    for batch in _batches(UserStats.objects.all(), batch_size):
+        batch.update(followers_count=_count(Follow, 'author'),
+                     following_count=_count(Follow, 'user'),
+                     posts_count=_count(Post, 'author'))
+    for batch in _batches(Post.objects.all(), batch_size):
+        batch.update(comments_count=_count(Comment, 'post'))
+    for batch in _batches(Group.objects.all(), batch_size):
+        batch.update(posts_count=_count(Post, 'group'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0012_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('followers_count', models.IntegerField(default=0)),
+                ('following_count', models.IntegerField(default=0)),
+                ('posts_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
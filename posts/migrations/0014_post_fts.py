@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# SQL индекса на момент 0014, а не из posts.search: код приложения со
+# временем меняется, а миграция должна создавать ту же схему
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_ai AFTER INSERT "
+    "ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(rowid, text) "
+    "VALUES (new.id, replace(replace(new.text, 'ё', 'е'), 'Ё', 'Е')); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_ad AFTER DELETE "
+    "ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, "
+    "replace(replace(old.text, 'ё', 'е'), 'Ё', 'Е')); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_au AFTER UPDATE OF text "
+    "ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, "
+    "replace(replace(old.text, 'ё', 'е'), 'Ё', 'Е')); "
+    "INSERT INTO posts_post_fts(rowid, text) "
+    "VALUES (new.id, replace(replace(new.text, 'ё', 'е'), 'Ё', 'Е')); END",
+    "INSERT INTO posts_post_fts(rowid, text) "
+    "SELECT id, replace(replace(text, 'ё', 'е'), 'Ё', 'Е') FROM posts_post",
+]
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS posts_post_fts_ai',
+    'DROP TRIGGER IF EXISTS posts_post_fts_ad',
+    'DROP TRIGGER IF EXISTS posts_post_fts_au',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+
+def _execute(statements):
+    def operation(apps, schema_editor):
+        # FTS5 есть только в SQLite; на других базах поиск идёт по подстроке
+        if schema_editor.connection.vendor == 'sqlite':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(_execute(CREATE_SQL), _execute(DROP_SQL)),
+    ]
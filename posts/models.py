@@ -10,12 +10,25 @@ class Group(models.Model):
     slug = models.SlugField(unique=True)
     description = models.TextField(verbose_name="Описание",
                                    help_text='Дайте короткое описание группы')
+    # Счётчик постов группы, поддерживается posts.counters
+    posts_count = models.IntegerField(default=0, editable=False)
     verbose_name = "группа"
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Выборка для карточек ленты (post_item.html).
+
+        Автор и группа приходят тем же запросом, число комментариев хранится
+        в самом посте, так что страница ленты стоит фиксированное число
+        запросов.
+        """
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name="Текст", help_text='Напишите пост')
     pub_date = models.DateTimeField("Дата публикации",
@@ -35,10 +48,23 @@ class Post(models.Model):
                               upload_to='posts/',
                               blank=True, null=True,
                               help_text='Добавьте изображение')
+    # Счётчик комментариев, поддерживается posts.counters
+    comments_count = models.IntegerField(default=0, editable=False)
     verbose_name = "пост"
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pub_date']
+        # Индексы под курсорную пагинацию лент по (pub_date, id)
+        indexes = [
+            models.Index(fields=['pub_date', 'id'],
+                         name='post_feed_idx'),
+            models.Index(fields=['group', 'pub_date', 'id'],
+                         name='post_group_feed_idx'),
+            models.Index(fields=['author', 'pub_date', 'id'],
+                         name='post_author_feed_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -62,6 +88,9 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        # Индекс под курсорную пагинацию комментариев поста
+        indexes = [models.Index(fields=['post', 'created', 'id'],
+                                name='comment_post_feed_idx')]
 
     def __str__(self):
         return self.text[:10]
@@ -78,3 +107,125 @@ class Follow(models.Model):
     class Meta:
         constraints = [models.UniqueConstraint(fields=['user', 'author'],
                                                name='unique_follow')]
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост, доставленный подписчику."""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name="timeline")
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name="timeline_entries")
+    # Копия post.pub_date: страница ленты читается одним проходом
+    # по индексу (user, pub_date, post) без обращения к таблице постов
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'post'],
+                                               name='unique_timeline_entry')]
+        indexes = [models.Index(fields=['user', 'pub_date', 'post'],
+                                name='timeline_user_idx')]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя для профиля и сайдбара."""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name="stats")
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    posts_count = models.IntegerField(default=0)
+
+
+class LiveEvent(models.Model):
+    """Событие «новый пост» для живых лент (posts.live).
+
+    Таблица служит брокером между процессами: публикация — вставка строки,
+    подписчики каждого процесса узнают о ней одним опросом по id. Внешних
+    ключей нет: старые события удаляются, не дожидаясь постов.
+    """
+    post_id = models.IntegerField()
+    author_id = models.IntegerField()
+    group_id = models.IntegerField(null=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди posts.jobs."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'в очереди'), (RUNNING, 'выполняется'),
+                (DONE, 'выполнена'), (FAILED, 'не удалась')]
+
+    # Путь к функции, например posts.thumbnails.generate
+    task = models.CharField(max_length=200)
+    # Позиционные аргументы списком JSON
+    args = models.TextField(default='[]')
+    # Больше — раньше
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()
+    # Пока срок не вышел, задачу выполняет воркер; после — её можно взять
+    # снова: воркер, скорее всего, упал
+    locked_until = models.DateTimeField(null=True, blank=True)
+    # Повторная постановка с тем же ключом возвращает прежнюю задачу
+    key = models.CharField(max_length=200, unique=True, null=True,
+                           blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'priority', 'run_at'],
+                                name='job_queue_idx')]
+
+    def __str__(self):
+        return '%s #%s' % (self.task, self.pk)
+
+
+class Suggestion(models.Model):
+    """Кого почитать: заранее посчитанные рекомендации (posts.suggestions)."""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name="suggestions")
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name="+")
+    # Место в списке пользователя, с нуля
+    rank = models.SmallIntegerField()
+    score = models.FloatField()
+    # Время пересчёта: строки прошлых пересчётов удаляются по нему
+    built = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'author'],
+                                               name='unique_suggestion')]
+        indexes = [models.Index(fields=['user', 'rank'],
+                                name='suggestion_user_idx')]
+
+
+class TrendingScore(models.Model):
+    """Затухающая активность поста для популярного (posts.trending)."""
+    post = models.OneToOneField(Post,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name="trending")
+    # Копия post.group_id: топ группы читается по индексу без постов
+    group_id = models.IntegerField(null=True)
+    # log2 активности плюс время в периодах полураспада: порядок по heat
+    # совпадает с порядком по затухающей активности в любой момент
+    heat = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['heat'], name='trending_heat_idx'),
+            models.Index(fields=['group_id', 'heat'],
+                         name='trending_group_idx'),
+        ]
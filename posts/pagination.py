@@ -0,0 +1,211 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+# Порядок ленты: по дате публикации, при совпадении дат — по id,
+# чтобы курсор однозначно указывал место в ленте
+FEED_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('-created', '-id')
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """Страница курсорной пагинации.
+
+    Повторяет интерфейс django.core.paginator.Page, который нужен
+    шаблонам, но не знает ни номера страницы, ни общего числа записей.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page of %s items>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self.has_next() and self.object_list:
+            # object_list может быть QuerySet: отрицательный индекс он не
+            # принимает, а len() берёт уже прочитанные строки
+            return self.paginator.cursor_for(
+                self.object_list[len(self.object_list) - 1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous() and self.object_list:
+            return self.paginator.cursor_for(self.object_list[0])
+        return None
+
+
+class CursorPaginator:
+    """Keyset-пагинация по набору полей упорядочивания.
+
+    Вместо OFFSET и COUNT(*) строит условие «строго после/до курсора»
+    по тем же полям, по которым отсортирована выборка, поэтому стоимость
+    страницы не зависит от её глубины.
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        self.ordering = tuple(ordering)
+        self.object_list = object_list.order_by(*self.ordering)
+        self.per_page = int(per_page)
+        self.model = object_list.model
+
+    def _fields(self):
+        for name in self.ordering:
+            descending = name.startswith('-')
+            yield name.lstrip('-'), descending
+
+    def _value_string(self, obj, name):
+        field = self.model._meta.get_field(name)
+        if isinstance(obj, dict):
+            # Строка из values(): оборачиваем в экземпляр ради сериализации
+            obj = self.model(**{field.attname: obj[name]})
+        return field.value_to_string(obj)
+
+    def cursor_for(self, obj):
+        values = [self._value_string(obj, name) for name, _ in self._fields()]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            fields = list(self._fields())
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [
+                self.model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(fields, values)
+            ]
+        except Exception:
+            raise InvalidCursor(cursor)
+
+    def _seek(self, values, forward):
+        # (a, b) после (x, y) при убывании: a < x OR (a = x AND b < y)
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self._fields(), values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{'%s__%s' % (name, lookup): value})
+            equal[name] = value
+        return condition
+
+    def page(self, after=None, before=None):
+        if before is not None:
+            values = self.decode_cursor(before)
+            reverse = [
+                name[1:] if name.startswith('-') else '-' + name
+                for name in self.ordering
+            ]
+            rows = list(self.object_list
+                        .filter(self._seek(values, forward=False))
+                        .order_by(*reverse)[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            return CursorPage(rows, self, True, has_previous)
+        queryset = self.object_list
+        if after is not None:
+            queryset = queryset.filter(
+                self._seek(self.decode_cursor(after), forward=True))
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self, has_next,
+                          after is not None)
+
+    def get_page(self, after=None, before=None):
+        try:
+            return self.page(after=after, before=before)
+        except InvalidCursor:
+            return self.page()
+
+
+def page_number(request):
+    """Номер из старой ссылки ?page=N или None."""
+    try:
+        number = int(request.GET.get('page', ''))
+    except ValueError:
+        return None
+    return number if number > 1 else None
+
+
+def bounded_count(queryset, limit):
+    """Число записей, но не больше limit + 1: COUNT по подзапросу с LIMIT."""
+    return queryset.order_by()[:limit + 1].count()
+
+
+def numbered_context(request, object_list, count):
+    """Нумерованные страницы django.core.paginator с известным числом записей.
+
+    count передаётся готовым (из счётчиков или bounded_count), поэтому
+    Paginator не выполняет свой COUNT(*).
+    """
+    paginator = Paginator(object_list, settings.POSTS_PER_PAGE)
+    paginator.count = count
+    return {'paginator': paginator,
+            'page': paginator.get_page(request.GET.get('page'))}
+
+
+def cursor_context(page):
+    return {'paginator': page.paginator, 'page': page}
+
+
+def paginate(request, queryset, ordering=FEED_ORDERING, count=None):
+    """Контекст пагинации для ленты постов.
+
+    Небольшая лента (не больше FEED_NUMBERED_MAX_ROWS записей) листается
+    номерами страниц; count — её размер из счётчиков, если он известен,
+    иначе считается не дальше предела. Большая лента листается курсором
+    (?after=/?before=) без OFFSET и COUNT(*); старые ссылки ?page=N
+    открываются через OFFSET, но записи и тогда не считаются.
+    """
+    after = request.GET.get('after') or None
+    before = request.GET.get('before') or None
+    limit = settings.FEED_NUMBERED_MAX_ROWS
+    queryset = queryset.order_by(*ordering)
+    if not (after or before):
+        if count is None:
+            count = bounded_count(queryset, limit)
+        if count <= limit:
+            return numbered_context(request, queryset, count)
+    paginator = CursorPaginator(queryset, settings.POSTS_PER_PAGE, ordering)
+    number = page_number(request)
+    if number is None or after or before:
+        return cursor_context(paginator.get_page(after=after, before=before))
+    offset = (number - 1) * paginator.per_page
+    rows = list(paginator.object_list[offset:offset + paginator.per_page + 1])
+    if not rows:
+        return cursor_context(paginator.page())
+    return cursor_context(CursorPage(
+        rows[:paginator.per_page], paginator,
+        len(rows) > paginator.per_page, True))
@@ -0,0 +1,112 @@
+"""Ограничение частоты записей: token bucket в общем кеше.
+
+Ведро хранится одним числом — «теоретическим временем прихода» (GCRA):
+моментом в миллисекундах, когда ведро снова станет полным. Каждый запрос
+атомарно прибавляет к нему интервал одного жетона через cache.incr;
+запрос проходит, если время ушло вперёд не больше, чем на burst
+интервалов. Решение стоит двух операций с кешем при любой истории
+запросов, а счётчик общий для всех процессов. Отклонённые запросы жетон
+возвращают, так что упорный клиент не отодвигает себе разблокировку; если
+запрос отклонил один из лимитов, жетоны остальных тоже возвращаются.
+
+За прокси адрес клиента берётся из заголовка RATE_LIMIT_IP_HEADER, который
+выставляет сам прокси; без него все клиенты делили бы одно ведро.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def interval_ms(rate):
+    """'10/m' → миллисекунды на один жетон."""
+    count, unit = rate.split('/')
+    return int(UNITS[unit] * 1000 / int(count))
+
+
+def take(key, rate, burst):
+    """Взять жетон; 0 — можно, иначе сколько секунд ждать."""
+    interval = interval_ms(rate)
+    window = interval * burst
+    timeout = math.ceil(window / 1000) + 1
+    now = int(time.time() * 1000)
+    try:
+        tat = cache.incr(key, interval)
+    except ValueError:
+        if cache.add(key, now + interval, timeout):
+            return 0
+        tat = cache.incr(key, interval)
+    if tat < now + interval:
+        # Ведро успело наполниться: отсчёт идёт от текущего момента.
+        # Гонка двух таких запросов стоит не больше одного жетона
+        cache.set(key, now + interval, timeout)
+        return 0
+    if tat - now <= window:
+        # Запись должна дожить до момента, когда ведро наполнится
+        cache.touch(key, timeout)
+        return 0
+    cache.decr(key, interval)
+    return (tat - window - now) / 1000
+
+
+def give_back(key, rate):
+    """Вернуть жетон, взятый take() для отклонённого запроса."""
+    try:
+        cache.decr(key, interval_ms(rate))
+    except ValueError:
+        pass
+
+
+def _client_ip(request):
+    header = settings.RATE_LIMIT_IP_HEADER
+    if header and request.META.get(header):
+        # В X-Forwarded-For последний адрес дописал наш прокси, остальные
+        # мог подставить сам клиент
+        return request.META[header].split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def check(request, name):
+    """Секунды до следующей попытки, если хоть один лимит исчерпан."""
+    limits = settings.RATE_LIMITS.get(name, {})
+    idents = {'ip': _client_ip(request)}
+    if request.user.is_authenticated:
+        idents['user'] = request.user.pk
+    taken = []
+    for scope, (rate, burst) in limits.items():
+        if scope not in idents:
+            continue
+        key = 'ratelimit:%s:%s:%s' % (name, scope, idents[scope])
+        wait = take(key, rate, burst)
+        if wait:
+            for key, rate in taken:
+                give_back(key, rate)
+            return wait
+        taken.append((key, rate))
+    return 0
+
+
+def rate_limit(name, methods=None):
+    """Ограничить представление лимитами RATE_LIMITS[name].
+
+    methods — какие методы считать; по умолчанию все.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                wait = check(request, name)
+                if wait:
+                    response = HttpResponse(
+                        'Слишком много запросов, попробуйте позже',
+                        status=429, content_type='text/plain; charset=utf-8')
+                    response['Retry-After'] = max(1, math.ceil(wait))
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
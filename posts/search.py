@@ -0,0 +1,178 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс posts_post_fts — внешняя таблица FTS5 над posts_post.text,
+поддерживается триггерами (см. миграцию 0014). Токенизатор unicode61 приводит
+кириллицу к нижнему регистру; «ё» заменяется на «е» и в индексе, и в
+запросе. Стеммера для русского в FTS5 нет, поэтому каждое слово запроса
+ищется как префикс: «кошк» найдёт и «кошка», и «кошки».
+"""
+import base64
+import json
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .pagination import CursorPage, CursorPaginator, InvalidCursor
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+
+
+def normalize_sql(column):
+    return "replace(replace(%s, 'ё', 'е'), 'Ё', 'Е')" % column
+
+
+# Таблица и триггеры индекса. Миграция 0014 держит свою копию этого SQL,
+# здесь он нужен команде rebuild_search_index для теневого индекса.
+# {when_new}/{when_old} — необязательное условие WHEN на строку поста.
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON posts_post "
+    "{when_new}BEGIN INSERT INTO {table}(rowid, text) VALUES (new.id, {new}); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON posts_post "
+    "{when_old}BEGIN INSERT INTO {table}({table}, rowid, text) "
+    "VALUES ('delete', old.id, {old}); END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF text "
+    "ON posts_post {when_old}BEGIN "
+    "INSERT INTO {table}({table}, rowid, text) "
+    "VALUES ('delete', old.id, {old}); "
+    "INSERT INTO {table}(rowid, text) VALUES (new.id, {new}); END",
+]
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS {table}_ai',
+    'DROP TRIGGER IF EXISTS {table}_ad',
+    'DROP TRIGGER IF EXISTS {table}_au',
+    'DROP TABLE IF EXISTS {table}',
+]
+
+
+def index_sql(statements, table=FTS_TABLE, when=None):
+    """SQL для индекса table; when — условие на id вида '{row}.id < 10'."""
+    def condition(row):
+        return 'WHEN %s ' % when.format(row=row) if when else ''
+
+    return [statement.format(table=table,
+                             new=normalize_sql('new.text'),
+                             old=normalize_sql('old.text'),
+                             when_new=condition('new'),
+                             when_old=condition('old'))
+            for statement in statements]
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def index_range(cursor, start, stop, table=FTS_TABLE):
+    """Проиндексировать посты с id из [start, stop)."""
+    cursor.execute(
+        'INSERT INTO {table}(rowid, text) SELECT id, {text} FROM posts_post '
+        'WHERE id >= %s AND id < %s'.format(table=table,
+                                            text=normalize_sql('text')),
+        [start, stop])
+
+
+def match_expression(query):
+    """Запрос пользователя → выражение MATCH: все слова как префиксы."""
+    words = WORD.findall(query.replace('ё', 'е').replace('Ё', 'Е'))
+    if not words:
+        return None
+    return ' '.join('"%s"*' % word for word in words)
+
+
+def matching_ids_sql(match):
+    """RawSQL с id подходящих постов — для фильтра pk__in."""
+    return RawSQL('SELECT rowid FROM {} WHERE {} MATCH %s'.format(
+        FTS_TABLE, FTS_TABLE), [match])
+
+
+class SearchPaginator:
+    """Курсорная пагинация результатов поиска по (bm25, id).
+
+    bm25 в FTS5 тем меньше, чем документ релевантнее, поэтому выдача идёт
+    по возрастанию ранга.
+    """
+
+    def __init__(self, match, per_page):
+        self.match = match
+        self.per_page = per_page
+
+    def cursor_for(self, post):
+        raw = json.dumps([post.search_rank, post.id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            rank, post_id = json.loads(base64.urlsafe_b64decode(padded))
+            return float(rank), int(post_id)
+        except Exception:
+            raise InvalidCursor(cursor)
+
+    def _ranked(self, cursor, forward):
+        sql = ('SELECT id, score FROM (SELECT rowid AS id, bm25({table}) '
+               'AS score FROM {table} WHERE {table} MATCH %s)'
+               .format(table=FTS_TABLE))
+        params = [self.match]
+        if cursor is not None:
+            rank, post_id = cursor
+            sign = '>' if forward else '<'
+            sql += (' WHERE score {0} %s OR (score = %s AND id {0} %s)'
+                    .format(sign))
+            params += [rank, rank, post_id]
+        direction = 'ASC' if forward else 'DESC'
+        sql += ' ORDER BY score {0}, id {0} LIMIT %s'.format(direction)
+        params.append(self.per_page + 1)
+        with connection.cursor() as db:
+            db.execute(sql, params)
+            return db.fetchall()
+
+    def page(self, after=None, before=None):
+        forward = before is None
+        cursor = after if forward else before
+        if cursor is not None:
+            cursor = self.decode_cursor(cursor)
+        rows = self._ranked(cursor, forward)
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        posts = Post.objects.feed().in_bulk([post_id for post_id, _ in rows])
+        results = []
+        for post_id, rank in rows:
+            if post_id in posts:
+                posts[post_id].search_rank = rank
+                results.append(posts[post_id])
+        if forward:
+            return CursorPage(results, self, more, after is not None)
+        return CursorPage(results, self, True, more)
+
+    def get_page(self, after=None, before=None):
+        try:
+            return self.page(after=after, before=before)
+        except InvalidCursor:
+            return self.page()
+
+
+def search_page(request, query):
+    """Страница выдачи по запросу или None, если искать нечего."""
+    match = match_expression(query)
+    if match is None:
+        return None
+    after = request.GET.get('after') or None
+    before = request.GET.get('before') or None
+    if not is_available():
+        # Без FTS5 — обычный поиск подстрок, новые посты первыми
+        posts = Post.objects.feed()
+        for word in WORD.findall(query):
+            posts = posts.filter(text__icontains=word)
+        return CursorPaginator(posts, settings.POSTS_PER_PAGE).get_page(
+            after=after, before=before)
+    paginator = SearchPaginator(match, settings.POSTS_PER_PAGE)
+    return paginator.get_page(after=after, before=before)
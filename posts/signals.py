@@ -0,0 +1,90 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, timeline, trending, versions
+from .models import (Comment, Follow, Group, Post, Suggestion, User,
+                     UserStats)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+    elif not raw:
+        versions.bump(versions.card_scope(instance.pk))
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    # Группа могла смениться при редактировании — запомним прежнюю
+    if not raw and not instance._state.adding:
+        instance._previous_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True).first())
+
+
+@receiver(post_save, sender=Post)
+def deliver_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = versions.post_scopes(instance)
+    if created:
+        counters.post_created(instance)
+        timeline.fan_out(instance)
+    elif hasattr(instance, '_previous_group_id'):
+        counters.post_moved(instance._previous_group_id, instance.group_id)
+        trending.post_moved(instance)
+        scopes.append(versions.group_scope(instance._previous_group_id))
+        del instance._previous_group_id
+    versions.bump(*scopes)
+
+
+@receiver(post_delete, sender=Post)
+def forget_post(sender, instance, **kwargs):
+    counters.post_deleted(instance)
+    versions.bump(*versions.post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.post_comments(instance.post_id, 1)
+        trending.record_comment(instance)
+    versions.bump(*versions.post_scopes(instance.post))
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.post_comments(instance.post_id, -1)
+    versions.bump(*versions.post_scopes(instance.post))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def touch_group(sender, instance, raw=False, **kwargs):
+    # Название группы выводится в карточках всех лент
+    if not raw:
+        versions.bump(versions.GLOBAL, versions.group_scope(instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.follow_created(instance)
+        timeline.backfill(instance.user_id, instance.author_id)
+        # На кого уже подписан, больше не предлагаем
+        Suggestion.objects.filter(user_id=instance.user_id,
+                                  author_id=instance.author_id).delete()
+        versions.bump(versions.card_scope(instance.user_id),
+                      versions.card_scope(instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    counters.follow_deleted(instance)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.follower_removed(instance.author_id)
+    versions.bump(versions.card_scope(instance.user_id),
+                  versions.card_scope(instance.author_id))
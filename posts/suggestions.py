@@ -0,0 +1,142 @@
+"""Рекомендации «кого почитать» по графу подписок.
+
+Считать друзей друзей при показе страницы слишком дорого, поэтому
+периодическая задача posts.jobs (JOBS_PERIODIC) пересчитывает их
+для всех сразу и складывает в таблицу Suggestion; профиль и лента
+подписок читают готовый список одним запросом по индексу (user, rank).
+
+Кандидат получает очки за каждого автора из подписок пользователя, который
+на кандидата подписан (второй уровень графа), и за каждую группу, где
+писали оба. Граф держится в памяти массивами целых в формате CSR: соседи
+вершины i — targets[offsets[i]:offsets[i + 1]], так что на связь уходит
+восемь байт, а не объект Python.
+"""
+import heapq
+import itertools
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from . import versions
+from .models import Follow, Post, Suggestion, User
+
+# Вес общего подписчика и общей группы
+FOLLOW_WEIGHT = 1.0
+GROUP_WEIGHT = 0.5
+
+
+def _csr(pairs, size):
+    """Списки смежности из пар (откуда, куда), упорядоченных по «откуда»."""
+    offsets = array('l', [0]) * (size + 1)
+    targets = array('l')
+    for source, target in pairs:
+        offsets[source + 1] += 1
+        targets.append(target)
+    for node in range(size):
+        offsets[node + 1] += offsets[node]
+    return offsets, targets
+
+
+def _neighbours(graph, node):
+    offsets, targets = graph
+    if node + 1 >= len(offsets):
+        return ()
+    return targets[offsets[node]:offsets[node + 1]]
+
+
+class Graph:
+    """Подписки и активность в группах, загруженные из базы."""
+
+    def __init__(self):
+        self.size = (User.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+        self.follows = _csr(
+            Follow.objects.filter(user_id__lt=self.size)
+            .order_by('user_id', 'author_id')
+            .values_list('user_id', 'author_id').iterator(),
+            self.size)
+        activity = list(
+            Post.objects.filter(group__isnull=False, author_id__lt=self.size)
+            .order_by().values_list('group_id', 'author_id')
+            .annotate(posts=Count('id')))
+        self.groups = _csr(
+            sorted((author_id, group_id)
+                   for group_id, author_id, _ in activity),
+            self.size)
+        # У группы берём только самых активных авторов: иначе участник
+        # большой группы стоил бы перебора всех её авторов
+        activity.sort(key=lambda row: (row[0], -row[2], row[1]))
+        top = []
+        for group_id, rows in itertools.groupby(activity,
+                                                key=lambda row: row[0]):
+            top.extend((group_id, author_id) for _, author_id, _ in
+                       itertools.islice(rows,
+                                        settings.SUGGESTIONS_GROUP_AUTHORS))
+        groups_size = max((group_id for group_id, _ in top), default=0) + 1
+        self.group_authors = _csr(top, groups_size)
+
+    def users(self):
+        """Пользователи, для которых есть из чего считать."""
+        follows, groups = self.follows[0], self.groups[0]
+        for user_id in range(self.size):
+            if (follows[user_id + 1] > follows[user_id]
+                    or groups[user_id + 1] > groups[user_id]):
+                yield user_id
+
+    def suggest(self, user_id, count):
+        """До count пар (автор, очки) по убыванию очков."""
+        followed = set(_neighbours(self.follows, user_id))
+        scores = defaultdict(float)
+        for author_id in followed:
+            for candidate in _neighbours(self.follows, author_id):
+                scores[candidate] += FOLLOW_WEIGHT
+        for group_id in _neighbours(self.groups, user_id):
+            for candidate in _neighbours(self.group_authors, group_id):
+                scores[candidate] += GROUP_WEIGHT
+        for author_id in followed | {user_id}:
+            scores.pop(author_id, None)
+        return heapq.nlargest(count, scores.items(),
+                              key=lambda item: (item[1], -item[0]))
+
+
+def _save(user_ids, rows):
+    with transaction.atomic():
+        Suggestion.objects.filter(user_id__in=user_ids).delete()
+        Suggestion.objects.bulk_create(rows)
+
+
+def rebuild(batch_size=None):
+    """Пересчитать рекомендации всех пользователей; вернуть число строк."""
+    batch_size = batch_size or settings.SUGGESTIONS_BATCH_SIZE
+    built = timezone.now()
+    graph = Graph()
+    user_ids, rows, total = [], [], 0
+    for user_id in graph.users():
+        user_ids.append(user_id)
+        rows.extend(
+            Suggestion(user_id=user_id, author_id=author_id, rank=rank,
+                       score=score, built=built)
+            for rank, (author_id, score) in enumerate(
+                graph.suggest(user_id, settings.SUGGESTIONS_COUNT)))
+        if len(user_ids) >= batch_size:
+            _save(user_ids, rows)
+            total += len(rows)
+            user_ids, rows = [], []
+    _save(user_ids, rows)
+    total += len(rows)
+    # Пользователи, которым больше нечего предложить
+    Suggestion.objects.filter(built__lt=built).delete()
+    versions.bump(versions.SUGGESTIONS)
+    return total
+
+
+def for_user(user):
+    """Рекомендации для показа: один запрос по индексу (user, rank)."""
+    if not user.is_authenticated:
+        return []
+    return list(Suggestion.objects.filter(user=user)
+                .select_related('author')
+                .order_by('rank')[:settings.SUGGESTIONS_SHOWN])
@@ -0,0 +1,13 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(image, size='card'):
+    """URL готовой миниатюры картинки поста или пустая строка."""
+    if not image:
+        return ''
+    return thumbnails.thumbnail_url(image.name, size) or ''
@@ -0,0 +1,18 @@
+"""Помощники для тестов."""
+from django.test import override_settings
+
+
+class QueryBudgetMixin:
+    """Проверка бюджетов SQL-запросов из settings.QUERY_BUDGETS."""
+
+    def assertQueryBudget(self, client, url):
+        # Превышение проверяем сами, чтобы увидеть цифры, а не исключение
+        with override_settings(QUERY_BUDGET_RAISE=False):
+            response = client.get(url)
+        budget = getattr(response, 'query_budget', None)
+        self.assertIsNotNone(budget, 'Для %s не задан бюджет запросов' % url)
+        self.assertLessEqual(
+            response.query_count, budget,
+            '%s: %s SQL-запросов при бюджете %s' % (
+                url, response.query_count, budget))
+        return response
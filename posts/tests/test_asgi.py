@@ -0,0 +1,149 @@
+import asyncio
+import threading
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.wsgi import get_wsgi_application
+from django.http import parse_cookie
+from django.test import SimpleTestCase
+
+from yatube.asgi_handler import ASGIHandler, wsgi_environ
+
+
+def echo(environ, start_response):
+    # Простое WSGI-приложение: возвращает то, что получило
+    start_response('201 Created', [('Content-Type', 'text/plain'),
+                                   ('X-Path', environ['PATH_INFO'])])
+    body = environ['wsgi.input'].read()
+    return [environ['QUERY_STRING'].encode(), b'|',
+            environ.get('HTTP_X_TAG', '').encode(), b'|', body]
+
+
+def call(handler, path='/', messages=None, headers=(), method='GET'):
+    scope = {'type': 'http', 'method': method, 'path': path,
+             'query_string': b'a=1', 'headers': list(headers)}
+    incoming = list(messages or [{'type': 'http.request', 'body': b''}])
+    sent = []
+
+    async def receive():
+        if not incoming:
+            # Как у сервера: следующего сообщения ждут, пока клиент на связи
+            await asyncio.Event().wait()
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(handler(scope, receive, send))
+    return sent
+
+
+class ASGIHandlerTests(SimpleTestCase):
+    def setUp(self):
+        self.handler = ASGIHandler(echo, threads=2)
+
+    def tearDown(self):
+        self.handler.shutdown()
+
+    def test_request_is_translated_to_wsgi(self):
+        """Путь, строка запроса, заголовки и тело по частям доходят до WSGI."""
+        sent = call(self.handler, '/пост/', messages=[
+            {'type': 'http.request', 'body': b'he', 'more_body': True},
+            {'type': 'http.request', 'body': b'llo'},
+        ], headers=[(b'x-tag', b'one'), (b'x-tag', b'two')], method='POST')
+        start = sent[0]
+        self.assertEqual(start['status'], 201)
+        # Заголовки WSGI — строки latin-1 с байтами UTF-8
+        self.assertIn((b'x-path', '/пост/'.encode()), start['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertEqual(body, b'a=1|one,two|hello')
+        self.assertFalse(sent[-1].get('more_body', False))
+
+    def test_repeated_cookie_headers_are_joined(self):
+        """Отдельные заголовки Cookie склеиваются через '; '."""
+        environ = wsgi_environ({
+            'method': 'GET', 'path': '/',
+            'headers': [(b'cookie', b'a=1'), (b'cookie', b'b=2')],
+        }, None)
+        self.assertEqual(environ['HTTP_COOKIE'], 'a=1; b=2')
+        self.assertEqual(parse_cookie(environ['HTTP_COOKIE']),
+                         {'a': '1', 'b': '2'})
+
+    def test_disconnect_before_body_skips_application(self):
+        """Ушедший клиент не занимает поток пула."""
+        sent = call(self.handler, messages=[{'type': 'http.disconnect'}])
+        self.assertEqual(sent, [])
+
+    def test_streaming_response_uses_stream_pool(self):
+        """Потоковый ответ отдаётся из отдельного пула."""
+        threads = []
+
+        class Stream(list):
+            streaming = True
+
+            def __iter__(self):
+                threads.append(threading.current_thread().name)
+                return super().__iter__()
+
+        def app(environ, start_response):
+            start_response('200 OK', [])
+            return Stream([b'data: 1\n\n'])
+
+        handler = ASGIHandler(app, threads=1)
+        try:
+            sent = call(handler)
+        finally:
+            handler.shutdown()
+        self.assertEqual(sent[1]['body'], b'data: 1\n\n')
+        self.assertTrue(threads[0].startswith('asgi-stream'))
+
+    def test_disconnect_cancels_stream(self):
+        """Ушедший клиент прерывает поток, не дожидаясь следующего куска."""
+        released = threading.Event()
+
+        class Stream:
+            streaming = True
+
+            def __iter__(self):
+                yield b'data: 1\n\n'
+                released.wait(5)
+                yield b'data: 2\n\n'
+
+            def cancel(self):
+                released.set()
+
+        def app(environ, start_response):
+            start_response('200 OK', [])
+            return Stream()
+
+        handler = ASGIHandler(app, threads=1)
+        try:
+            sent = call(handler, messages=[
+                {'type': 'http.request', 'body': b''},
+                {'type': 'http.disconnect'},
+            ])
+        finally:
+            handler.shutdown()
+        self.assertTrue(released.is_set())
+        self.assertNotIn(b'data: 2\n\n',
+                         [message.get('body') for message in sent])
+
+    def test_django_page_through_asgi(self):
+        """Страница Django отдаётся через ASGI-обработчик."""
+        handler = ASGIHandler(get_wsgi_application(), threads=1)
+        try:
+            sent = call(handler, '/about/author/')
+        finally:
+            handler.shutdown()
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'<html', b''.join(
+            message.get('body', b'') for message in sent[1:]))
+
+    def test_bench_asgi_reports_both_paths(self):
+        """bench_asgi сравнивает WSGI и ASGI на одной странице."""
+        output = StringIO()
+        call_command('bench_asgi', connections=4, threads=2,
+                     client_delay=0.01, path='/about/author/', stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines],
+                         ['wsgi', 'asgi'])
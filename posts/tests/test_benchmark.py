@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class BenchmarkTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        call_command('seed_data', users=30, groups=3, posts=120, comments=60,
+                     follows_per_user=5, images=0.2, image_pool=2,
+                     stdout=StringIO(), stderr=StringIO())
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def bench(self, **options):
+        output = StringIO()
+        call_command('bench_http', requests=3, warmup=1, stdout=output,
+                     **options)
+        return output.getvalue()
+
+    def test_seed_data_is_consistent(self):
+        """seed_data создаёт связанные данные и пересчитывает счётчики."""
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Comment.objects.count(), 60)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        popular = UserStats.objects.order_by('-followers_count').first()
+        self.assertEqual(popular.followers_count,
+                         Follow.objects.filter(author=popular.user).count())
+        # Степенной закон: у первого пользователя больше всех подписчиков
+        self.assertEqual(popular.user, User.objects.order_by('pk').first())
+
+    def test_bench_writes_results_and_compares_with_baseline(self):
+        """Результаты пишутся в JSON и сравниваются с базовым замером."""
+        path = os.path.join(self.directory, 'baseline.json')
+        self.bench(output=path)
+        with open(path) as source:
+            results = json.load(source)['scenarios']
+        self.assertEqual(set(results), {
+            'index', 'group', 'profile', 'post', 'follow_index', 'new_post',
+            'add_comment'})
+        for result in results.values():
+            self.assertEqual(result['errors'], 0)
+            self.assertLessEqual(result['p50'], result['p99'])
+            # Базовый замер в тысячу раз быстрее — регрессия
+            for key in ('p50', 'p95', 'p99'):
+                result[key] /= 1000
+        with open(path, 'w') as output:
+            json.dump({'scenarios': results}, output)
+        with self.assertRaises(CommandError):
+            self.bench(scenarios='index', baseline=path, max_regression=50)
+
+    @override_settings(FEED_NUMBERED_MAX_ROWS=5)
+    def test_index_follows_next_cursor(self):
+        """Сценарий index листает ленту курсором из прошлого ответа."""
+        urls = []
+        get = Client.get
+
+        def recording(client, path, *args, **kwargs):
+            urls.append(path)
+            return get(client, path, *args, **kwargs)
+
+        with mock.patch.object(Client, 'get', recording):
+            self.bench(scenarios='index', seed=1)
+        self.assertTrue(any('?after=' in url for url in urls))
+        self.assertFalse(any('page=' in url for url in urls))
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from yatube.cache import SQLiteCache, TieredCache
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.location = os.path.join(directory, 'cache.sqlite3')
+
+    def tiered(self, **options):
+        # Отдельный экземпляр — как отдельный воркер со своим L1
+        options = {
+            'L1_EXCLUDE_PREFIXES': ['version:'],
+            'SINGLE_FLIGHT_PREFIXES': ['fragment.'],
+            **options,
+        }
+        return TieredCache(self.location, {'OPTIONS': options})
+
+    def test_sqlite_cache_basic_operations(self):
+        """SQLiteCache поддерживает основные операции кеша Django."""
+        cache = SQLiteCache(self.location, {})
+        cache.set('a', {'x': 1})
+        self.assertEqual(cache.get('a'), {'x': 1})
+        self.assertFalse(cache.add('a', 2))
+        self.assertTrue(cache.add('b', 2))
+        self.assertEqual(cache.incr('b', 3), 5)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.set('gone', 1, timeout=0)
+        self.assertIsNone(cache.get('gone'))
+        self.assertEqual(cache.get_many(['a', 'b', 'gone']),
+                         {'a': {'x': 1}, 'b': 5})
+        cache.delete('a')
+        self.assertFalse(cache.has_key('a'))
+
+    def test_workers_share_second_level(self):
+        """Запись одного воркера видна другому, поколения — без задержки."""
+        first, second = self.tiered(), self.tiered()
+        first.set('fragment.page.1', 'html')
+        self.assertEqual(second.get('fragment.page.1'), 'html')
+        first.add('version:global', 1, None)
+        self.assertEqual(second.get_many(['version:global']),
+                         {'version:global': 1})
+        first.incr('version:global')
+        self.assertEqual(second.get_many(['version:global']),
+                         {'version:global': 2})
+        stats = second.stats()
+        self.assertEqual(stats['fragment.page']['l2_hits'], 1)
+        self.assertEqual(stats['version']['l2_hits'], 2)
+        self.assertEqual(second.get('fragment.page.1'), 'html')
+        self.assertEqual(second.stats()['fragment.page']['l1_hits'], 1)
+
+    def test_single_flight_waits_for_leader(self):
+        """При промахе фрагмент считает один воркер, другой ждёт его."""
+        leader, follower = self.tiered(), self.tiered()
+        self.assertIsNone(leader.get('fragment.page.1'))
+        timer = threading.Timer(
+            0.1, leader.set, args=('fragment.page.1', 'html'))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        self.assertEqual(follower.get('fragment.page.1'), 'html')
+        self.assertEqual(follower.stats()['fragment.page']['waits'], 1)
+
+    def test_stale_value_served_while_revalidating(self):
+        """Истёкший фрагмент отдаётся, пока его обновляет другой воркер."""
+        leader, follower = self.tiered(), self.tiered()
+        leader.set('fragment.page.1', 'old', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(leader.get('fragment.page.1'))
+        self.assertEqual(follower.get('fragment.page.1'), 'old')
+        self.assertEqual(follower.stats()['fragment.page']['stale_hits'], 1)
+        leader.set('fragment.page.1', 'new')
+        self.assertEqual(follower.get('fragment.page.1'), 'new')
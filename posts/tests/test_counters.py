@@ -0,0 +1,81 @@
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User, UserStats
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='counter_author')
+        cls.reader = User.objects.create(username='counter_reader')
+        cls.group = Group.objects.create(
+            title='Группа со счётчиком',
+            slug='counter_slug',
+            description='Описание'
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CountersTests.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_follow_and_unfollow_update_counters(self):
+        """Подписка и отписка меняют счётчики обеих сторон."""
+        url = reverse('profile_follow',
+                      kwargs={'username': CountersTests.author.username})
+        self.authorized_client.get(url)
+        self.authorized_client.get(url)
+        self.assertEqual(self.stats(CountersTests.author).followers_count, 1)
+        self.assertEqual(self.stats(CountersTests.reader).following_count, 1)
+        self.authorized_client.get(reverse(
+            'profile_unfollow',
+            kwargs={'username': CountersTests.author.username}))
+        self.assertEqual(self.stats(CountersTests.author).followers_count, 0)
+        self.assertEqual(self.stats(CountersTests.reader).following_count, 0)
+
+    def test_posts_and_comments_update_counters(self):
+        """Создание и удаление постов и комментариев меняет счётчики."""
+        self.authorized_client.post(reverse('new_post'), data={
+            'text': 'Пост со счётчиком', 'group': CountersTests.group.id})
+        post = Post.objects.get(text='Пост со счётчиком')
+        self.authorized_client.post(
+            reverse('add_comment', kwargs={
+                'username': CountersTests.reader.username,
+                'post_id': post.id}),
+            data={'text': 'Комментарий'})
+        post.refresh_from_db()
+        CountersTests.group.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(CountersTests.group.posts_count, 1)
+        self.assertEqual(self.stats(CountersTests.reader).posts_count, 1)
+        post.delete()
+        CountersTests.group.refresh_from_db()
+        self.assertEqual(CountersTests.group.posts_count, 0)
+        self.assertEqual(self.stats(CountersTests.reader).posts_count, 0)
+
+    def test_moving_post_between_groups(self):
+        """Смена группы при редактировании переносит счётчик."""
+        post = Post.objects.create(text='Пост без группы',
+                                   author=CountersTests.author)
+        post.group = CountersTests.group
+        post.save()
+        CountersTests.group.refresh_from_db()
+        self.assertEqual(CountersTests.group.posts_count, 1)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters восстанавливает разошедшиеся счётчики."""
+        post = Post.objects.create(text='Пост', author=CountersTests.author)
+        Comment.objects.create(post=post, author=CountersTests.reader,
+                               text='Комментарий')
+        UserStats.objects.update(posts_count=42)
+        Post.objects.update(comments_count=42)
+        call_command('rebuild_counters', batch_size=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(CountersTests.author).posts_count, 1)
+        self.assertEqual(self.stats(CountersTests.reader).posts_count, 0)
@@ -0,0 +1,27 @@
+from django.db import connection
+from django.test import TestCase
+
+from yatube.sqlite.base import DatabaseWrapper
+
+
+class SQLiteBackendTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA %s' % name)
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        """Соединение открывается с прагмами yatube.sqlite."""
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+        self.assertEqual(self.pragma('cache_size'), -64000)
+        self.assertEqual(self.pragma('temp_store'), 2)  # MEMORY
+
+    def test_begin_immediate_only_when_enabled(self):
+        """BEGIN IMMEDIATE включается опцией базы, а не для всех алиасов."""
+        connection.ensure_connection()
+        self.assertTrue(connection.begin_immediate)
+        reader = DatabaseWrapper(
+            dict(connection.settings_dict, OPTIONS={}), alias='reader')
+        reader.get_connection_params()
+        self.assertFalse(reader.begin_immediate)
@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+@override_settings(SYNDICATION_ITEMS=2)
+class FeedsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='feed_writer')
+        cls.other = User.objects.create(username='feed_other')
+        cls.group = Group.objects.create(title='Лента', slug='feed_group',
+                                         description='Группа с лентой')
+        for i in range(3):
+            Post.objects.create(text=f'Запись автора {i}', author=cls.author,
+                                group=cls.group)
+        Post.objects.create(text='Чужая запись', author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_latest_feed_is_bounded(self):
+        """Общая RSS-лента отдаёт SYNDICATION_ITEMS последних постов."""
+        response = self.client.get(reverse('latest_feed', args=['rss']))
+        self.assertEqual(response['Content-Type'],
+                         'application/rss+xml; charset=utf-8')
+        self.assertContains(response, '<item>', count=2)
+        self.assertContains(response, 'Чужая запись')
+
+    def test_group_and_author_feeds(self):
+        """Atom группы и автора содержат только их посты."""
+        for url in (reverse('group_feed', args=['feed_group', 'atom']),
+                    reverse('profile_feed', args=['feed_writer', 'atom'])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(
+                    response['Content-Type'].startswith('application/atom'))
+                self.assertContains(response, 'Запись автора 2')
+                self.assertNotContains(response, 'Чужая запись')
+        response = self.client.get(reverse('profile_feed',
+                                           args=['nobody', 'rss']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_feed_cached_until_new_post(self):
+        """Повтор отдаётся из кеша, новый пост сразу виден в ленте."""
+        url = reverse('latest_feed', args=['rss'])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        Post.objects.create(text='Свежая запись', author=self.other)
+        self.assertContains(self.client.get(url), 'Свежая запись')
+
+    def test_conditional_get(self):
+        """С If-None-Match неизменная лента отвечает 304."""
+        url = reverse('group_feed', args=['feed_group', 'rss'])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='Ещё запись', author=self.author,
+                            group=self.group)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
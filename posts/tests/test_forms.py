@@ -1,10 +1,12 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.forms import PostForm
 from posts.models import Group, Post, User
@@ -160,3 +162,62 @@ class PostFormWithPicturesTests(TestCase):
             text='Тестовый текст поста с картинкой в группу').exists())
         # Проверяем, что количество постов увеличилось
         self.assertEqual(Post.objects.count(), posts_count + 1)
+
+
+INGEST_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=INGEST_MEDIA_ROOT)
+class PostImageIngestTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(INGEST_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create(username='photographer')
+        self.client.force_login(self.user)
+
+    def post_image(self, image, name='photo.jpg', **save_kwargs):
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', **save_kwargs)
+        uploaded = SimpleUploadedFile(name, buffer.getvalue(),
+                                      content_type='image/jpeg')
+        return self.client.post(reverse('new_post'), {
+            'text': 'Фото с телефона', 'image': uploaded})
+
+    def test_image_is_rotated_shrunk_and_stripped(self):
+        """Картинка поворачивается по EXIF, уменьшается и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: повернуть на 90° по часовой
+        exif[0x010F] = 'Phone'  # Make
+        with self.settings(POST_IMAGE_MAX_SIZE=100):
+            response = self.post_image(Image.new('RGB', (400, 200)),
+                                       exif=exif.tobytes())
+        self.assertRedirects(response, reverse('index'))
+        post = Post.objects.get(author=self.user)
+        self.assertTrue(post.image.name.endswith('photo.webp'))
+        with post.image.open('rb') as stored:
+            image = Image.open(stored)
+            image.load()
+        self.assertEqual(image.format, 'WEBP')
+        self.assertEqual(image.size, (50, 100))
+        self.assertFalse(image.getexif())
+
+    def test_too_many_pixels_rejected(self):
+        """Картинка больше POST_IMAGE_MAX_PIXELS не принимается."""
+        with self.settings(POST_IMAGE_MAX_PIXELS=100):
+            response = self.post_image(Image.new('RGB', (20, 20)))
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'image',
+                             'Слишком большое изображение: 20×20 пикселей')
+        self.assertFalse(Post.objects.exists())
+
+    def test_too_many_bytes_rejected(self):
+        """Файл больше POST_IMAGE_MAX_BYTES отбрасывается при загрузке."""
+        with self.settings(POST_IMAGE_MAX_BYTES=100):
+            response = self.post_image(Image.new('RGB', (20, 20)))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Файл больше',
+                      response.context['form'].errors['image'][0])
+        self.assertFalse(Post.objects.exists())
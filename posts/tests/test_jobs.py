@@ -0,0 +1,126 @@
+import datetime as dt
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail import send_mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from posts import jobs, thumbnails
+from posts.models import Job, Post, User
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class JobQueueTests(TestCase):
+    def test_claims_by_priority_then_age(self):
+        """Воркер берёт задачи по убыванию приоритета, затем по очереди."""
+        low = jobs.enqueue(jobs.purge, 30)
+        high = jobs.enqueue(jobs.purge, 30, priority=5)
+        later = jobs.enqueue(jobs.purge, 30, priority=5, delay=60)
+        self.assertEqual(jobs.claim(), high)
+        self.assertEqual(jobs.claim(), low)
+        # Отложенная задача ещё не готова
+        self.assertIsNone(jobs.claim())
+        later.refresh_from_db()
+        self.assertEqual(later.status, Job.QUEUED)
+
+    def test_failed_job_retried_with_backoff(self):
+        """Упавшая задача повторяется позже, а после лимита — failed."""
+        job = jobs.enqueue(jobs.purge, 'не число', max_attempts=2)
+        self.assertEqual(jobs.work(once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('TypeError', job.last_error)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_key_makes_enqueue_idempotent(self):
+        """Повторная постановка с тем же ключом не создаёт новую задачу."""
+        first = jobs.enqueue(jobs.purge, 30, key='purge')
+        second = jobs.enqueue(jobs.purge, 30, key='purge')
+        self.assertEqual(first, second)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_expired_lease_is_reclaimed(self):
+        """Задачу упавшего воркера после конца аренды берёт другой."""
+        job = jobs.enqueue(jobs.purge, 30)
+        self.assertEqual(jobs.claim(), job)
+        self.assertIsNone(jobs.claim())
+        Job.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() - dt.timedelta(seconds=1))
+        self.assertEqual(jobs.work(once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 2)
+
+    def test_abandoned_job_fails_after_last_lease(self):
+        """Задача, ронявшая воркер на каждой попытке, не берётся вечно."""
+        job = jobs.enqueue(jobs.purge, 30, max_attempts=2)
+        expired = timezone.now() - dt.timedelta(seconds=1)
+        for _ in range(2):
+            self.assertEqual(jobs.claim(), job)
+            Job.objects.filter(pk=job.pk).update(locked_until=expired)
+        self.assertIsNone(jobs.claim())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_periodic_jobs_scheduled_once_per_interval(self):
+        """Периодическая задача ставится не больше раза за интервал."""
+        jobs.schedule_periodic()
+        jobs.schedule_periodic()
+        self.assertEqual(
+            sorted(Job.objects.values_list('task', flat=True)),
+            sorted(settings.JOBS_PERIODIC))
+
+    @override_settings(
+        EMAIL_BACKEND='posts.mail.QueuedEmailBackend',
+        JOBS_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_email_sent_by_worker(self):
+        """Письмо не отправляется в запросе, его отправляет воркер."""
+        send_mail('Сброс пароля', 'Ссылка', 'noreply@yatube.ru',
+                  ['reader@yatube.ru'])
+        self.assertEqual(len(mail.outbox), 0)
+        jobs.work(once=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Сброс пароля')
+        self.assertEqual(mail.outbox[0].to, ['reader@yatube.ru'])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ThumbnailJobTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_new_post_enqueues_thumbnail(self):
+        """Пост с картинкой ставит задачу миниатюр, её строит воркер."""
+        user = User.objects.create(username='queued_painter')
+        self.client.force_login(user)
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(buffer, 'PNG')
+        self.client.post(reverse('new_post'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile('red.png', buffer.getvalue(),
+                                        content_type='image/png')})
+        post = Post.objects.get(author=user)
+        job = Job.objects.get()
+        self.assertEqual(job.task, 'posts.thumbnails.generate')
+        name = thumbnails.thumbnail_name(post.image.name, 'card')
+        self.assertFalse(default_storage.exists(name))
+        jobs.work(once=True)
+        self.assertTrue(default_storage.exists(name))
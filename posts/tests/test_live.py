@@ -0,0 +1,135 @@
+import datetime as dt
+from unittest import mock
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import live
+from posts.models import Follow, Group, LiveEvent, Post, User
+
+
+@override_settings(LIVE_ENABLED=True, LIVE_HEARTBEAT_SECONDS=0.01,
+                   LIVE_MAX_SECONDS=0.05)
+class LiveFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='live_author')
+        cls.other = User.objects.create(username='live_other')
+        cls.reader = User.objects.create(username='live_reader')
+        cls.group = Group.objects.create(
+            title='Живая группа',
+            slug='live_slug',
+            description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        # Без фонового потока: опрос вызывается из теста
+        self.hub = live.Hub(autostart=False)
+        patcher = mock.patch.object(live, 'hub', self.hub)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.reader_client = Client()
+        self.reader_client.force_login(LiveFeedTests.reader)
+
+    def publish(self, author, group=None):
+        live.publish(Post.objects.create(text='Новый пост', author=author,
+                                         group=group))
+
+    def test_new_post_publishes_event(self):
+        """new_post публикует событие вместе с постом."""
+        self.reader_client.post(reverse('new_post'), {'text': 'Живой пост'})
+        event = LiveEvent.objects.get()
+        self.assertEqual(event.author_id, LiveFeedTests.reader.id)
+
+    def test_poll_counts_events_per_subscription(self):
+        """Один опрос раздаёт каждому клиенту число постов его ленты."""
+        everything = self.hub.subscribe(live.Subscription())
+        group = self.hub.subscribe(
+            live.Subscription(group_id=LiveFeedTests.group.id))
+        following = self.hub.subscribe(
+            live.Subscription.following(LiveFeedTests.reader))
+        self.publish(LiveFeedTests.author)
+        self.publish(LiveFeedTests.other, LiveFeedTests.group)
+        self.publish(LiveFeedTests.other)
+        with self.assertNumQueries(1):
+            self.hub.poll()
+        last_id = LiveEvent.objects.latest('id').id
+        self.assertEqual(everything.events.get_nowait(), (last_id, 3))
+        self.assertEqual(group.events.get_nowait(), (last_id, 1))
+        self.assertEqual(following.events.get_nowait(), (last_id, 1))
+
+    def test_stream_sends_events_heartbeats_and_catches_up(self):
+        """Поток отдаёт пропущенное по Last-Event-ID, события и пинги."""
+        self.publish(LiveFeedTests.author)
+        seen = LiveEvent.objects.get().id
+        self.publish(LiveFeedTests.author)
+        response = self.reader_client.get(reverse('live_feed') + '?follow=1',
+                                          HTTP_LAST_EVENT_ID=str(seen))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = iter(response.streaming_content)
+        self.assertTrue(next(chunks).startswith(b'retry:'))
+        self.assertIn(b'data: {"count": 1}', next(chunks))
+        self.publish(LiveFeedTests.author)
+        self.publish(LiveFeedTests.author)
+        self.hub.poll()
+        self.assertIn(b'data: {"count": 2}', next(chunks))
+        rest = b''.join(chunks)
+        self.assertIn(b': ping', rest)
+        # Поток закрылся по LIVE_MAX_SECONDS и освободил место
+        self.assertFalse(self.hub._listeners)
+
+    @override_settings(LIVE_MAX_CONNECTIONS=0)
+    def test_connection_cap(self):
+        """Сверх лимита соединений — 503 с Retry-After."""
+        response = self.reader_client.get(reverse('live_feed'))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+    def test_follow_stream_requires_login(self):
+        """Ленту подписок слушает только вошедший пользователь."""
+        response = Client().get(reverse('live_feed') + '?follow=1')
+        self.assertEqual(response.status_code, 401)
+
+    def test_closed_response_releases_listener(self):
+        """Закрытый без чтения ответ освобождает место в хабе."""
+        response = self.reader_client.get(reverse('live_feed'))
+        self.assertEqual(len(self.hub._listeners), 1)
+        response.close()
+        self.assertFalse(self.hub._listeners)
+
+    @override_settings(LIVE_ENABLED=False)
+    def test_disabled_without_asgi(self):
+        """Без ASGI плашки нет, а поток не открывается."""
+        response = self.reader_client.get(reverse('index'))
+        self.assertNotContains(response, 'js-live')
+        response = self.reader_client.get(reverse('live_feed'))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(LIVE_ENABLED=False)
+    def test_disabled_live_writes_no_events(self):
+        """Без живых лент новый пост не оставляет строк LiveEvent."""
+        self.reader_client.post(reverse('new_post'), {'text': 'Тихий пост'})
+        self.assertFalse(LiveEvent.objects.exists())
+
+    def test_prune_job_removes_old_events(self):
+        """Периодическая задача удаляет устаревшие события без подписчиков."""
+        self.publish(LiveFeedTests.author)
+        LiveEvent.objects.update(created=timezone.now() - dt.timedelta(
+            seconds=settings.LIVE_EVENT_TTL + 1))
+        self.publish(LiveFeedTests.author)
+        self.assertIn('posts.live.prune', settings.JOBS_PERIODIC)
+        live.prune()
+        self.assertEqual(LiveEvent.objects.count(), 1)
+
+    def test_cancel_releases_waiting_stream(self):
+        """cancel() освобождает место и будит поток, ждущий события."""
+        response = self.reader_client.get(reverse('live_feed'))
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        response.cancel()
+        self.assertFalse(self.hub._listeners)
+        self.assertEqual(list(chunks), [])
@@ -1,6 +1,10 @@
-from django.test import TestCase
+from django.db import connection
+from django.core.paginator import Paginator
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from posts import counters
 from posts.models import Group, Post, User
 
 
@@ -28,6 +32,8 @@ class PaginatorViewsTest(TestCase):
                      group=cls.group)
             a_list.append(i)
         Post.objects.bulk_create(a_list)
+        # bulk_create не трогает счётчики групп и авторов
+        counters.rebuild()
 
     def test_first_page_containse_ten_records(self):
         response = self.client.get(reverse('index'))
@@ -38,3 +44,73 @@ class PaginatorViewsTest(TestCase):
         # Проверка: на второй странице должно быть три поста.
         response = self.client.get(reverse('index') + '?page=2')
         self.assertEqual(len(response.context.get('page').object_list), 3)
+
+    def test_small_feed_is_numbered(self):
+        # Небольшая лента — настоящие номера страниц и число записей
+        response = self.client.get(reverse('index'))
+        paginator = response.context.get('paginator')
+        self.assertIs(type(paginator), Paginator)
+        self.assertEqual(paginator.count, 13)
+        self.assertEqual(list(paginator.page_range), [1, 2])
+        self.assertContains(response, '?page=2')
+
+    def test_group_page_uses_counter(self):
+        # Число постов группы берётся из счётчика, без COUNT(*)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('group', kwargs={'slug': 'test_slug'}))
+        self.assertEqual(response.context.get('paginator').count, 13)
+        self.assertFalse(any('COUNT(' in query['sql']
+                             for query in queries.captured_queries))
+
+    @override_settings(FEED_NUMBERED_MAX_ROWS=5)
+    def test_next_link_leads_to_cursor_page(self):
+        # В большой ленте ссылка «Следующая» ведёт по курсору
+        response = self.client.get(reverse('index'))
+        page = response.context.get('page')
+        self.assertIs(response.context.get('paginator'), page.paginator)
+        self.assertContains(response, '?after=' + page.next_cursor)
+        response = self.client.get(
+            reverse('index') + '?after=' + page.next_cursor)
+        page = response.context.get('page')
+        self.assertEqual(len(page.object_list), 3)
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.has_previous())
+
+    @override_settings(FEED_NUMBERED_MAX_ROWS=5)
+    def test_cursor_pages_cover_feed_without_gaps(self):
+        # Вперёд по курсору и обратно — те же записи в том же порядке
+        first = self.client.get(reverse('index')).context['page']
+        first_ids = [post.id for post in first]
+        second = self.client.get(
+            reverse('index') + '?after=' + first.next_cursor
+        ).context['page']
+        back = self.client.get(
+            reverse('index') + '?before=' + second.previous_cursor
+        ).context.get('page')
+        self.assertEqual([post.id for post in back], first_ids)
+        self.assertFalse(back.has_previous())
+        all_ids = first_ids + [post.id for post in second]
+        self.assertEqual(sorted(all_ids, reverse=True), all_ids)
+        self.assertEqual(len(set(all_ids)), 13)
+
+    @override_settings(FEED_NUMBERED_MAX_ROWS=5)
+    def test_large_feed_counts_only_up_to_limit(self):
+        # Большая лента считается не дальше предела, а курсорные и старые
+        # номерные страницы не считаются вовсе
+        first = self.client.get(reverse('index')).context['page']
+        urls = {reverse('index'): 1,
+                reverse('index') + '?page=2': 1,
+                reverse('index') + '?after=' + first.next_cursor: 0}
+        for url, bounded in urls.items():
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                counts = [query['sql'] for query in queries.captured_queries
+                          if 'COUNT(' in query['sql']]
+                self.assertEqual(len(counts), bounded)
+                self.assertTrue(all('LIMIT 6' in sql for sql in counts))
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.client.get(reverse('index') + '?after=garbage')
+        self.assertEqual(len(response.context.get('page').object_list), 10)
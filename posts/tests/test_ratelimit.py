@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import ratelimit
+from posts.models import Post, User
+
+LIMITS = {'new_post': {'user': ('6/m', 2), 'ip': ('6/m', 3)}}
+
+
+@override_settings(RATE_LIMITS=LIMITS)
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.writer = User.objects.create(username='limited_writer')
+        cls.neighbour = User.objects.create(username='limited_neighbour')
+
+    def setUp(self):
+        cache.clear()
+        self.writer_client = Client()
+        self.writer_client.force_login(RateLimitTests.writer)
+        self.neighbour_client = Client()
+        self.neighbour_client.force_login(RateLimitTests.neighbour)
+
+    def write(self, client):
+        return client.post(reverse('new_post'), {'text': 'Пост'})
+
+    def test_bucket_refills_over_time(self):
+        """Ведро пустеет за burst запросов и пополняется со скоростью rate."""
+        now = 1000.0
+        with mock.patch('time.time', lambda: now):
+            self.assertEqual(ratelimit.take('ratelimit:t', '6/m', 2), 0)
+            self.assertEqual(ratelimit.take('ratelimit:t', '6/m', 2), 0)
+            # Жетон раз в 10 секунд: ждать следующего
+            self.assertEqual(ratelimit.take('ratelimit:t', '6/m', 2), 10)
+            self.assertEqual(ratelimit.take('ratelimit:t', '6/m', 2), 10)
+        now += 10
+        with mock.patch('time.time', lambda: now):
+            self.assertEqual(ratelimit.take('ratelimit:t', '6/m', 2), 0)
+            self.assertEqual(ratelimit.take('ratelimit:t', '6/m', 2), 10)
+
+    def test_over_limit_write_gets_429(self):
+        """Сверх лимита пользователя — 429 с Retry-After, пост не создан."""
+        for _ in range(2):
+            self.assertEqual(self.write(self.writer_client).status_code, 302)
+        # Открыть форму можно: считаются только отправки
+        self.assertEqual(
+            self.writer_client.get(reverse('new_post')).status_code, 200)
+        response = self.write(self.writer_client)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_ip_limit_is_shared_between_users(self):
+        """Лимит на IP общий для всех пользователей с этого адреса."""
+        self.write(self.writer_client)
+        self.write(self.writer_client)
+        self.assertEqual(self.write(self.neighbour_client).status_code, 302)
+        self.assertEqual(self.write(self.neighbour_client).status_code, 429)
+
+    def test_denied_request_refunds_other_buckets(self):
+        """Отказ по лимиту IP возвращает жетон в ведро пользователя."""
+        self.write(self.neighbour_client)
+        self.write(self.neighbour_client)
+        self.write(self.writer_client)
+        # IP исчерпан, ведро пользователя должно остаться с одним жетоном
+        self.assertEqual(self.write(self.writer_client).status_code, 429)
+        with override_settings(RATE_LIMITS={
+                'new_post': {'user': LIMITS['new_post']['user']}}):
+            self.assertEqual(self.write(self.writer_client).status_code, 302)
+            self.assertEqual(self.write(self.writer_client).status_code, 429)
+
+    @override_settings(RATE_LIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_ip_taken_from_proxy_header(self):
+        """За прокси у каждого клиента своё ведро IP."""
+        self.write(self.writer_client)
+        self.write(self.writer_client)
+        self.write(self.neighbour_client)
+        response = self.neighbour_client.post(
+            reverse('new_post'), {'text': 'Пост'},
+            HTTP_X_FORWARDED_FOR='203.0.113.7')
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,40 @@
+from unittest import mock
+
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube import routers
+
+
+# Роль реплики играет сама default: в тестах другой базы нет
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='replica_reader')
+        self.client = Client()
+        self.client.force_login(self.user)
+        patcher = mock.patch('yatube.routers.random.choice',
+                             return_value='default')
+        self.choice = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_outside_requests_use_primary(self):
+        """Вне запроса чтение идёт в основную базу."""
+        self.assertIsNone(routers.ReplicaRouter().db_for_read(Post))
+
+    def test_feed_pages_read_from_replica(self):
+        """Страницы лент читаются с реплики, формы — нет."""
+        self.client.get(reverse('index'))
+        self.assertEqual(self.choice.call_count, 1)
+        self.client.get(reverse('new_post'))
+        self.assertEqual(self.choice.call_count, 1)
+
+    def test_write_pins_user_to_primary(self):
+        """После записи пользователь читает из основной базы."""
+        response = self.client.post(reverse('new_post'),
+                                    {'text': 'Свой пост'})
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Свой пост')
+        self.choice.assert_not_called()
@@ -0,0 +1,110 @@
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.admin import PostAdmin
+from posts.models import Post, User
+from posts.search import SearchPaginator, match_expression
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='search_author')
+        cls.cat_post = Post.objects.create(
+            text='Кошка, кошка и ещё раз КОШКА', author=cls.author)
+        cls.cats_post = Post.objects.create(
+            text='Про кошку и собак', author=cls.author)
+        cls.tree_post = Post.objects.create(
+            text='Ёлка в лесу', author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, extra=''):
+        response = self.guest_client.get(
+            reverse('search') + '?q=' + query + extra)
+        self.assertEqual(response.status_code, 200)
+        return response.context.get('page')
+
+    def test_ranked_prefix_search(self):
+        """Поиск находит словоформы и ранжирует по bm25."""
+        page = self.search('кошк')
+        self.assertEqual([post.id for post in page],
+                         [SearchTests.cat_post.id, SearchTests.cats_post.id])
+
+    def test_yo_is_folded(self):
+        """Буква «ё» не мешает поиску."""
+        self.assertEqual(list(self.search('елка')), [SearchTests.tree_post])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.get(pk=SearchTests.tree_post.pk)
+        post.text = 'Сосна в лесу'
+        post.save()
+        self.assertEqual(list(self.search('ёлка')), [])
+        self.assertEqual(list(self.search('сосна')), [post])
+        post.delete()
+        self.assertEqual(list(self.search('сосна')), [])
+
+    def test_cursor_pagination(self):
+        """Выдача листается курсором без пропусков."""
+        for i in range(12):
+            Post.objects.create(text=f'Жираф номер {i}',
+                                author=SearchTests.author)
+        paginator = SearchPaginator(match_expression('жираф'), 10)
+        first = paginator.page()
+        second = self.search('жираф', '&after=' + first.next_cursor)
+        ids = [post.id for post in first] + [post.id for post in second]
+        self.assertEqual(len(set(ids)), 12)
+        self.assertFalse(second.has_next())
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс."""
+        admin = PostAdmin(Post, None)
+        queryset, duplicates = admin.get_search_results(
+            None, Post.objects.all(), 'собак')
+        self.assertEqual(list(queryset), [SearchTests.cats_post])
+        self.assertFalse(duplicates)
+
+    def test_rebuild_search_index_command(self):
+        """Команда перестраивает индекс пачками."""
+        call_command('rebuild_search_index', batch_size=1, stdout=None)
+        self.assertEqual(len(self.search('кошк')), 2)
+
+    def test_failed_rebuild_keeps_old_index(self):
+        """Сбой посреди перестройки не оставляет индекс пустым."""
+        index_range = search.index_range
+        calls = []
+
+        def failing(cursor, start, stop, **kwargs):
+            calls.append(start)
+            if len(calls) > 1:
+                raise DatabaseError('сбой')
+            index_range(cursor, start, stop, **kwargs)
+
+        with mock.patch.object(search, 'index_range', failing):
+            with self.assertRaises(DatabaseError):
+                call_command('rebuild_search_index', batch_size=1,
+                             stdout=None)
+        self.assertEqual(len(self.search('кошк')), 2)
+
+    def test_rebuild_follows_edits_made_meanwhile(self):
+        """Правки уже проиндексированных постов попадают в новый индекс."""
+        index_range = search.index_range
+        post = SearchTests.cat_post
+
+        def editing(cursor, start, stop, **kwargs):
+            index_range(cursor, start, stop, **kwargs)
+            if start == post.id + 1:
+                Post.objects.filter(pk=post.pk).update(text='Жираф')
+
+        with mock.patch.object(search, 'index_range', editing):
+            call_command('rebuild_search_index', batch_size=1, stdout=None)
+        self.assertEqual(list(self.search('жираф')), [post])
+        self.assertEqual(list(self.search('кошк')), [SearchTests.cats_post])
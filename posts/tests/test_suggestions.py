@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import suggestions
+from posts.models import Follow, Group, Post, Suggestion, User
+
+
+class SuggestionsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ['reader', 'friend', 'friend2', 'popular', 'peer', 'other']
+        cls.users = {name: User.objects.create(username=f'sg_{name}')
+                     for name in names}
+        u = cls.users
+        group = Group.objects.create(title='Кружок', slug='sg_group',
+                                     description='Общая группа')
+        for user, author in [('reader', 'friend'), ('reader', 'friend2'),
+                             ('friend', 'popular'), ('friend2', 'popular'),
+                             ('friend', 'other'), ('friend', 'reader')]:
+            Follow.objects.create(user=u[user], author=u[author])
+        for author in ('reader', 'peer'):
+            Post.objects.create(text='Пост в группе', author=u[author],
+                                group=group)
+
+    def setUp(self):
+        cache.clear()
+
+    def suggested(self, name):
+        return [(suggestion.author.username, suggestion.score)
+                for suggestion in suggestions.for_user(self.users[name])]
+
+    def test_ranks_second_degree_and_group_peers(self):
+        """Друзья друзей выше соседей по группе; свои подписки не в списке."""
+        suggestions.rebuild()
+        self.assertEqual(self.suggested('reader'), [
+            ('sg_popular', 2.0), ('sg_other', 1.0), ('sg_peer', 0.5)])
+
+    def test_rebuild_replaces_previous_results(self):
+        """Пересчёт заменяет старые строки и убирает устаревшие."""
+        suggestions.rebuild()
+        Follow.objects.filter(author=self.users['popular']).delete()
+        Post.objects.filter(author=self.users['peer']).delete()
+        suggestions.rebuild(batch_size=1)
+        self.assertEqual(self.suggested('reader'), [('sg_other', 1.0)])
+        self.assertFalse(Suggestion.objects.filter(
+            user=self.users['peer']).exists())
+
+    def test_follow_removes_suggestion(self):
+        """После подписки автор пропадает из рекомендаций."""
+        suggestions.rebuild()
+        client = Client()
+        client.force_login(self.users['reader'])
+        client.get(reverse('profile_follow', args=['sg_popular']))
+        self.assertEqual(self.suggested('reader'),
+                         [('sg_other', 1.0), ('sg_peer', 0.5)])
+        response = client.get(reverse('follow_index'))
+        self.assertContains(response, 'Кого почитать')
+        self.assertNotContains(response, '@sg_popular')
+
+    def test_read_with_one_query(self):
+        """Профиль получает рекомендации одним запросом."""
+        suggestions.rebuild()
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.suggested('reader')), 3)
+        client = Client()
+        client.force_login(self.users['reader'])
+        response = client.get(reverse('profile', args=['sg_friend']))
+        self.assertContains(response, '@sg_popular')
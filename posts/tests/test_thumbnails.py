@@ -0,0 +1,52 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Post, User
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (40, 20), (255, 0, 0, 128)).save(buffer, 'PNG')
+        self.author = User.objects.create(username='painter')
+        self.post = Post.objects.create(
+            text='Пост с картинкой', author=self.author,
+            image=SimpleUploadedFile('red.png', buffer.getvalue(),
+                                     content_type='image/png'))
+
+    def test_generate_builds_padded_jpeg(self):
+        """Миниатюра — JPEG заданного размера с фоном вместо прозрачности."""
+        thumbnails.generate(self.post.image.name)
+        name = thumbnails.thumbnail_name(self.post.image.name, 'card')
+        with default_storage.open(name, 'rb') as thumb:
+            image = Image.open(thumb)
+            image.load()
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, settings.POST_THUMBNAIL_SIZES['card'])
+
+    def test_feed_shows_original_until_thumbnail_ready(self):
+        """Пока миниатюры нет, лента показывает оригинал, затем миниатюру."""
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, self.post.image.url)
+        thumbnails.generate(self.post.image.name,
+                            thumbnails.versions.post_scopes(self.post))
+        response = self.client.get(reverse('index'))
+        name = thumbnails.thumbnail_name(self.post.image.name, 'card')
+        self.assertContains(response, default_storage.url(name))
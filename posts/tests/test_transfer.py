@@ -0,0 +1,101 @@
+import datetime as dt
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import transfer
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserStats)
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='transfer_author')
+        cls.reader = User.objects.create(username='transfer_reader')
+        cls.group = Group.objects.create(
+            title='Группа для выгрузки',
+            slug='transfer_slug',
+            description='Описание'
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'dump.ndjson.gz')
+        posts = [Post.objects.create(text='Пост %s' % number,
+                                     author=TransferTests.author,
+                                     group=TransferTests.group)
+                 for number in range(3)]
+        Comment.objects.create(post=posts[1], author=TransferTests.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=TransferTests.reader,
+                              author=TransferTests.author)
+        call_command('export_data', self.path, stdout=StringIO(),
+                     stderr=StringIO())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_import_remaps_foreign_keys(self):
+        """Загрузка в базу с теми же людьми не дублирует их и связывает
+        комментарий с новой копией поста."""
+        old_ids = set(Post.objects.values_list('id', flat=True))
+        transfer.Importer(self.path, batch_size=2).run()
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Post.objects.count(), 6)
+        copy = Comment.objects.exclude(post_id__in=old_ids).get()
+        self.assertEqual(copy.post.text, 'Пост 1')
+        self.assertEqual(copy.author, TransferTests.reader)
+        # Новые посты доставлены подписчику без сигналов
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=TransferTests.reader).count(), 6)
+        self.assertEqual(UserStats.objects.get(
+            user=TransferTests.author).posts_count, 6)
+
+    def test_interrupted_import_resumes_from_checkpoint(self):
+        """После сбоя загрузка продолжается с последней сохранённой пачки."""
+        importer = transfer.Importer(self.path, batch_size=2)
+        flush = importer._flush
+        calls = []
+
+        def failing_flush(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError('сбой')
+            flush(*args)
+
+        with mock.patch.object(importer, '_flush', failing_flush):
+            with self.assertRaises(RuntimeError):
+                importer.run()
+        position, rows = transfer.Importer(self.path).checkpoint()
+        self.assertGreater(position, 0)
+        self.assertEqual(rows, 3)
+        transfer.Importer(self.path, batch_size=2).run()
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(transfer.Importer(self.path).checkpoint(), (0, 0))
+
+    def test_import_keeps_original_dates(self):
+        """Даты постов и комментариев переносятся, а не ставятся заново."""
+        old_ids = set(Post.objects.values_list('id', flat=True))
+        date = timezone.now().replace(microsecond=0) - dt.timedelta(days=30)
+        Post.objects.update(pub_date=date)
+        Comment.objects.update(created=date)
+        call_command('export_data', self.path, stdout=StringIO(),
+                     stderr=StringIO())
+        transfer.Importer(self.path, batch_size=2).run()
+        copies = Post.objects.exclude(id__in=old_ids)
+        self.assertEqual(set(copies.values_list('pub_date', flat=True)),
+                         {date})
+        self.assertEqual(Comment.objects.exclude(post_id__in=old_ids).get(
+        ).created, date)
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
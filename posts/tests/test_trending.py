@@ -0,0 +1,86 @@
+import math
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import trending
+from posts.models import Comment, Group, Post, TrendingScore, User
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='trend_author')
+        cls.group = Group.objects.create(title='Тренды', slug='trend_group',
+                                         description='Группа')
+        cls.quiet = Post.objects.create(text='Тихий пост', author=cls.author)
+        cls.hot = Post.objects.create(text='Горячий пост', author=cls.author,
+                                      group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        trending._views.clear()
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.author,
+                                   text='Комментарий')
+
+    def test_activity_decays_with_half_life(self):
+        """Старая активность весит вдвое меньше через период полураспада."""
+        half_life = settings.TRENDING_HALF_LIFE
+        with mock.patch('time.time', lambda: 1000 * half_life):
+            trending.record(self.quiet.id, None, 1)
+        with mock.patch('time.time', lambda: 1001 * half_life):
+            trending.record(self.quiet.id, None, 1)
+        heat = TrendingScore.objects.get(post=self.quiet).heat
+        self.assertAlmostEqual(heat, math.log2(1.5) + 1001)
+
+    def test_comments_rank_posts_globally_and_in_group(self):
+        """Комментарии поднимают пост в общем топе и в топе его группы."""
+        self.comment(self.quiet)
+        self.comment(self.hot, 3)
+        trending.refresh()
+        self.assertEqual([post_id for post_id, _ in trending.cached_posts()],
+                         [self.hot.id, self.quiet.id])
+        self.assertEqual(
+            [post_id for post_id, _ in trending.cached_posts(self.group.id)],
+            [self.hot.id])
+        self.assertEqual([group_id for group_id, _ in
+                          trending.cached_groups()], [self.group.id])
+
+    @override_settings(TRENDING_VIEW_FLUSH=0)
+    def test_views_reach_database_through_refresh(self):
+        """Просмотры копятся в кеше и попадают в базу задачей refresh."""
+        client = Client()
+        for _ in range(3):
+            client.get(reverse('post', args=['trend_author', self.quiet.id]))
+        self.assertFalse(TrendingScore.objects.exists())
+        trending.refresh()
+        heat = TrendingScore.objects.get(post=self.quiet).heat
+        self.assertAlmostEqual(heat, math.log2(
+            3 * settings.TRENDING_VIEW_WEIGHT) + trending._now(), places=3)
+
+    def test_cold_posts_pruned(self):
+        """Остывший пост выпадает из таблицы при обновлении."""
+        self.comment(self.quiet)
+        TrendingScore.objects.update(heat=trending._now() - 20)
+        trending.refresh()
+        self.assertFalse(TrendingScore.objects.exists())
+
+    def test_page_reads_posts_by_primary_key(self):
+        """Страница популярного берёт топ из кеша, посты — по ключу."""
+        self.comment(self.hot)
+        trending.refresh()
+        client = Client()
+        with self.assertNumQueries(2):
+            response = client.get(reverse('trending'))
+        self.assertEqual(list(response.context['page']), [self.hot])
+        self.assertEqual(response.context['groups'], [self.group])
+        response = client.get(reverse('group_trending',
+                                      args=['trend_group']))
+        self.assertContains(response, 'Горячий пост')
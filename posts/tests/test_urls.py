@@ -3,6 +3,7 @@ from django.test import Client, TestCase
 from django.urls import reverse
 
 from posts.models import Group, Post, User
+from users.forms import CreationForm
 
 
 class StaticURLTests(TestCase):
@@ -145,6 +146,27 @@ class YatubeURLTests(TestCase):
         response = self.guest_client.get(reverse('error_404'))
         self.assertEqual(response.status_code, 404)
 
+    def test_site_pages_do_not_hide_profiles(self):
+        """Профили с именами общих страниц открываются, а не прячутся."""
+        for username in ('trending', 'search', 'live', 'feed',
+                         'cache-stats'):
+            with self.subTest(username=username):
+                User.objects.create(username=username)
+                response = self.guest_client.get(
+                    reverse('profile', args=[username]))
+                self.assertEqual(response.context['author'].username,
+                                 username)
+        response = self.guest_client.get(
+            reverse('profile_feed', args=['feed', 'rss']))
+        self.assertEqual(response.status_code, 200)
+
+    def test_reserved_usernames_are_rejected(self):
+        """Имя, занятое адресом сайта, при регистрации не принимается."""
+        form = CreationForm(data={'username': 'Explore',
+                                  'password1': 'Zx9!long-pass',
+                                  'password2': 'Zx9!long-pass'})
+        self.assertIn('username', form.errors)
+
 
 class YatubeURLCommentsTests(TestCase):
     @classmethod
@@ -5,10 +5,15 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post, User
+from posts import jobs
+from posts.middleware import QueryBudgetExceeded
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+from posts.testing import QueryBudgetMixin
 
 
 class YatubePagesTests(TestCase):
@@ -452,6 +457,118 @@ class YatubeCacheTests(TestCase):
         # Убедимся, что постов в базе больше, чем на главной странице
         self.assertEqual(second_response + 1, Post.objects.count())
 
+    def test_new_post_invalidates_index_fragment(self):
+        """Новый пост сразу виден на закешированной главной."""
+        cache.clear()
+        guest_client = Client()
+        self.assertNotContains(guest_client.get(reverse('index')),
+                               'Свежий пост')
+        Post.objects.create(text='Свежий пост', author=YatubeCacheTests.author)
+        self.assertContains(guest_client.get(reverse('index')), 'Свежий пост')
+
+    def test_index_fragment_is_shared_between_readers(self):
+        """Гость и читатель без своих постов получают один фрагмент."""
+        cache.clear()
+        reader = User.objects.create(username='cache_reader')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        guest = Client().get(reverse('index'))
+        logged = reader_client.get(reverse('index'))
+        author = self.authorized_client.get(reverse('index'))
+        self.assertEqual(guest.context.get('feed_variant'), 'shared')
+        self.assertEqual(logged.context.get('feed_variant'), 'shared')
+        self.assertEqual(author.context.get('feed_variant'),
+                         f'user:{YatubeCacheTests.author.id}')
+        self.assertContains(author, 'Редактировать')
+        self.assertNotContains(logged, 'Редактировать')
+
+    @override_settings(FEED_CACHE_PAGES=2)
+    def test_fragment_key_uses_normalized_page(self):
+        """Ключ фрагмента — номер страницы; курсорные не кешируются."""
+        client = Client()
+        for query, expected in [('', 1), ('?utm_source=x', 1), ('?page=1', 1),
+                                ('?page=2&utm_source=x', 2), ('?page=3', None),
+                                ('?after=abc', None)]:
+            with self.subTest(query=query):
+                response = client.get(reverse('index') + query)
+                self.assertEqual(response.context.get('feed_page'), expected)
+
+
+class YatubeConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='etag_author')
+        cls.post = Post.objects.create(text='Пост для ETag',
+                                       author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create(username='etag_reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, url, response, client=None):
+        client = client or self.reader_client
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_answer_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304."""
+        author = YatubeConditionalGetTests.author
+        for url in (reverse('index'),
+                    reverse('profile', args=[author.username]),
+                    reverse('post', args=[author.username,
+                                          YatubeConditionalGetTests.post.id])):
+            with self.subTest(url=url):
+                # Первый ответ страницы с формой ставит CSRF-куку
+                self.reader_client.get(url)
+                response = self.reader_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 304)
+
+    def test_changes_and_viewer_change_etag(self):
+        """Новый пост, подписка и другой зритель дают новую страницу."""
+        author = YatubeConditionalGetTests.author
+        index = reverse('index')
+        response = self.reader_client.get(index)
+        guest = self.revalidate(index, response, Client())
+        self.assertEqual(guest.status_code, 200)
+        Post.objects.create(text='Ещё пост', author=author)
+        self.assertEqual(self.revalidate(index, response).status_code, 200)
+
+        profile = reverse('profile', args=[author.username])
+        response = self.reader_client.get(profile)
+        Follow.objects.create(user=self.reader, author=author)
+        self.assertEqual(self.revalidate(profile, response).status_code, 200)
+
+    def test_missing_post_is_not_revalidated(self):
+        """Чужой или несуществующий пост отдаёт 404, а не 304."""
+        post_id = YatubeConditionalGetTests.post.id
+        for url in (reverse('post', args=[self.reader.username, post_id]),
+                    reverse('post', args=['etag_author', post_id + 100])):
+            with self.subTest(url=url):
+                response = self.reader_client.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, 404)
+
+    def test_author_rename_changes_etag(self):
+        """Новое имя автора в карточке даёт новую страницу профиля и поста."""
+        author = YatubeConditionalGetTests.author
+        urls = (reverse('profile', args=[author.username]),
+                reverse('post', args=[author.username,
+                                      YatubeConditionalGetTests.post.id]))
+        # Первый ответ страницы с формой ставит CSRF-куку
+        self.reader_client.get(urls[1])
+        responses = [self.reader_client.get(url) for url in urls]
+        author.first_name = 'Лев'
+        author.save()
+        for url, response in zip(urls, responses):
+            with self.subTest(url=url):
+                again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 200)
+                self.assertContains(again, 'Лев')
+
 
 class YatubeFollowingTests(TestCase):
     @classmethod
@@ -546,3 +663,284 @@ class YatubeFollowingTests(TestCase):
         response = self.authorized_client.get(reverse('follow_index'))
         # Проверяем, что постов в ленте не-подписчика нет
         self.assertEqual(response.context.get('posts'), None)
+
+
+class YatubeFeedQueriesTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='feed_author')
+        cls.commentator = User.objects.create(username='feed_commentator')
+        cls.group = Group.objects.create(
+            title='Группа ленты',
+            slug='feed_slug',
+            description='Описание группы ленты'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text=f'Пост ленты {i}',
+                author=YatubeFeedQueriesTests.author,
+                group=YatubeFeedQueriesTests.group
+            )
+            Comment.objects.create(
+                post=post,
+                author=YatubeFeedQueriesTests.commentator,
+                text='Комментарий'
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_feed_query_count_does_not_depend_on_posts(self):
+        """Число запросов ленты не растёт с числом карточек."""
+        urls = [
+            reverse('index'),
+            reverse('group', kwargs={'slug': 'feed_slug'}),
+            reverse('profile', kwargs={'username': 'feed_author'}),
+        ]
+        self.add_posts(1)
+        one_post = [self.count_queries(url) for url in urls]
+        self.add_posts(9)
+        ten_posts = [self.count_queries(url) for url in urls]
+        self.assertEqual(one_post, ten_posts)
+
+    def test_pages_fit_query_budgets(self):
+        """Основные страницы укладываются в бюджеты QUERY_BUDGETS."""
+        self.add_posts(12)
+        author = YatubeFeedQueriesTests.author
+        reader = YatubeFeedQueriesTests.commentator
+        Follow.objects.create(user=reader, author=author)
+        post = Post.objects.filter(author=author).first()
+        for i in range(5):
+            Comment.objects.create(post=post, author=reader,
+                                   text=f'Ещё комментарий {i}')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        urls = [
+            reverse('index'),
+            reverse('index') + '?page=2',
+            reverse('group', kwargs={'slug': 'feed_slug'}),
+            reverse('profile', kwargs={'username': author.username}),
+            reverse('post', kwargs={'username': author.username,
+                                    'post_id': post.id}),
+            reverse('search') + '?q=Пост',
+        ]
+        for client in (self.guest_client, reader_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    cache.clear()
+                    self.assertQueryBudget(client, url)
+        self.assertQueryBudget(reader_client, reverse('follow_index'))
+
+    @override_settings(QUERY_BUDGETS={'index': 0}, QUERY_BUDGET_RAISE=True)
+    def test_exceeded_budget_raises(self):
+        """Превышение бюджета в тестах — исключение."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.guest_client.get(reverse('index'))
+
+    def test_feed_shows_comments_count(self):
+        """Карточка показывает число комментариев из аннотации."""
+        self.add_posts(1)
+        response = self.guest_client.get(reverse('index'))
+        self.assertEqual(response.context.get('page')[0].comments_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class YatubeTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='timeline_author')
+        cls.reader = User.objects.create(username='timeline_reader')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(YatubeTimelineTests.reader)
+
+    def follow_page(self, query=''):
+        response = self.authorized_client.get(reverse('follow_index') + query)
+        return response.context.get('page')
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост попадает в материализованную ленту подписчика."""
+        reader = YatubeTimelineTests.reader
+        author = YatubeTimelineTests.author
+        Follow.objects.create(user=reader, author=author)
+        post = Post.objects.create(text='Пост в ленту', author=author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=reader, post=post).exists())
+        self.assertEqual(self.follow_page()[0], post)
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту, отписка очищает её."""
+        reader = YatubeTimelineTests.reader
+        author = YatubeTimelineTests.author
+        Post.objects.create(text='Старый пост', author=author)
+        self.authorized_client.get(
+            reverse('profile_follow', kwargs={'username': author.username}))
+        self.assertEqual(TimelineEntry.objects.filter(user=reader).count(), 1)
+        self.authorized_client.get(
+            reverse('profile_unfollow', kwargs={'username': author.username}))
+        self.assertFalse(TimelineEntry.objects.filter(user=reader).exists())
+        self.assertEqual(len(self.follow_page()), 0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_pulled_on_read(self):
+        """Посты популярного автора подмешиваются при чтении ленты."""
+        reader = YatubeTimelineTests.reader
+        author = YatubeTimelineTests.author
+        Follow.objects.create(user=reader, author=author)
+        posts = [Post.objects.create(text=f'Пост {i}', author=author)
+                 for i in range(12)]
+        self.assertFalse(TimelineEntry.objects.filter(user=reader).exists())
+        expected = [post.id for post in reversed(posts)]
+        first = self.follow_page()
+        self.assertEqual(len(first), 10)
+        self.assertEqual(first.paginator.count, 12)
+        second = self.follow_page('?page=2')
+        ids = [post.id for post in first] + [post.id for post in second]
+        self.assertEqual(ids, expected)
+        # Та же лента в курсорном режиме
+        with self.settings(FEED_NUMBERED_MAX_ROWS=5):
+            first = self.follow_page()
+            second = self.follow_page('?after=' + first.next_cursor)
+        ids = [post.id for post in first] + [post.id for post in second]
+        self.assertEqual(ids, expected)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_back_to_push_backfills_followers(self):
+        """После отписки ниже порога посты автора доставляются в ленты."""
+        reader = YatubeTimelineTests.reader
+        author = YatubeTimelineTests.author
+        other = User.objects.create(username='timeline_other')
+        Follow.objects.create(user=reader, author=author)
+        Follow.objects.create(user=other, author=author)
+        post = Post.objects.create(text='Пост pull-автора', author=author)
+        self.assertFalse(TimelineEntry.objects.filter(user=reader).exists())
+        Follow.objects.filter(user=other).delete()
+        # Пока задача в очереди, пост подмешивается при чтении
+        self.assertEqual(list(self.follow_page()), [post])
+        jobs.work(once=True)
+        self.assertEqual(list(self.follow_page()), [post])
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=reader, post=post).exists())
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class YatubeCommentsPaginationTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='comments_author')
+        cls.post = Post.objects.create(text='Обсуждаемый пост',
+                                       author=cls.author)
+        cls.comments = [
+            Comment.objects.create(post=cls.post, author=cls.author,
+                                   text=f'Комментарий {i}')
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def post_url(self, name='post'):
+        return reverse(name, kwargs={
+            'username': 'comments_author',
+            'post_id': YatubeCommentsPaginationTests.post.id})
+
+    def test_post_page_shows_first_comments(self):
+        """Страница поста показывает первую порцию новых комментариев."""
+        response = self.guest_client.get(self.post_url())
+        page = response.context['comments_page']
+        self.assertEqual(
+            [comment.id for comment in page],
+            [comment.id for comment in
+             YatubeCommentsPaginationTests.comments[:-6:-1]])
+        self.assertContains(response, 'Показать ещё')
+
+    def test_fragment_returns_next_comments(self):
+        """Фрагмент по курсору отдаёт следующие порции до конца."""
+        cursor = self.guest_client.get(
+            self.post_url()).context['comments_page'].next_cursor
+        seen = []
+        while cursor:
+            response = self.guest_client.get(
+                self.post_url('post_comments') + '?after=' + cursor)
+            self.assertTemplateUsed(response, 'comment_items.html')
+            self.assertTemplateNotUsed(response, 'post.html')
+            page = response.context['comments_page']
+            seen += [comment.id for comment in page]
+            cursor = page.next_cursor
+        self.assertEqual(
+            seen, [comment.id for comment in
+                   YatubeCommentsPaginationTests.comments[-6::-1]])
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_comments_fit_query_budget(self):
+        """Фрагмент комментариев укладывается в бюджет запросов."""
+        self.assertQueryBudget(self.guest_client,
+                               self.post_url('post_comments'))
+
+
+class YatubePostDetailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='detail_author')
+        cls.reader = User.objects.create(username='detail_reader')
+        cls.group = Group.objects.create(
+            title='Группа поста',
+            slug='detail_slug',
+            description='Описание'
+        )
+        cls.post = Post.objects.create(text='Подробный пост',
+                                       author=cls.author, group=cls.group)
+        for i in range(3):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'Комментарий {i}')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.url = reverse('post', args=['detail_author',
+                                         YatubePostDetailTests.post.id])
+
+    def test_anonymous_post_page_takes_three_queries(self):
+        """ETag, пост с автором и группой, комментарии — три запроса."""
+        cache.clear()
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Группа поста')
+        self.assertContains(response, 'Комментарий 2')
+
+    def test_missing_post_is_404(self):
+        """Чужой или несуществующий пост автора — 404, а не ошибка."""
+        other = Post.objects.create(text='Чужой пост',
+                                    author=YatubePostDetailTests.reader)
+        for post_id in (other.id, other.id + 100):
+            with self.subTest(post_id=post_id):
+                response = self.guest_client.get(
+                    reverse('post', args=['detail_author', post_id]))
+                self.assertEqual(response.status_code, 404)
+
+    def test_author_card_is_shared_and_follow_refreshes_it(self):
+        """Карточка автора общая для профиля и поста; подписка её обновляет."""
+        cache.clear()
+        profile = reverse('profile', args=['detail_author'])
+        self.assertContains(self.guest_client.get(profile), 'Подписчиков: 0')
+        self.assertContains(self.guest_client.get(self.url), 'Подписчиков: 0')
+        Follow.objects.create(user=YatubePostDetailTests.reader,
+                              author=YatubePostDetailTests.author)
+        self.assertContains(self.guest_client.get(self.url), 'Подписчиков: 1')
+        self.assertContains(self.guest_client.get(profile), 'Подписчиков: 1')
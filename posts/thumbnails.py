@@ -0,0 +1,74 @@
+"""Миниатюры картинок постов, заранее подготовленные при загрузке.
+
+Раньше миниатюра строилась тегом {% thumbnail %} при первом показе
+карточки, и первый посетитель ленты платил за декодирование и сжатие всех
+новых картинок. Теперь new_post и post_edit ставят задачу в очередь
+posts.jobs в транзакции поста, её выполняет manage.py runworker, а шаблон
+до готовности миниатюры показывает оригинал. Готовность проверяется
+наличием файла, без запросов к базе.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from . import jobs, versions
+
+
+def thumbnail_name(image_name, size):
+    base, _ = os.path.splitext(image_name)
+    return 'thumbs/%s/%s.jpg' % (size, base.lstrip('/'))
+
+
+def thumbnail_url(image_name, size):
+    """URL готовой миниатюры или None, если она ещё не построена."""
+    name = thumbnail_name(image_name, size)
+    if default_storage.exists(name):
+        return default_storage.url(name)
+    return None
+
+
+def render(image, width, height):
+    # Как в прежнем {% thumbnail %}: вписать с увеличением и добить фоном
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        background = Image.new('RGB', image.size,
+                               settings.POST_THUMBNAIL_PADDING_COLOR)
+        image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    return ImageOps.pad(image, (width, height), method=Image.LANCZOS,
+                        color=settings.POST_THUMBNAIL_PADDING_COLOR)
+
+
+def generate(image_name, scopes=()):
+    """Построить все размеры миниатюр для картинки."""
+    with default_storage.open(image_name, 'rb') as source:
+        image = Image.open(source)
+        image.load()
+    for size, (width, height) in settings.POST_THUMBNAIL_SIZES.items():
+        name = thumbnail_name(image_name, size)
+        if default_storage.exists(name):
+            continue
+        buffer = BytesIO()
+        render(image, width, height).save(
+            buffer, 'JPEG', quality=settings.POST_THUMBNAIL_QUALITY,
+            optimize=True, progressive=True)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+    # Закешированные фрагменты лент должны подхватить миниатюру;
+    # транзакции здесь нет, поэтому без transaction.on_commit
+    versions.bump_now(*scopes)
+
+
+def schedule(post):
+    """Поставить построение миниатюр в очередь вместе с постом."""
+    if not post.image:
+        return
+    image_name = post.image.name
+    # Ключ — имя файла: повторное сохранение поста с той же картинкой
+    # второй задачи не создаст
+    jobs.enqueue(generate, image_name, versions.post_scopes(post),
+                 key='thumbnails:%s' % image_name)
@@ -0,0 +1,232 @@
+"""Лента подписок с доставкой постов при записи (fan-out on write).
+
+Новый пост копируется в TimelineEntry каждого подписчика автора, поэтому
+страница /follow/ читается одним проходом по индексу ленты пользователя.
+Авторов с очень большим числом подписчиков не размножаем: их посты
+подмешиваются при чтении (pull), чтобы один пост не порождал всплеск
+записей.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import CharField, Exists, OuterRef, Q, Value
+from django.db.models.functions import Cast, Concat
+
+from . import jobs
+from .models import Follow, Job, Post, TimelineEntry, UserStats
+from .pagination import (FEED_ORDERING, CursorPage, CursorPaginator,
+                         InvalidCursor, bounded_count, cursor_context,
+                         numbered_context, page_number)
+
+TIMELINE_ORDERING = ('-pub_date', '-post')
+
+
+def is_pull_author(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT).exists()
+
+
+def _backfill_pending():
+    # Задача backfill_followers(author_id) для автора подписки ещё не
+    # выполнена; аргументы задачи — JSON-список вида [author_id]
+    return Exists(Job.objects.filter(
+        task=jobs.task_path(backfill_followers),
+        status__in=[Job.QUEUED, Job.RUNNING],
+        args=Concat(Value('['), Cast(OuterRef('author_id'), CharField()),
+                    Value(']')),
+    ))
+
+
+def pulled_authors(user):
+    """Авторы из подписок пользователя, чьи посты подмешиваются при чтении.
+
+    Кроме популярных авторов сюда попадает автор, вернувшийся к push, пока
+    его посты не разложены по лентам задачей backfill_followers.
+    """
+    return list(Follow.objects.filter(user=user).annotate(
+        backfill_pending=_backfill_pending(),
+    ).filter(
+        Q(author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT)
+        | Q(backfill_pending=True),
+    ).values_list('author_id', flat=True))
+
+
+def _bulk_insert(entries):
+    batch = settings.TIMELINE_BATCH_SIZE
+    for start in range(0, len(entries), batch):
+        TimelineEntry.objects.bulk_create(entries[start:start + batch],
+                                          ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Доставить новый пост в ленты подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _bulk_insert([
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    ])
+
+
+def fan_out_many(posts):
+    """Доставить пачку постов, созданных без сигналов (bulk_create)."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    pulled = set(UserStats.objects.filter(
+        user_id__in=list(by_author),
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True))
+    followers = Follow.objects.filter(
+        author_id__in=[author for author in by_author if author not in pulled],
+    ).values_list('user_id', 'author_id')
+    _bulk_insert([
+        TimelineEntry(user_id=user_id, post_id=post.id, pub_date=post.pub_date)
+        for user_id, author_id in followers.iterator()
+        for post in by_author[author_id]
+    ])
+
+
+def backfill(user_id, author_id):
+    """Заполнить ленту последними постами автора после подписки."""
+    if is_pull_author(author_id):
+        return
+    posts = (Post.objects.filter(author_id=author_id)
+             .order_by(*FEED_ORDERING)
+             .values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL])
+    _bulk_insert([
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+    ])
+
+
+def backfill_followers(author_id):
+    """Заполнить ленты всех подписчиков автора, вернувшегося к push.
+
+    Пока у автора было больше TIMELINE_FANOUT_LIMIT подписчиков, его посты
+    не доставлялись; после отписок их нужно разложить по лентам, иначе
+    они пропадут из /follow/. Запускается задачей из очереди; до её
+    выполнения посты автора подмешиваются при чтении (pulled_authors).
+    """
+    if is_pull_author(author_id):
+        return
+    posts = list(Post.objects.filter(author_id=author_id)
+                 .order_by(*FEED_ORDERING)
+                 .values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL])
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        _bulk_insert([
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ])
+
+
+def follower_removed(author_id):
+    """После отписки: если автор перешёл из pull в push, дозаполнить ленты."""
+    if UserStats.objects.filter(
+            user_id=author_id,
+            followers_count=settings.TIMELINE_FANOUT_LIMIT).exists():
+        jobs.enqueue(backfill_followers, author_id)
+
+
+def prune(user_id, author_id):
+    """Убрать из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__in=Post.objects.filter(author_id=author_id).values('id'),
+    ).delete()
+
+
+def _load_posts(keys):
+    # keys — пары (pub_date, post_id) в порядке ленты
+    posts = Post.objects.feed().in_bulk([post_id for _, post_id in keys])
+    return [posts[post_id] for _, post_id in keys if post_id in posts]
+
+
+class TimelineFeed:
+    """Последовательность постов ленты для django.core.paginator.Paginator.
+
+    Сливает материализованную ленту и посты pull-авторов по (pub_date, id).
+    """
+
+    def __init__(self, user):
+        self.pulled = pulled_authors(user)
+        self.entries = TimelineEntry.objects.filter(user=user)
+        if self.pulled:
+            self.entries = self.entries.exclude(
+                post__author_id__in=self.pulled)
+        self.pulled_posts = Post.objects.filter(author_id__in=self.pulled)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        stop = index.stop
+        keys = list(self.entries.order_by(*TIMELINE_ORDERING)
+                    .values_list('pub_date', 'post_id')[:stop])
+        if self.pulled:
+            keys += list(self.pulled_posts.order_by(*FEED_ORDERING)
+                         .values_list('pub_date', 'id')[:stop])
+            keys.sort(reverse=True)
+        return _load_posts(keys[index])
+
+
+def cursor_page(feed, per_page, after, before, load=_load_posts):
+    """Курсорная страница ленты; load превращает ключи в записи."""
+    # Каждая часть ленты отдаёт не больше страницы после курсора,
+    # затем части сливаются; курсоры обеих частей совпадают по формату
+    parts = [CursorPaginator(feed.entries, per_page, TIMELINE_ORDERING)
+             .page(after=after, before=before)]
+    if feed.pulled:
+        parts.append(CursorPaginator(feed.pulled_posts, per_page)
+                     .page(after=after, before=before))
+    keys = []
+    for part, (date_field, id_field) in zip(
+            parts, [('pub_date', 'post_id'), ('pub_date', 'id')]):
+        keys += [(getattr(row, date_field), getattr(row, id_field))
+                 for row in part]
+    keys.sort(reverse=True)
+    has_next = any(part.has_next() for part in parts)
+    has_previous = any(part.has_previous() for part in parts)
+    if before is not None:
+        has_previous = has_previous or len(keys) > per_page
+        keys = keys[-per_page:]
+    else:
+        has_next = has_next or len(keys) > per_page
+        keys = keys[:per_page]
+    return CursorPage(load(keys),
+                      CursorPaginator(Post.objects.all(), per_page),
+                      has_next, has_previous)
+
+
+def paginate_timeline(request, user):
+    """Контекст пагинации ленты подписок, аналог pagination.paginate."""
+    per_page = settings.POSTS_PER_PAGE
+    feed = TimelineFeed(user)
+    after = request.GET.get('after') or None
+    before = request.GET.get('before') or None
+    limit = settings.FEED_NUMBERED_MAX_ROWS
+    if not (after or before):
+        count = bounded_count(feed.entries, limit)
+        if feed.pulled and count <= limit:
+            count += bounded_count(feed.pulled_posts, limit)
+        if count <= limit:
+            return numbered_context(request, feed, count)
+    number = page_number(request)
+    if number is None or after or before:
+        try:
+            page = cursor_page(feed, per_page, after, before)
+        except InvalidCursor:
+            page = cursor_page(feed, per_page, None, None)
+        return cursor_context(page)
+    offset = (number - 1) * per_page
+    rows = feed[offset:offset + per_page + 1]
+    if not rows:
+        return cursor_context(cursor_page(feed, per_page, None, None))
+    return cursor_context(
+        CursorPage(rows[:per_page], CursorPaginator(Post.objects.all(),
+                                                    per_page),
+                   len(rows) > per_page, True))
@@ -0,0 +1,284 @@
+"""Выгрузка и загрузка данных в NDJSON.
+
+Каждая строка файла — одна запись:
+{"model": "posts.post", "pk": 12, "fields": {"author": 3, ...}}.
+Внешние ключи хранят pk исходной базы; при загрузке они заменяются на
+новые pk по таблице соответствий posts_import_idmap. Пользователи и группы
+сопоставляются по username и slug, поэтому совпадающие записи не
+дублируются. Новые pk постов и комментариев назначает база; SQLite их из
+bulk_create не возвращает, поэтому там пачка получает pk сразу за текущим
+максимумом, прочитанным под блокировкой записи своей транзакции.
+
+Загрузка идёт пачками; каждая пачка, её соответствия pk и позиция в файле
+(posts_import_checkpoint) сохраняются одной транзакцией, поэтому
+прерванную загрузку можно перезапустить с того же места без дублей.
+bulk_create не отправляет сигналов: ленты подписок заполняются по ходу
+загрузки, счётчики пересчитываются в конце.
+"""
+import gzip
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import counters, timeline
+from .models import Comment, Follow, Group, Post, User
+
+CHECKPOINT_TABLE = 'posts_import_checkpoint'
+IDMAP_TABLE = 'posts_import_idmap'
+# Ограничение числа параметров запроса в SQLite
+LOOKUP_CHUNK = 500
+
+
+class Spec:
+    def __init__(self, model, fields, natural=None, fks=None, keep_ids=True):
+        self.model = model
+        self.label = model._meta.label_lower
+        self.fields = fields
+        # Поле с естественным ключом: по нему запись ищется в базе
+        self.natural = natural
+        # Поле внешнего ключа → метка модели, на которую оно ссылается
+        self.fks = fks or {}
+        # Нужно ли помнить новые pk: на подписки никто не ссылается
+        self.keep_ids = keep_ids
+
+    def attname(self, name):
+        return self.model._meta.get_field(name).attname
+
+
+SPECS = [
+    Spec(User, ['username', 'first_name', 'last_name', 'email', 'password',
+                'is_staff', 'is_active', 'is_superuser', 'date_joined',
+                'last_login'], natural='username'),
+    Spec(Group, ['title', 'slug', 'description'], natural='slug'),
+    Spec(Post, ['text', 'pub_date', 'author', 'group', 'image'],
+         fks={'author': 'auth.user', 'group': 'posts.group'}),
+    Spec(Comment, ['post', 'author', 'text', 'created'],
+         fks={'post': 'posts.post', 'author': 'auth.user'}),
+    Spec(Follow, ['user', 'author'],
+         fks={'user': 'auth.user', 'author': 'auth.user'}, keep_ids=False),
+]
+SPECS_BY_LABEL = {spec.label: spec for spec in SPECS}
+
+
+def open_file(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def export(stream, labels=None, chunk_size=2000, progress=None):
+    """Записать модели в поток построчно; память не зависит от объёма."""
+    for spec in SPECS:
+        if labels and spec.label not in labels:
+            continue
+        attnames = [spec.attname(name) for name in spec.fields]
+        rows = (spec.model.objects.order_by('pk')
+                .values_list('pk', *attnames).iterator(chunk_size=chunk_size))
+        for count, (pk, *values) in enumerate(rows, 1):
+            line = json.dumps({
+                'model': spec.label,
+                'pk': pk,
+                'fields': dict(zip(spec.fields, values)),
+            }, cls=DjangoJSONEncoder, ensure_ascii=False)
+            stream.write(line.encode() + b'\n')
+            if progress and count % chunk_size == 0:
+                progress(spec.label, count)
+        if progress:
+            progress(spec.label, None)
+
+
+# Поля auto_now_add, которые bulk_create заполнил бы текущим временем
+DATE_FIELDS = {Post: 'pub_date', Comment: 'created'}
+
+
+def bulk_create_dated(model, objects, **kwargs):
+    """bulk_create, после которого у записей остаются даты объектов.
+
+    auto_now_add подменяет дату при вставке, поэтому исходные значения
+    записываются следом через bulk_update. Вызывать в транзакции, чтобы
+    подменённые даты не были видны; объектам нужны pk.
+    """
+    name = DATE_FIELDS.get(model)
+    if name is None:
+        return model.objects.bulk_create(objects, **kwargs)
+    dates = [getattr(obj, name) for obj in objects]
+    created = model.objects.bulk_create(objects, **kwargs)
+    for obj, date in zip(objects, dates):
+        setattr(obj, name, date)
+    model.objects.bulk_update(objects, [name])
+    return created
+
+
+class Importer:
+    def __init__(self, path, batch_size=500, deliver=True):
+        self.path = path
+        self.batch_size = batch_size
+        self.deliver = deliver
+        self.rows = 0
+        self.skipped = 0
+
+    # Служебные таблицы
+
+    def _create_tables(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE IF NOT EXISTS %s (source VARCHAR(1024) '
+                'PRIMARY KEY, position BIGINT NOT NULL, '
+                'row_count BIGINT NOT NULL)' % CHECKPOINT_TABLE)
+            cursor.execute(
+                'CREATE TABLE IF NOT EXISTS %s (model VARCHAR(100) NOT NULL, '
+                'old_id BIGINT NOT NULL, new_id BIGINT NOT NULL, '
+                'PRIMARY KEY (model, old_id))' % IDMAP_TABLE)
+
+    def checkpoint(self):
+        """Позиция в файле и число загруженных строк или (0, 0)."""
+        self._create_tables()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT position, row_count FROM %s '
+                           'WHERE source = %%s' % CHECKPOINT_TABLE,
+                           [self.path])
+            row = cursor.fetchone()
+        return row or (0, 0)
+
+    def _save_checkpoint(self, position, rows):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE source = %%s'
+                           % CHECKPOINT_TABLE, [self.path])
+            cursor.execute('INSERT INTO %s (source, position, row_count) '
+                           'VALUES (%%s, %%s, %%s)' % CHECKPOINT_TABLE,
+                           [self.path, position, rows])
+
+    def _lookup(self, label, old_ids):
+        found = {}
+        old_ids = list(old_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(old_ids), LOOKUP_CHUNK):
+                chunk = old_ids[start:start + LOOKUP_CHUNK]
+                cursor.execute(
+                    'SELECT old_id, new_id FROM %s WHERE model = %%s AND '
+                    'old_id IN (%s)' % (IDMAP_TABLE,
+                                        ', '.join(['%s'] * len(chunk))),
+                    [label, *chunk])
+                found.update(cursor.fetchall())
+        return found
+
+    def _remember(self, label, pairs):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO %s (model, old_id, new_id) VALUES (%%s, %%s, %%s)'
+                % IDMAP_TABLE, [(label, old, new) for old, new in pairs])
+
+    def finish(self):
+        """Убрать служебные таблицы после полной загрузки."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS %s' % IDMAP_TABLE)
+            cursor.execute('DELETE FROM %s WHERE source = %%s'
+                           % CHECKPOINT_TABLE, [self.path])
+
+    # Загрузка
+
+    def _resolve(self, spec, records):
+        """Заменить старые pk во внешних ключах; без пары — пропустить."""
+        maps = {}
+        for name, target in spec.fks.items():
+            old_ids = {record['fields'][name] for record in records
+                       if record['fields'][name] is not None}
+            maps[name] = self._lookup(target, old_ids)
+        resolved = []
+        for record in records:
+            fields = dict(record['fields'])
+            for name in spec.fks:
+                if fields[name] is None:
+                    continue
+                new_id = maps[name].get(fields[name])
+                if new_id is None:
+                    break
+                fields[name] = new_id
+            else:
+                resolved.append((record['pk'], fields))
+                continue
+            self.skipped += 1
+        return resolved
+
+    def _build(self, spec, fields):
+        return spec.model(**{
+            spec.attname(name): spec.model._meta.get_field(
+                name).to_python(value) for name, value in fields.items()})
+
+    def _flush(self, spec, records, position):
+        resolved = self._resolve(spec, records)
+        with transaction.atomic():
+            # Позиция пишется первой: на SQLite эта запись берёт блокировку
+            # базы, и Max(pk) в _insert_numbered читается уже под ней
+            self._save_checkpoint(position, self.rows + len(records))
+            if spec.natural:
+                self._insert_natural(spec, resolved)
+            else:
+                self._insert_numbered(spec, resolved)
+        self.rows += len(records)
+
+    def _insert_natural(self, spec, resolved):
+        keys = {fields[spec.natural]: old for old, fields in resolved}
+        lookup = '%s__in' % spec.natural
+        existing = set(spec.model.objects.filter(
+            **{lookup: list(keys)}).values_list(spec.natural, flat=True))
+        spec.model.objects.bulk_create(
+            [self._build(spec, fields) for old, fields in resolved
+             if fields[spec.natural] not in existing],
+            ignore_conflicts=True)
+        self._remember(spec.label, [
+            (keys[key], pk) for key, pk in spec.model.objects.filter(
+                **{lookup: list(keys)}).values_list(spec.natural, 'pk')])
+
+    def _insert_numbered(self, spec, resolved):
+        objects = [self._build(spec, fields) for old, fields in resolved]
+        if (spec.keep_ids
+                and not connection.features.can_return_ids_from_bulk_insert):
+            # Транзакция _flush уже держит блокировку записи, поэтому строк
+            # за максимумом до её коммита никто не добавит
+            start = spec.model.objects.aggregate(top=Max('pk'))['top'] or 0
+            for number, obj in enumerate(objects, start + 1):
+                obj.pk = number
+        # Повторная подписка уже есть в базе; у постов и комментариев pk новые
+        bulk_create_dated(spec.model, objects,
+                          ignore_conflicts=not spec.keep_ids)
+        if spec.keep_ids:
+            self._remember(spec.label, [
+                (old, obj.pk) for (old, _), obj in zip(resolved, objects)])
+        if self.deliver and spec.model is Post:
+            timeline.fan_out_many(objects)
+        if self.deliver and spec.model is Follow:
+            for follow in objects:
+                timeline.backfill(follow.user_id, follow.author_id)
+
+    def run(self, progress=None):
+        position, self.rows = self.checkpoint()
+        spec = None
+        records = []
+        with open_file(self.path, 'rb') as source:
+            source.seek(position)
+            while True:
+                line = source.readline()
+                record = json.loads(line) if line.strip() else None
+                if records and (record is None
+                                or record['model'] != spec.label
+                                or len(records) >= self.batch_size):
+                    # Позиция — начало строки, которая в пачку не вошла
+                    end = source.tell() - len(line)
+                    self._flush(spec, records, end)
+                    records = []
+                    if progress:
+                        progress(spec.label, self.rows)
+                if not line:
+                    break
+                if record is None:
+                    continue
+                spec = SPECS_BY_LABEL[record['model']]
+                records.append(record)
+        counters.rebuild()
+        # Кеш лент собран по старым данным
+        cache.clear()
+        self.finish()
@@ -0,0 +1,175 @@
+"""Популярное: посты и группы по затухающей активности.
+
+Активность поста — комментарии и просмотры, каждые TRENDING_HALF_LIFE
+секунд её вес уменьшается вдвое. Хранится она одним числом heat =
+log2(активность) + время / TRENDING_HALF_LIFE: новое событие прибавляется
+одним UPDATE без чтения строки и без пересчёта остальных, а порядок по
+heat совпадает с порядком по текущей активности, так что топ читается по
+индексу.
+
+Комментарий записывается в транзакции комментария. Просмотр в запросе
+GET базу не трогает (иначе роутер прикрепил бы читателя к основной базе):
+процесс копит просмотры в памяти и раз в TRENDING_VIEW_FLUSH секунд
+дописывает их пачкой в журнал в кеше. Периодическая задача refresh()
+переносит журнал в базу, удаляет остывшие строки и кладёт в кеш топ
+TRENDING_SIZE постов — общий и каждой группы — и топ групп. Страница
+популярного читает топ из кеша и посты одним запросом по первичному ключу.
+"""
+import math
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Log, Power
+
+from .models import Post, TrendingScore
+
+LOG_KEY = 'trending:views:log'
+READ_KEY = 'trending:views:read'
+
+_views = Counter()
+_views_lock = threading.Lock()
+_flushed = time.monotonic()
+
+
+def _now():
+    # Время в периодах полураспада
+    return time.time() / settings.TRENDING_HALF_LIFE
+
+
+def record(post_id, group_id, weight):
+    """Прибавить посту активность weight."""
+    now = _now()
+    updated = TrendingScore.objects.filter(post_id=post_id).update(
+        heat=Log(2, Power(2, F('heat') - now) + weight) + now)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            TrendingScore.objects.create(post_id=post_id, group_id=group_id,
+                                         heat=math.log2(weight) + now)
+    except IntegrityError:
+        # Строку только что создал параллельный запрос
+        record(post_id, group_id, weight)
+
+
+def record_comment(comment):
+    record(comment.post_id, comment.post.group_id,
+           settings.TRENDING_COMMENT_WEIGHT)
+
+
+def post_moved(post):
+    TrendingScore.objects.filter(post_id=post.pk).update(
+        group_id=post.group_id)
+
+
+def record_view(post):
+    """Учесть просмотр поста; в базу он попадёт через refresh()."""
+    with _views_lock:
+        _views[post.pk] += 1
+        if time.monotonic() - _flushed < settings.TRENDING_VIEW_FLUSH:
+            return
+    flush_views()
+
+
+def flush_views():
+    """Дописать накопленные процессом просмотры в журнал в кеше."""
+    global _flushed
+    with _views_lock:
+        pending = dict(_views)
+        _views.clear()
+        _flushed = time.monotonic()
+    if not pending:
+        return
+    try:
+        number = cache.incr(LOG_KEY)
+    except ValueError:
+        cache.add(LOG_KEY, 0, None)
+        number = cache.incr(LOG_KEY)
+    cache.set('trending:views:%s' % number, pending,
+              settings.TRENDING_VIEW_LOG_TIMEOUT)
+
+
+def fold_views():
+    """Перенести журнал просмотров в базу.
+
+    Пачку, номер которой уже выдан, но которая ещё не записана в кеш,
+    refresh() пропустит: это доли секунды просмотров одного процесса.
+    """
+    head = cache.get(LOG_KEY, 0)
+    read = cache.get(READ_KEY, 0)
+    if read > head:
+        # Журнал вытеснен из кеша и начался заново
+        read = 0
+    keys = ['trending:views:%s' % number
+            for number in range(read + 1, head + 1)]
+    views = Counter()
+    for batch in cache.get_many(keys).values():
+        views.update(batch)
+    # Группа берётся текущая, а просмотры удалённых постов отбрасываются
+    posts = Post.objects.filter(pk__in=list(views)).values_list(
+        'pk', 'group_id')
+    with transaction.atomic():
+        for post_id, group_id in posts:
+            record(post_id, group_id,
+                   views[post_id] * settings.TRENDING_VIEW_WEIGHT)
+    cache.set(READ_KEY, head, None)
+    cache.delete_many(keys)
+
+
+def _cache_key(group_id):
+    if group_id is None:
+        return 'trending:posts:global'
+    return 'trending:posts:group:%s' % group_id
+
+
+def top_posts(group_id=None):
+    """[(post_id, heat)] лучших постов — общий топ или топ группы."""
+    scores = TrendingScore.objects.all()
+    if group_id is not None:
+        scores = scores.filter(group_id=group_id)
+    top = list(scores.order_by('-heat').values_list(
+        'post_id', 'heat')[:settings.TRENDING_SIZE])
+    cache.set(_cache_key(group_id), top, settings.TRENDING_CACHE_TIMEOUT)
+    return top
+
+
+def top_groups():
+    """[(group_id, активность)] групп с самыми активными постами."""
+    now = _now()
+    top = list(TrendingScore.objects.filter(group_id__isnull=False)
+               .values('group_id')
+               .annotate(score=Sum(Power(2, F('heat') - now)))
+               .order_by('-score')
+               .values_list('group_id', 'score')[:settings.TRENDING_GROUPS])
+    cache.set('trending:groups', top, settings.TRENDING_CACHE_TIMEOUT)
+    return top
+
+
+def cached_posts(group_id=None):
+    """Топ постов из кеша; при промахе — из индекса."""
+    top = cache.get(_cache_key(group_id))
+    return top if top is not None else top_posts(group_id)
+
+
+def cached_groups():
+    top = cache.get('trending:groups')
+    return top if top is not None else top_groups()
+
+
+def refresh():
+    """Периодическая задача: просмотры в базу, чистка и топы в кеш."""
+    fold_views()
+    # Активность остывшей строки меньше TRENDING_MIN_SCORE
+    TrendingScore.objects.filter(
+        heat__lt=_now() + math.log2(settings.TRENDING_MIN_SCORE)).delete()
+    top_posts()
+    top_groups()
+    group_ids = TrendingScore.objects.filter(
+        group_id__isnull=False).values_list('group_id', flat=True).distinct()
+    for group_id in group_ids:
+        top_posts(group_id)
@@ -0,0 +1,95 @@
+"""Приём картинок постов.
+
+Загрузка идёт потоком: обработчик считает байты по мере прихода кусков и,
+как только файл превысил POST_IMAGE_MAX_BYTES, перестаёт передавать данные
+дальше — на диск попадает не больше лимита. Принятая картинка проверяется
+по числу пикселей до декодирования, поворачивается по EXIF, уменьшается до
+POST_IMAGE_MAX_SIZE и пересохраняется в WebP без метаданных, поэтому в
+хранилище не бывает 40-мегапиксельных оригиналов.
+"""
+import os
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+INGEST_FORMAT = 'WEBP'
+INGEST_EXTENSION = '.webp'
+INGEST_CONTENT_TYPE = 'image/webp'
+
+
+class RejectedUpload(UploadedFile):
+    """Файл, отброшенный обработчиком загрузки из-за размера."""
+    rejected = True
+
+    def __init__(self, name, content_type, size):
+        super().__init__(BytesIO(), name, content_type, size)
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Ограничивает размер загружаемых файлов.
+
+    Стоит первым в FILE_UPLOAD_HANDLERS: пока лимит не превышен, куски
+    уходят следующим обработчикам (в память или во временный файл), после —
+    отбрасываются, а вместо файла в request.FILES попадает RejectedUpload.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.rejected = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            self.rejected = True
+        if self.rejected:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.rejected:
+            return RejectedUpload(self.file_name, self.content_type,
+                                  self.received)
+        return None
+
+
+def too_large_message(upload):
+    return 'Файл больше %s (загружено не меньше %s)' % (
+        filesizeformat(settings.POST_IMAGE_MAX_BYTES),
+        filesizeformat(upload.size))
+
+
+def ingest(upload):
+    """Проверить и пересохранить загруженную картинку.
+
+    Возвращает новый файл для ImageField; при нарушении лимитов бросает
+    forms.ValidationError.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    # Image.open читает только заголовок — размеры известны до декодирования
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise forms.ValidationError(
+            'Слишком большое изображение: %s×%s пикселей' % (width, height))
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    # JPEG сразу декодируется в уменьшенном масштабе (1/2, 1/4, 1/8)
+    image.draft('RGB', (max_size, max_size))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        transparent = image.mode in ('RGBA', 'LA', 'PA') or (
+            'transparency' in image.info)
+        image = image.convert('RGBA' if transparent else 'RGB')
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    buffer = BytesIO()
+    # EXIF, XMP и прочие метаданные не передаём — они не сохранятся
+    image.save(buffer, INGEST_FORMAT, quality=settings.POST_IMAGE_QUALITY,
+               method=4)
+    base, _ = os.path.splitext(os.path.basename(upload.name))
+    return SimpleUploadedFile(base + INGEST_EXTENSION, buffer.getvalue(),
+                              content_type=INGEST_CONTENT_TYPE)
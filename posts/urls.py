@@ -1,14 +1,43 @@
-from django.urls import path
+from django.urls import include, path, register_converter
 
 from . import views
 
+
+class FeedKindConverter:
+    regex = 'rss|atom'
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+register_converter(FeedKindConverter, 'feed')
+
+# Общие страницы живут под зарезервированным префиксом, чтобы не занимать
+# имена пользователей (см. users.forms.RESERVED_USERNAMES)
+explore_patterns = [
+    path("trending/", views.trending_posts, name="trending"),
+    path("feed/<feed:kind>/", views.latest_feed, name="latest_feed"),
+    path("search/", views.search, name="search"),
+    path("live/", views.live_feed, name="live_feed"),
+]
+
 urlpatterns = [
     path("", views.index, name="index"),
     path("group/<slug:slug>/", views.group_posts, name="group"),
+    path("group/<slug:slug>/trending/", views.group_trending,
+         name="group_trending"),
+    path("group/<slug:slug>/<feed:kind>/", views.group_feed,
+         name="group_feed"),
+    path("explore/", include(explore_patterns)),
     path("new/", views.new_post, name="new_post"),
     path("follow/", views.follow_index, name="follow_index"),
     # Профайл пользователя
     path('<str:username>/', views.profile, name='profile'),
+    path('<str:username>/<feed:kind>/', views.profile_feed,
+         name='profile_feed'),
     # Просмотр и редактирование записи
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path(
@@ -16,6 +45,9 @@ urlpatterns = [
         views.post_edit,
         name='post_edit'
     ),
+    path('<str:username>/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
     path("<username>/<int:post_id>/comment",
          views.add_comment,
          name="add_comment"),
@@ -0,0 +1,123 @@
+"""Поколения лент для ключей кеша.
+
+У каждой ленты (общая, группы, автора) есть счётчик поколения. Ключ
+закешированного фрагмента включает поколение, поэтому любое изменение
+поста или комментария делает старые фрагменты недостижимыми: их не нужно
+искать и удалять, а срок жизни кеша может быть сколь угодно долгим.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .pagination import page_number
+
+GLOBAL = 'global'
+# Сдвигается после обновления копии базы для чтения (refresh_replica):
+# страницы, собранные по отстающей реплике, не живут дольше её обновления
+REPLICA = 'replica'
+# Сдвигается после пересчёта рекомендаций «кого почитать»
+SUGGESTIONS = 'suggestions'
+
+
+def group_scope(group_id):
+    return 'group:%s' % group_id
+
+
+def author_scope(author_id):
+    return 'author:%s' % author_id
+
+
+def card_scope(user_id):
+    # Имя и счётчики подписок в карточке автора; число постов меняется
+    # вместе с поколением автора
+    return 'card:%s' % user_id
+
+
+def _key(scope):
+    return 'feed_version:%s' % scope
+
+
+def _initial():
+    # Поколение после вытеснения ключа не должно совпасть с прежним
+    return int(time.time() * 1000)
+
+
+def get_version(*scopes):
+    """Поколение набора лент одной строкой, например '1613..:1614..'."""
+    keys = [_key(scope) for scope in scopes + (REPLICA,)]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial(), None)
+            found[key] = cache.get(key)
+    return ':'.join(str(found[key]) for key in keys)
+
+
+def bump_now(*scopes):
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.add(_key(scope), _initial(), None)
+
+
+def bump(*scopes):
+    """Сменить поколение лент.
+
+    Сдвигаем сразу и ещё раз после коммита: иначе запрос, прочитавший
+    старые данные до коммита, мог бы сохранить их под новым поколением.
+    """
+    scopes = [scope for scope in scopes if scope is not None]
+    bump_now(*scopes)
+    transaction.on_commit(lambda: bump_now(*scopes))
+
+
+def post_scopes(post):
+    scopes = [GLOBAL, author_scope(post.author_id)]
+    if post.group_id is not None:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+def author_card_context(author_id):
+    """Контекст для {% cache %} карточки автора (author_card.html)."""
+    return {
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'author_card_version': get_version(author_scope(author_id),
+                                           card_scope(author_id)),
+    }
+
+
+def feed_page(request):
+    """Номер страницы ленты для ключа фрагмента или None — не кешировать.
+
+    Ключ строится из номера, а не из адреса: лишние параметры запроса не
+    плодят копий. Курсорные страницы и дальние номера читают реже, чем
+    пишут, их фрагменты не кешируются.
+    """
+    if request.GET.get('after') or request.GET.get('before'):
+        return None
+    number = page_number(request) or 1
+    return number if number <= settings.FEED_CACHE_PAGES else None
+
+
+def feed_cache_context(request, page, *scopes):
+    """Контекст для {% cache %} ленты (feed_posts.html).
+
+    Фрагмент общий для анонимов и всех пользователей; отдельная копия
+    нужна только автору, чьи посты есть на странице — у него в карточках
+    кнопка «Редактировать».
+    """
+    variant = 'shared'
+    user = request.user
+    if user.is_authenticated and any(
+            post.author_id == user.id for post in page):
+        variant = 'user:%s' % user.id
+    return {
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed_version': get_version(*scopes),
+        'feed_variant': variant,
+        'feed_page': feed_page(request),
+    }
@@ -1,45 +1,156 @@
+import os
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
 
+from . import etags, feeds, live, suggestions, trending
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .pagination import (COMMENT_ORDERING, CursorPage, CursorPaginator,
+                         cursor_context, paginate)
+from .ratelimit import rate_limit
+from .search import search_page
+from .thumbnails import schedule as schedule_thumbnails
+from .timeline import paginate_timeline
+from .versions import (GLOBAL, author_card_context, author_scope,
+                       feed_cache_context, group_scope)
+
+
+# Страницы можно хранить только в браузере и только с перепроверкой ETag
+revalidate = cache_control(private=True, no_cache=True)
 
 
+@revalidate
+@condition(etag_func=etags.index_etag)
 def index(request):
-    latest = Post.objects.all()
-    paginator = Paginator(latest, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request,
-                  'index.html',
-                  {"paginator": paginator, 'page': page})
+    latest = Post.objects.feed()
+    context = paginate(request, latest)
+    context.update(feed_cache_context(request, context['page'], GLOBAL))
+    return render(request, 'index.html', context)
 
 
+@revalidate
+@condition(etag_func=etags.group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request,
-                  "group.html",
-                  {"paginator": paginator, "group": group, "page": page})
+    posts = group.posts.feed()
+    context = paginate(request, posts, count=group.posts_count)
+    context.update(feed_cache_context(request, context['page'],
+                                      group_scope(group.id)))
+    return render(request, "group.html", {"group": group, **context})
+
+
+def _trending_page(request, group=None):
+    # Топ берётся из кеша, посты и группы — запросами по первичному ключу
+    top = trending.cached_posts(group.id if group else None)
+    posts = Post.objects.feed().in_bulk([post_id for post_id, _ in top])
+    group_top = trending.cached_groups()
+    groups = Group.objects.in_bulk([group_id for group_id, _ in group_top])
+    return render(request, 'trending.html', {
+        'group': group,
+        'page': [posts[post_id] for post_id, _ in top if post_id in posts],
+        'groups': [groups[group_id] for group_id, _ in group_top
+                   if group_id in groups]})
+
+
+def trending_posts(request):
+    return _trending_page(request)
+
+
+def group_trending(request, slug):
+    return _trending_page(request, get_object_or_404(Group, slug=slug))
+
+
+def latest_feed(request, kind):
+    return feeds.serve(request, kind, feeds.LatestPostsFeed, GLOBAL)
+
+
+def group_feed(request, slug, kind):
+    group = get_object_or_404(Group, slug=slug)
+    return feeds.serve(request, kind, feeds.GroupPostsFeed,
+                       group_scope(group.id), group)
+
+
+def profile_feed(request, username, kind):
+    author = get_object_or_404(User, username=username)
+    return feeds.serve(request, kind, feeds.AuthorPostsFeed,
+                       author_scope(author.id), author)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = search_page(request, query)
+    context = {'page': None, 'paginator': None}
+    if page is not None:
+        context = cursor_context(page)
+    return render(request, 'search.html', {
+        'query': query,
+        # Курсорные ссылки паджинатора должны сохранять запрос
+        'page_query': urlencode({'q': query}) + '&',
+        **context})
+
+
+@staff_member_required
+def cache_stats(request):
+    # Счётчики у каждого процесса свои, pid показывает, чьи они
+    stats = getattr(cache, 'stats', dict)
+    return JsonResponse({'pid': os.getpid(), 'prefixes': stats()})
+
+
+@require_GET
+def live_feed(request):
+    """SSE-поток с числом новых постов общей ленты, группы или подписок."""
+    if not settings.LIVE_ENABLED:
+        raise Http404('Живые ленты выключены')
+    if request.GET.get('group'):
+        group = get_object_or_404(Group.objects.only('id'),
+                                  slug=request.GET['group'])
+        subscription = live.Subscription(group_id=group.id)
+    elif 'follow' in request.GET:
+        if not request.user.is_authenticated:
+            return HttpResponse(status=401)
+        subscription = live.Subscription.following(request.user)
+    else:
+        subscription = live.Subscription()
+    try:
+        last_event_id = int(request.META.get('HTTP_LAST_EVENT_ID', ''))
+    except ValueError:
+        last_event_id = None
+    listener = live.hub.subscribe(subscription)
+    if listener is None:
+        response = HttpResponse(status=503)
+        response['Retry-After'] = settings.LIVE_RETRY_SECONDS
+        return response
+    return live.EventStreamResponse(live.hub, listener, last_event_id)
 
 
 @login_required
+@rate_limit('new_post', methods=['POST'])
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == 'POST':
         if form.is_valid():
             new_post = form.save(commit=False)
             new_post.author = request.user
-            new_post.save()
+            # Пост и счётчики автора и группы сохраняются вместе
+            with transaction.atomic():
+                new_post.save()
+                live.publish(new_post)
+                schedule_thumbnails(new_post)
             return redirect("index")
     return render(request, 'new_post.html', {'form': form})
 
 
 @login_required
+@rate_limit('add_comment', methods=['POST'])
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -48,31 +159,46 @@ def add_comment(request, username, post_id):
             new_comment = form.save(commit=False)
             new_comment.author = request.user
             new_comment.post = post
-            new_comment.save()
+            with transaction.atomic():
+                new_comment.save()
     return redirect('post', username, post_id)
 
 
+@revalidate
+@condition(etag_func=etags.profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    posts = author.posts.feed()
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(user=request.user, author=author)
+    stats = getattr(author, 'stats', None)
+    context = paginate(request, posts,
+                       count=stats.posts_count if stats else None)
+    context.update(feed_cache_context(request, context['page'],
+                                      author_scope(author.id)))
+    context.update(author_card_context(author.id))
     return render(request, 'profile.html', {
-                  "paginator": paginator,
                   'author': author,
                   'posts': posts,
-                  'page': page,
-                  'following': following})
+                  'following': following,
+                  'suggestions': suggestions.for_user(request.user),
+                  **context})
 
 
+@revalidate
+@condition(etag_func=etags.post_etag)
 def post_view(request, username, post_id):
-    author = get_object_or_404(User, username=username)
-    post = author.posts.get(id=post_id)
-    comments = post.comments.all()
+    # Пост, автор со счётчиками и группа — одним запросом, комментарии —
+    # вторым; карточка автора рисуется из кеша
+    post = get_object_or_404(
+        Post.objects.feed().select_related('author__stats'),
+        author__username=username, id=post_id)
+    author = post.author
+    trending.record_view(post)
+    comments, comments_page = _comments(
+        request, post.comments.select_related('author'), post.comments_count)
     form = CommentForm()
     following = False
     if request.user.is_authenticated:
@@ -81,8 +207,42 @@ def post_view(request, username, post_id):
                   'author': author,
                   'post': post,
                   'comments': comments,
+                  'comments_page': comments_page,
                   'form': form,
-                  'following': following})
+                  'following': following,
+                  **author_card_context(author.id)})
+
+
+def _comments(request, comments, total=None):
+    """Порция комментариев для шаблона и страница с курсором продолжения.
+
+    Первая порция поста — ленивый QuerySet: шаблон читает его одним
+    запросом, а есть ли продолжение, известно из счётчика комментариев.
+    """
+    paginator = CursorPaginator(comments, settings.COMMENTS_PER_PAGE,
+                                COMMENT_ORDERING)
+    after = request.GET.get('after') or None
+    if after is None and total is not None:
+        first = paginator.object_list[:paginator.per_page]
+        return first, CursorPage(first, paginator,
+                                 total > paginator.per_page, False)
+    page = paginator.get_page(after=after)
+    return page.object_list, page
+
+
+@revalidate
+@condition(etag_func=etags.post_etag)
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only('id'),
+                             author__username=username, id=post_id)
+    comments, comments_page = _comments(
+        request, post.comments.select_related('author'))
+    return render(request, 'comment_items.html', {
+                  'username': username,
+                  'post': post,
+                  'comments': comments,
+                  'comments_page': comments_page})
 
 
 @login_required
@@ -94,7 +254,10 @@ def post_edit(request, username, post_id):
                         instance=post)
         if request.method == 'POST':
             if form.is_valid():
-                post.save()
+                with transaction.atomic():
+                    post.save()
+                    if 'image' in form.changed_data:
+                        schedule_thumbnails(post)
                 return redirect('post', username, post_id)
         return render(request, 'new_post.html', {
             'form': form, 'post': post})
@@ -119,25 +282,25 @@ def server_error(request):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request,
-                  "follow.html",
-                  {"paginator": paginator, 'page': page})
+    return render(request, "follow.html", {
+                  'suggestions': suggestions.for_user(request.user),
+                  **paginate_timeline(request, request.user)})
 
 
 @login_required
+@rate_limit('follow')
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('profile', username)
 
 
 @login_required
+@rate_limit('follow')
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('profile', username)
@@ -1,10 +1,24 @@
+from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
 
 User = get_user_model()
 
+# Первые сегменты адресов сайта: профиль с таким именем был бы недоступен.
+# Копия списка проверяет старые аккаунты в миграции users 0002
+RESERVED_USERNAMES = frozenset([
+    'about', 'admin', 'api', 'auth', 'explore', 'follow', 'group', 'media',
+    'new', 'static', '404', '500',
+])
+
 
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if username.lower() in RESERVED_USERNAMES:
+            raise forms.ValidationError('Это имя занято адресом сайта')
+        return username
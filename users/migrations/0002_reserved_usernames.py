@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations
+
+# Копия users.forms.RESERVED_USERNAMES на момент 0002
+RESERVED_USERNAMES = [
+    'about', 'admin', 'api', 'auth', 'explore', 'follow', 'group', 'media',
+    'new', 'static', '404', '500',
+]
+
+
+def check_usernames(apps, schema_editor):
+    # Аккаунты с такими именами не открыли бы свой профиль; переименовать
+    # их за владельцев нельзя — пусть это решит администратор
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    taken = []
+    for name in RESERVED_USERNAMES:
+        taken += User.objects.filter(username__iexact=name).values_list(
+            'username', flat=True)
+    if taken:
+        raise RuntimeError(
+            'Имена пользователей заняты адресами сайта, переименуйте '
+            'аккаунты: %s' % ', '.join(sorted(taken)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_usernames, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.2 has no ASGI support of its own, so the WSGI handler runs behind
+yatube.asgi_handler in a bounded thread pool (ASGI_THREADS).
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+# Потоковые ответы здесь обслуживает отдельный пул, живые ленты можно включить
+os.environ.setdefault('YATUBE_LIVE_ENABLED', '1')
+
+from yatube.asgi_handler import ASGIHandler  # noqa: E402
+
+application = ASGIHandler(get_wsgi_application())
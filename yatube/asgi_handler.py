@@ -0,0 +1,197 @@
+"""ASGI-приложение поверх WSGI-обработчика Django.
+
+Django 2.2 не умеет асинхронных представлений, поэтому представления
+по-прежнему синхронные и выполняются в ограниченном пуле потоков
+(ASGI_THREADS). Асинхронной остаётся работа с соединением: тело запроса
+принимается в цикле событий, и медленный клиент держит корутину, а не поток
+пула. Поток занят только пока Django строит ответ; соединения с базой
+остаются привязанными к потокам пула и живут CONN_MAX_AGE.
+
+Потоковые ответы (StreamingHttpResponse, например SSE из posts.live)
+отдаются из отдельного пула ASGI_STREAM_THREADS: долгие соединения не
+отнимают потоки у обычных страниц. Пока идёт поток, обработчик ждёт
+http.disconnect: ушедший клиент останавливает выдачу сразу, а ответ с
+методом cancel() (posts.live.EventStreamResponse) освобождает ресурсы,
+не дожидаясь следующего куска.
+"""
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+
+
+def wsgi_environ(scope, body):
+    """WSGI-окружение (PEP 3333) из HTTP-scope ASGI."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('127.0.0.1', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # Строки WSGI — байты в latin-1, Django декодирует их как UTF-8
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        if name in environ:
+            # Повторные Cookie (HTTP/2 шлёт каждую отдельно) склеиваются
+            # через '; ', остальные заголовки — через запятую (RFC 7230)
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = environ[name] + separator + value
+        environ[name] = value
+    return environ
+
+
+class ASGIHandler:
+    def __init__(self, wsgi_application, threads=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads or settings.ASGI_THREADS,
+            thread_name_prefix='asgi')
+        self.stream_executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_STREAM_THREADS,
+            thread_name_prefix='asgi-stream')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError('Поддерживается только HTTP, а не %s'
+                             % scope['type'])
+        body = await self.read_body(receive)
+        if body is None:
+            # Клиент ушёл, не дождавшись ответа: поток пула не нужен
+            return
+        loop = asyncio.get_running_loop()
+
+        def send_now(message):
+            # Отправка из потока пула с ожиданием: медленный клиент
+            # притормаживает выдачу, а не копит ответ в памяти
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        try:
+            response, chunks = await loop.run_in_executor(
+                self.executor, self.run_wsgi, wsgi_environ(scope, body),
+                send_now)
+            if chunks is not None:
+                await self.stream(loop, receive, response, chunks)
+        finally:
+            body.close()
+
+    async def stream(self, loop, receive, response, chunks):
+        sending = loop.run_in_executor(self.stream_executor,
+                                       response.send_all, chunks)
+        disconnect = asyncio.ensure_future(self.wait_disconnect(receive))
+        await asyncio.wait({sending, disconnect},
+                           return_when=asyncio.FIRST_COMPLETED)
+        if disconnect.done():
+            response.cancelled = True
+            cancel = getattr(chunks, 'cancel', None)
+            if cancel is not None:
+                cancel()
+        else:
+            disconnect.cancel()
+        await sending
+
+    async def wait_disconnect(self, receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        self.stream_executor.shutdown(wait=True)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    def run_wsgi(self, environ, send):
+        response = _Response(send)
+        chunks = self.wsgi_application(environ, response.start_response)
+        if getattr(chunks, 'streaming', False):
+            return response, chunks
+        response.send_all(chunks)
+        return response, None
+
+
+class _Response:
+    """Отправка WSGI-ответа сообщениями ASGI из потока пула."""
+
+    def __init__(self, send):
+        self.send = send
+        self.status = None
+        self.headers = None
+        self.sent = False
+        # Клиент ушёл: больше ничего не отправляем
+        self.cancelled = False
+
+    def start_response(self, status, headers, exc_info=None):
+        if exc_info and self.sent:
+            raise exc_info[1].with_traceback(exc_info[2])
+        self.status = int(status.split(' ', 1)[0])
+        self.headers = [
+            (name.lower().encode('latin-1'), value.encode('latin-1'))
+            for name, value in headers]
+
+    def start(self):
+        if not self.sent:
+            self.sent = True
+            self.send({'type': 'http.response.start',
+                       'status': self.status,
+                       'headers': self.headers})
+
+    def send_all(self, chunks):
+        try:
+            for chunk in chunks:
+                if self.cancelled:
+                    return
+                if chunk:
+                    self.start()
+                    self.send({'type': 'http.response.body', 'body': chunk,
+                               'more_body': True})
+            if not self.cancelled:
+                self.start()
+                self.send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # close() отправляет request_finished: Django вернёт соединения
+            if hasattr(chunks, 'close'):
+                chunks.close()
@@ -0,0 +1,441 @@
+"""Кеш из двух уровней: LRU в памяти процесса поверх общего SQLite-файла.
+
+SQLiteCache — общий для всех процессов машины кеш в одном файле SQLite
+(WAL, без сервера), поэтому сброс ключа в одном воркере gunicorn виден
+остальным. TieredCache держит перед ним небольшой LRU в памяти процесса с
+коротким временем жизни L1_TIMEOUT; ключи из L1_EXCLUDE_PREFIXES (например,
+поколения лент) в L1 не попадают и всегда читаются из общего уровня.
+
+Для ключей из SINGLE_FLIGHT_PREFIXES (фрагменты {% cache %}) промах
+оформляется как аренда: первый процесс получает None и пересчитывает
+значение, остальные ждут его результата до LOCK_WAIT секунд. Истёкшее
+значение ещё STALE_TIMEOUT секунд хранится и отдаётся всем, кроме одного
+процесса, который его обновляет (stale-while-revalidate).
+
+Попадания и промахи считаются по префиксу ключа, см. TieredCache.stats().
+"""
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+# Префикс для метрик: ключ без последней части после «:» или «.»
+_PREFIX = re.compile(r'^(.*?)[:.][^:.]*$')
+
+
+def key_prefix(key):
+    match = _PREFIX.match(key)
+    return match.group(1) if match else key
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в файле SQLite, общий для процессов одной машины."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        # Соединение своё у каждого потока и каждого процесса после fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=20,
+                                         isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, '
+                'value BLOB NOT NULL, expires REAL) WITHOUT ROWID')
+            connection.execute('CREATE INDEX IF NOT EXISTS cache_expires '
+                               'ON cache (expires)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    # Операции над готовыми ключами; их же использует TieredCache
+
+    def _fetch(self, keys):
+        if not keys:
+            return {}
+        rows = self._connection().execute(
+            'SELECT key, value FROM cache WHERE key IN (%s) AND '
+            '(expires IS NULL OR expires > ?)' % ', '.join('?' * len(keys)),
+            [*keys, time.time()])
+        return {key: pickle.loads(value) for key, value in rows}
+
+    def _store(self, rows):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                [(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires)
+                 for key, value, expires in rows])
+            self._writes += len(rows)
+            if self._writes >= self._max_entries // self._cull_frequency:
+                self._writes = 0
+                self._cull(connection)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _cull(self, connection):
+        now = time.time()
+        connection.execute('DELETE FROM cache WHERE expires <= ?', [now])
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            # Первыми уходят записи, которые истекут раньше всех
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                [count // self._cull_frequency])
+
+    def _insert(self, key, value, expires):
+        cursor = self._connection().execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires WHERE cache.expires <= ?',
+            [key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires,
+             time.time()])
+        return cursor.rowcount > 0
+
+    def _update(self, key, func):
+        """Атомарно заменить значение на func(значение)."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [key, time.time()]).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = func(pickle.loads(row[0]))
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                [pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key])
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return value
+
+    def _touch(self, key, expires):
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [expires, key, time.time()])
+        return cursor.rowcount > 0
+
+    def _remove(self, keys):
+        cursor = self._connection().execute(
+            'DELETE FROM cache WHERE key IN (%s)' % ', '.join('?' * len(keys)),
+            keys)
+        return cursor.rowcount > 0
+
+    def _make_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    # API кеша Django
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._insert(self._make_key(key, version), value,
+                            self.get_backend_timeout(timeout))
+
+    def get(self, key, default=None, version=None):
+        key = self._make_key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store([(self._make_key(key, version), value,
+                      self.get_backend_timeout(timeout))])
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._touch(self._make_key(key, version),
+                           self.get_backend_timeout(timeout))
+
+    def delete(self, key, version=None):
+        self._remove([self._make_key(key, version)])
+
+    def get_many(self, keys, version=None):
+        made = {self._make_key(key, version): key for key in keys}
+        found = self._fetch(list(made))
+        return {made[key]: value for key, value in found.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        self._store([(self._make_key(key, version), value, expires)
+                     for key, value in data.items()])
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._make_key(key, version) for key in keys]
+        if keys:
+            self._remove(keys)
+
+    def has_key(self, key, version=None):
+        key = self._make_key(key, version)
+        return key in self._fetch([key])
+
+    def incr(self, key, delta=1, version=None):
+        return self._update(self._make_key(key, version),
+                            lambda value: value + delta)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+
+class TieredCache(BaseCache):
+    """LRU в памяти процесса (L1) поверх общего SQLiteCache (L2).
+
+    В L2 лежит пара (значение, срок свежести); сама запись живёт дольше
+    на STALE_TIMEOUT, чтобы её можно было отдать, пока значение обновляют.
+    """
+    _make_key = SQLiteCache._make_key
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2 = SQLiteCache(location, {
+            'OPTIONS': {'MAX_ENTRIES': options.get('L2_MAX_ENTRIES', 100000)},
+        })
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.stale_timeout = options.get('STALE_TIMEOUT', 60)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        self.lock_wait = options.get('LOCK_WAIT', 2)
+        self.l1_exclude = tuple(options.get('L1_EXCLUDE_PREFIXES', ()))
+        self.single_flight = tuple(options.get('SINGLE_FLIGHT_PREFIXES', ()))
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = defaultdict(Counter)
+
+    # Метрики
+
+    def _count(self, key, event):
+        with self._lock:
+            self._stats[key_prefix(key)][event] += 1
+
+    def stats(self):
+        """Счётчики этого процесса: префикс ключа → событие → число."""
+        with self._lock:
+            return {prefix: dict(events)
+                    for prefix, events in self._stats.items()}
+
+    # L1
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            envelope, expires = entry
+            if expires <= time.time():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return envelope
+
+    def _l1_put(self, made, key, envelope, expires):
+        if self.l1_exclude and key.startswith(self.l1_exclude):
+            return
+        l1_expires = time.time() + self.l1_timeout
+        if expires is not None:
+            l1_expires = min(l1_expires, expires)
+        with self._lock:
+            self._l1[made] = (envelope, l1_expires)
+            self._l1.move_to_end(made)
+            while len(self._l1) > self._max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_drop(self, keys):
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    # Общие части
+
+    def _is_single_flight(self, key):
+        return bool(self.single_flight) and key.startswith(self.single_flight)
+
+    def _expiry(self, timeout, key):
+        fresh_until = self.get_backend_timeout(timeout)
+        expires = fresh_until
+        if fresh_until is not None and self._is_single_flight(key):
+            expires = fresh_until + self.stale_timeout
+        return fresh_until, expires
+
+    def _lookup(self, made, key):
+        """Конверт (значение, свежесть) из L1 или L2 и уровень попадания."""
+        envelope = self._l1_get(made)
+        if envelope is not None:
+            return envelope, 'l1'
+        envelope = self.l2._fetch([made]).get(made)
+        if envelope is not None:
+            # В L1 — не дольше, чем значение остаётся свежим
+            self._l1_put(made, key, envelope, envelope[1])
+            return envelope, 'l2'
+        return None, None
+
+    def _lease(self, made):
+        return self.l2._insert(made + ':lease', os.getpid(),
+                               time.time() + self.lock_timeout)
+
+    def _wait(self, made):
+        """Дождаться, пока держатель аренды положит значение."""
+        deadline = time.time() + self.lock_wait
+        while time.time() < deadline:
+            time.sleep(0.02)
+            found = self.l2._fetch([made, made + ':lease'])
+            envelope = found.get(made)
+            if envelope is not None and (
+                    envelope[1] is None or envelope[1] > time.time()):
+                return envelope
+            if made + ':lease' not in found:
+                return envelope
+        return None
+
+    # API кеша Django
+
+    def get(self, key, default=None, version=None):
+        made = self._make_key(key, version)
+        envelope, level = self._lookup(made, key)
+        single_flight = self._is_single_flight(key)
+        if envelope is None:
+            if single_flight and not self._lease(made):
+                self._count(key, 'waits')
+                envelope = self._wait(made)
+                if envelope is not None:
+                    return envelope[0]
+            self._count(key, 'misses')
+            return default
+        value, fresh_until = envelope
+        if fresh_until is None or fresh_until > time.time():
+            self._count(key, level + '_hits')
+            return value
+        if single_flight and not self._lease(made):
+            # Значение уже обновляет другой процесс — отдаём прежнее
+            self._count(key, 'stale_hits')
+            return value
+        self._count(key, 'misses')
+        return default
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            value = default() if callable(default) else default
+            if value is not None:
+                self.set(key, value, timeout=timeout, version=version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = []
+        leases = []
+        for key, value in data.items():
+            made = self._make_key(key, version)
+            fresh_until, expires = self._expiry(timeout, key)
+            rows.append((made, (value, fresh_until), expires))
+            if self._is_single_flight(key):
+                leases.append(made + ':lease')
+        self.l2._store(rows)
+        if leases:
+            self.l2._remove(leases)
+        for key, (made, envelope, expires) in zip(data, rows):
+            self._l1_drop([made])
+            self._l1_put(made, key, envelope, envelope[1])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self._make_key(key, version)
+        fresh_until, expires = self._expiry(timeout, key)
+        envelope = (value, fresh_until)
+        if not self.l2._insert(made, envelope, expires):
+            return False
+        self._l1_put(made, key, envelope, fresh_until)
+        return True
+
+    def get_many(self, keys, version=None):
+        result = {}
+        missing = {}
+        now = time.time()
+        for key in keys:
+            made = self._make_key(key, version)
+            envelope = self._l1_get(made)
+            if envelope is not None and (
+                    envelope[1] is None or envelope[1] > now):
+                self._count(key, 'l1_hits')
+                result[key] = envelope[0]
+            else:
+                missing[made] = key
+        found = self.l2._fetch(list(missing))
+        for made, key in missing.items():
+            envelope = found.get(made)
+            if envelope is None or (
+                    envelope[1] is not None and envelope[1] <= now):
+                self._count(key, 'misses')
+                continue
+            self._count(key, 'l2_hits')
+            self._l1_put(made, key, envelope, envelope[1])
+            result[key] = envelope[0]
+        return result
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self._make_key(key, version)
+        fresh_until, expires = self._expiry(timeout, key)
+        try:
+            envelope = self.l2._update(
+                made, lambda envelope: (envelope[0], fresh_until))
+        except ValueError:
+            return False
+        self.l2._touch(made, expires)
+        self._l1_drop([made])
+        self._l1_put(made, key, envelope, fresh_until)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        made = self._make_key(key, version)
+
+        def increment(envelope):
+            value, fresh_until = envelope
+            if fresh_until is not None and fresh_until <= time.time():
+                raise ValueError("Key '%s' not found" % key)
+            return value + delta, fresh_until
+
+        envelope = self.l2._update(made, increment)
+        self._l1_drop([made])
+        self._l1_put(made, key, envelope, envelope[1])
+        return envelope[0]
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made = [self._make_key(key, version) for key in keys]
+        if made:
+            self._l1_drop(made)
+            self.l2._remove(made)
+
+    def has_key(self, key, version=None):
+        envelope, _ = self._lookup(self._make_key(key, version), key)
+        return envelope is not None and (
+            envelope[1] is None or envelope[1] > time.time())
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.l2.clear()
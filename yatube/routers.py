@@ -0,0 +1,62 @@
+"""Чтение с реплик, запись в основную базу.
+
+ReplicaRoutingMiddleware выбирает реплику для GET-запросов к страницам из
+REPLICA_VIEWS; все остальные запросы, команды и тесты читают из default.
+Любая запись в базе во время запроса ставит куку, и следующие
+REPLICA_PIN_SECONDS секунд пользователь читает из основной базы — так он
+сразу видит свой пост или комментарий, даже если реплика отстаёт.
+"""
+import random
+import threading
+
+from django.conf import settings
+
+PIN_COOKIE = 'primary_pin'
+
+_state = threading.local()
+
+
+def current_replica():
+    return getattr(_state, 'alias', None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии default, объекты из них можно связывать
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплику вместе с данными
+        return db == 'default'
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.alias = None
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.alias = None
+        if _state.wrote:
+            response.set_cookie(PIN_COOKIE, '1',
+                                max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (settings.DATABASE_REPLICAS
+                and request.method in ('GET', 'HEAD')
+                and request.resolver_match.view_name in settings.REPLICA_VIEWS
+                and PIN_COOKIE not in request.COOKIES):
+            _state.alias = random.choice(settings.DATABASE_REPLICAS)
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'about',
     'users',
     'posts',
+    'api',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -49,6 +50,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.QueryBudgetMiddleware',
+    'yatube.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -71,6 +74,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'posts.context_processors.year',
+                'posts.context_processors.live',
                 'django.contrib.messages.context_processors.messages',
             ],
         },
@@ -83,13 +87,63 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# yatube.sqlite — sqlite3 с WAL, прагмами и BEGIN IMMEDIATE (прагмы
+# переопределяются в OPTIONS['pragmas']). Соединение живёт между запросами
+# одного процесса.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'begin_immediate': True},
     }
 }
 
+# Копия базы для чтения страниц лент (yatube/routers.py). Локально это
+# SQLite-файл, который обновляет manage.py refresh_replica --interval N;
+# интервал должен быть короче REPLICA_PIN_SECONDS.
+REPLICA_DB = os.environ.get('YATUBE_REPLICA_DB')
+if REPLICA_DB:
+    DATABASES['replica'] = {
+        'ENGINE': 'yatube.sqlite',
+        'NAME': REPLICA_DB,
+        'CONN_MAX_AGE': 600,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['yatube.routers.ReplicaRouter']
+REPLICA_VIEWS = [
+    'index',
+    'group',
+    'profile',
+    'post',
+    'post_comments',
+    'follow_index',
+    'trending',
+    'group_trending',
+    'latest_feed',
+    'group_feed',
+    'profile_feed',
+    'about:author',
+    'about:tech',
+    'api_v1:posts',
+    'api_v1:post',
+    'api_v1:post_comments',
+    'api_v1:group',
+    'api_v1:group_posts',
+    'api_v1:profile',
+    'api_v1:profile_posts',
+    'api_v1:follow',
+]
+# Сколько секунд после записи пользователь читает из основной базы
+REPLICA_PIN_SECONDS = 15
+
+# yatube.asgi: потоки, в которых WSGI-обработчик Django строит ответы.
+# Открытых соединений может быть больше: ожидание клиента потоков не держит
+ASGI_THREADS = int(os.environ.get('YATUBE_ASGI_THREADS', 8))
+# Потоки для потоковых ответов (SSE): каждый держит одно соединение
+ASGI_STREAM_THREADS = int(os.environ.get('YATUBE_ASGI_STREAM_THREADS', 64))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -137,11 +191,175 @@ LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
 # LOGOUT_REDIRECT_URL = "index"
 
-EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+# Письма (сброс пароля и др.) уходят задачей очереди, воркер отправляет
+# их через JOBS_EMAIL_BACKEND
+EMAIL_BACKEND = "posts.mail.QueuedEmailBackend"
+JOBS_EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+POSTS_PER_PAGE = 10
+# Ленты не длиннее этого листаются номерами страниц, длиннее — курсором
+# (posts/pagination.py)
+FEED_NUMBERED_MAX_ROWS = 1000
+# Лимиты записей (posts/ratelimit.py): для каждого представления —
+# скорость пополнения и ёмкость ведра отдельно на пользователя и на IP.
+# Лимит на IP шире: за одним адресом бывает много людей
+RATE_LIMITS = {
+    'new_post': {'user': ('10/m', 20), 'ip': ('60/m', 200)},
+    'add_comment': {'user': ('30/m', 30), 'ip': ('120/m', 300)},
+    'follow': {'user': ('30/m', 50), 'ip': ('120/m', 300)},
+}
+# Заголовок с адресом клиента от нашего прокси, например
+# HTTP_X_FORWARDED_FOR за nginx; пусто — REMOTE_ADDR
+RATE_LIMIT_IP_HEADER = os.environ.get('YATUBE_RATE_LIMIT_IP_HEADER', '')
+# Лимиты на время bench_http: замер не должен упираться в 429
+BENCH_RATE_LIMITS = {}
+
+# Живые ленты (posts/live.py): как часто процесс опрашивает таблицу
+# событий, пинг простаивающего соединения, его предельная длительность и
+# число SSE-соединений на процесс (не больше ASGI_STREAM_THREADS)
+# Каждое SSE-соединение держит поток сервера до LIVE_MAX_SECONDS, поэтому
+# живые ленты включаются только под ASGI (yatube/asgi.py выставляет
+# переменную) или явно
+LIVE_ENABLED = os.environ.get('YATUBE_LIVE_ENABLED', '') == '1'
+LIVE_POLL_INTERVAL = 1
+LIVE_HEARTBEAT_SECONDS = 15
+LIVE_MAX_SECONDS = 300
+LIVE_RETRY_SECONDS = 3
+LIVE_MAX_CONNECTIONS = 50
+LIVE_EVENT_TTL = 60 * 60
+
+# RSS и Atom (posts/feeds.py): сколько последних постов в ленте
+SYNDICATION_ITEMS = 20
+
+# Комментарии под постом: первая порция, остальные догружаются по курсору
+COMMENTS_PER_PAGE = 20
+
+# Лента подписок: посты авторов, у которых подписчиков больше лимита,
+# не размножаются по лентам, а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_BACKFILL = 1000
+TIMELINE_BATCH_SIZE = 500
+
+# Кого почитать (posts/suggestions.py): сколько рекомендаций хранить и
+# показывать, сколько самых активных авторов группы учитывать и сколько
+# пользователей записывать в одной транзакции; интервал пересчёта — в
+# JOBS_PERIODIC. Хранится больше, чем показывается: подписка убирает
+# строку из списка
+SUGGESTIONS_COUNT = 20
+SUGGESTIONS_SHOWN = 5
+SUGGESTIONS_GROUP_AUTHORS = 100
+SUGGESTIONS_BATCH_SIZE = 500
+
+# Популярное (posts/trending.py): период полураспада активности, вес
+# комментария и просмотра, размер топов, как часто процесс сбрасывает
+# просмотры в журнал и сколько журнал живёт в кеше, срок жизни топов и
+# активность, ниже которой пост выпадает из таблицы
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_COMMENT_WEIGHT = 1.0
+TRENDING_VIEW_WEIGHT = 0.1
+TRENDING_SIZE = 30
+TRENDING_GROUPS = 10
+TRENDING_VIEW_FLUSH = 10
+TRENDING_VIEW_LOG_TIMEOUT = 60 * 60
+TRENDING_CACHE_TIMEOUT = 10 * 60
+TRENDING_MIN_SCORE = 0.001
+
+# Бюджеты SQL-запросов на ответ по имени URL (posts/middleware.py);
+# включают запросы сессии и пользователя
+QUERY_BUDGETS = {
+    'index': 4,
+    'group': 6,
+    'profile': 8,
+    'post': 6,
+    'post_comments': 3,
+    'follow_index': 9,
+    'search': 4,
+    'live_feed': 4,
+    'trending': 6,
+    'group_trending': 7,
+    'latest_feed': 1,
+    'group_feed': 2,
+    'profile_feed': 2,
+    'api_v1:posts': 2,
+    'api_v1:post': 3,
+    'api_v1:post_comments': 3,
+    'api_v1:group': 2,
+    'api_v1:group_posts': 3,
+    'api_v1:profile': 2,
+    'api_v1:profile_posts': 3,
+    'api_v1:follow': 8,
+}
+QUERY_BUDGET_RAISE = DEBUG
+
+# JSON API (api/): размер страницы по умолчанию и предел для ?limit=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Сколько последних комментариев встраивать в пост при ?fields=comments
+API_COMMENTS_PER_POST = 3
+
+# Приём картинок: лимиты и пересохранение (posts/uploads.py)
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+POST_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+POST_IMAGE_MAX_SIZE = 2048
+POST_IMAGE_QUALITY = 82
+
+# Миниатюры картинок постов строятся задачей очереди при загрузке
+POST_THUMBNAIL_SIZES = {
+    'card': (960, 360),
+}
+POST_THUMBNAIL_PADDING_COLOR = '#e3f2fd'
+POST_THUMBNAIL_QUALITY = 85
+
+# Очередь фоновых задач (posts/jobs.py, manage.py runworker): попыток на
+# задачу, первая задержка повтора (дальше удваивается), сколько кандидатов
+# воркер перебирает за раз, аренда задачи и пауза при пустой очереди
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 2
+JOBS_CLAIM_BATCH = 5
+JOBS_LEASE = 5 * 60
+JOBS_POLL_INTERVAL = 1
+# Периодические задачи: путь → интервал в секундах
+JOBS_PERIODIC = {
+    'posts.suggestions.rebuild': 6 * 60 * 60,
+    'posts.trending.refresh': 60,
+    'posts.live.prune': 10 * 60,
+}
+
+# Фрагменты лент инвалидируются сменой поколения (posts.versions),
+# поэтому срок жизни ограничивает только объём кеша
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+# Сколько первых страниц ленты (по старому ?page=N) кешируется фрагментами;
+# курсорные страницы рендерятся без кеша
+FEED_CACHE_PAGES = 3
+
+# LRU в памяти процесса поверх общего для воркеров SQLite-файла
+# (yatube/cache.py). Файл лежит в проекте, чтобы все воркеры одного
+# развёртывания видели его, а другие копии и тесты — нет. Поколения лент
+# в L1 не кешируются, чтобы их смена сразу была видна всем процессам;
+# фрагменты {% cache %} пересчитывает один процесс, остальные ждут его
+# или получают прежнюю версию.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.cache.TieredCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'L2_MAX_ENTRIES': 100000,
+            'L1_TIMEOUT': 5,
+            'STALE_TIMEOUT': 60,
+            'LOCK_TIMEOUT': 10,
+            'LOCK_WAIT': 2,
+            'L1_EXCLUDE_PREFIXES': ['feed_version:', 'ratelimit:',
+                                    'trending:views:'],
+            'SINGLE_FLIGHT_PREFIXES': ['template.cache.'],
+        },
     }
 }
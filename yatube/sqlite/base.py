@@ -0,0 +1,50 @@
+"""SQLite-бэкенд, настроенный для нескольких процессов gunicorn.
+
+- WAL: читатели не ждут писателя и не мешают ему;
+- synchronous=NORMAL: в WAL безопасно и не вызывает fsync на каждый коммит;
+- mmap_size и cache_size: горячие страницы читаются без системных вызовов;
+- busy_timeout (параметр timeout): писатель ждёт блокировку, а не падает;
+- OPTIONS['begin_immediate']: транзакции начинаются с BEGIN IMMEDIATE.
+  При обычном BEGIN транзакция, которая сначала читает, а потом пишет,
+  получает «database is locked» сразу, без ожидания busy_timeout, если
+  писатель успел вклиниться. Включается только для базы, в которую пишут:
+  на реплике IMMEDIATE лишь выстраивал бы читателей в очередь за
+  блокировкой записи.
+
+Прагмы можно переопределить в OPTIONS['pragmas'] настройки базы.
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — в КиБ, то есть 64 МиБ на соединение
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        pragmas = dict(PRAGMAS)
+        pragmas.update(kwargs.pop('pragmas', {}))
+        self.pragmas = pragmas
+        self.begin_immediate = kwargs.pop('begin_immediate', False)
+        # Таймаут модуля sqlite3 — это тот же busy_timeout, держим их равными
+        kwargs.setdefault('timeout', pragmas['busy_timeout'] / 1000)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute('PRAGMA %s = %s' % (name, value))
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
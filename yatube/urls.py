@@ -19,15 +19,22 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from posts.views import cache_stats
+
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"  # noqa
 
 urlpatterns = [
     path('about/', include('about.urls', namespace='about')),
+    # JSON API для мобильных клиентов; версия — часть адреса
+    path('api/v1/', include('api.urls', namespace='api_v1')),
     path("auth/", include("users.urls")),
     #  если нужного шаблона для /auth не нашлось в файле users.urls —
     #  ищем совпадения в файле django.contrib.auth.urls
     path("auth/", include("django.contrib.auth.urls")),
+    # отладочные счётчики кеша для персонала — рядом с админкой; раньше
+    # правил posts, чтобы не попасть в профиль пользователя admin
+    path("admin/cache-stats/", cache_stats, name="cache_stats"),
     # импорт правил из приложения posts
     path("", include("posts.urls")),
     # импорт правил из приложения admin